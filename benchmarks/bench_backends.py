@@ -0,0 +1,82 @@
+"""Benchmark y comprobación de paridad de los backends de similitud
+
+Compara la similitud de Jaccard con conjuntos de Python contra los backends
+'sparse' y 'bitset' del motor vectorizado, y comprueba que todos los backends
+reproducen la similitud mejorada original.
+
+Uso: python benchmarks/bench_backends.py [n_usuarios ...]
+"""
+import sys
+import time
+
+import numpy as np
+
+from reference import default_ontology_and_stem, random_preferences, loop_similarity_matrix
+from ontology import OntologyIndex
+from similarity import SimilarityEngine, BACKENDS, BASIC_WEIGHT
+from store import PreferenceStore
+
+
+def set_jaccard_matrix(user_preferences):
+    """Jaccard básico para todos los pares con operaciones de conjuntos"""
+    prefs = list(user_preferences.values())
+    n_users = len(prefs)
+    matrix = np.zeros((n_users, n_users))
+    for i in range(n_users):
+        for j in range(n_users):
+            union = len(prefs[i] | prefs[j])
+            matrix[i][j] = len(prefs[i] & prefs[j]) / union if union > 0 else 0
+    return matrix
+
+
+def check_parity(ontology, stem, n_users=150):
+    """Todos los backends deben coincidir con el cálculo original por pares"""
+    prefs = random_preferences(ontology, n_users, seed=3)
+    reference = loop_similarity_matrix(prefs, ontology, stem)
+    for name in BACKENDS:
+        engine = SimilarityEngine(OntologyIndex(ontology, stem), block_size=64, backend=name)
+        max_diff = float(np.abs(engine.similarity_matrix(prefs) - reference).max())
+        assert max_diff < 1e-12, f"Backend {name}: diferencia {max_diff}"
+        print(f"Paridad backend {name:<8} OK (dif. máx. {max_diff:.1e})")
+
+
+def main(sizes):
+    ontology, stem = default_ontology_and_stem()
+    check_parity(ontology, stem)
+
+    print(f"\n{'usuarios':>10} {'conjuntos (s)':>14} " + " ".join(f"{name + ' (s)':>12}" for name in BACKENDS))
+    for n_users in sizes:
+        store = PreferenceStore.from_preferences(random_preferences(ontology, n_users))
+        timings = []
+
+        if n_users <= 2000:
+            start = time.perf_counter()
+            basic = set_jaccard_matrix(store)
+            timings.append(f"{time.perf_counter() - start:>14.3f}")
+        else:
+            basic = None
+            timings.append(f"{'-':>14}")
+
+        results = {}
+        for name in BACKENDS:
+            engine = SimilarityEngine(OntologyIndex(ontology, stem), backend=name)
+            start = time.perf_counter()
+            results[name] = engine.condensed_distances(store)
+            timings.append(f"{time.perf_counter() - start:>12.3f}")
+
+        first, *others = results.values()
+        for other in others:
+            assert np.abs(first - other).max() < 1e-6, "Los backends no coinciden"
+        if basic is not None:
+            # El término básico de los backends debe coincidir con el de conjuntos
+            engine = SimilarityEngine(OntologyIndex(ontology, stem), backend='bitset')
+            _, backend, sizes = engine._prepare(store)
+            intersection, _ = backend.score_block(0, n_users)
+            union = sizes[:, None] + sizes[None, :] - intersection
+            assert np.allclose(intersection / np.maximum(union, 1), basic), "Jaccard básico no coincide"
+        print(f"{n_users:>10} " + " ".join(timings))
+    print(f"\n(peso del término básico: {BASIC_WEIGHT})")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [500, 2000, 10000])
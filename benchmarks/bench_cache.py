@@ -0,0 +1,59 @@
+"""Benchmark de la caché de resultados: cálculo completo vs. carga con mmap
+
+Uso: python benchmarks/bench_cache.py [n_usuarios]
+"""
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from reference import default_ontology_and_stem, random_preferences
+from cache import ResultCache
+from engine import PreferenceEngine
+
+
+def main(n_users):
+    ontology, _ = default_ontology_and_stem()
+    prefs = random_preferences(ontology, n_users)
+
+    with tempfile.TemporaryDirectory() as directory:
+        cache = ResultCache(directory)
+        engine = PreferenceEngine(cache=cache)
+        engine.genre_ontology = ontology
+        engine.set_preferences(prefs)
+
+        start = time.perf_counter()
+        engine.process()
+        cold_time = time.perf_counter() - start
+        clusters = engine.clusters.copy()
+        assert not engine.cache_hit
+
+        # Una instancia nueva simula una segunda ejecución con las mismas entradas
+        engine = PreferenceEngine(cache=cache)
+        engine.genre_ontology = ontology
+        engine.set_preferences(prefs)
+        start = time.perf_counter()
+        engine.process()
+        warm_time = time.perf_counter() - start
+        assert engine.cache_hit and np.array_equal(clusters, engine.clusters)
+
+        # Cambiar la ontología cambia la huella
+        engine.genre_ontology = dict(ontology, nuevo={'experimental'})
+        engine.process()
+        assert not engine.cache_hit
+
+        stats = cache.stats()
+        print(f"Usuarios:           {n_users}")
+        print(f"Cálculo completo:   {cold_time:.3f} s")
+        print(f"Carga desde caché:  {warm_time * 1e3:.1f} ms ({cold_time / warm_time:.0f}x)")
+        print(f"Entradas / tamaño:  {stats['entries']} / {stats['bytes'] / 2**20:.1f} MiB")
+
+        # Con un límite menor que dos entradas se expulsa la usada hace más tiempo
+        cache.max_bytes = stats['bytes'] // 2 + 1
+        cache.evict()
+        print(f"Tras la expulsión:  {cache.stats()['entries']} entradas")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000)
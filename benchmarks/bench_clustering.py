@@ -0,0 +1,58 @@
+"""Benchmark de clustering: tiempo y pico de memoria (RSS) por modo y tamaño
+
+Cada combinación se ejecuta en un subproceso propio para medir su pico de RSS.
+El modo 'linkage' (Ward exacto sobre el vector condensado) se omite por
+encima de EXACT_LINKAGE_MAX_USERS usuarios.
+
+Uso: python benchmarks/bench_clustering.py [n_usuarios ...]
+"""
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+from reference import default_ontology_and_stem, random_preferences
+from clustering import scalable_clusters, EXACT_LINKAGE_MAX_USERS
+from ontology import OntologyIndex
+from store import PreferenceStore
+
+MODES = ('linkage', 'knn', 'minhash')
+
+
+def run_single(mode, n_users):
+    """Ejecutar un modo en este proceso e imprimir tiempo y pico de RSS en JSON"""
+    ontology, stem = default_ontology_and_stem()
+    store = PreferenceStore.from_preferences(random_preferences(ontology, n_users))
+    ontology_index = OntologyIndex(ontology, stem, extra_genres=store.genres)
+
+    start = time.perf_counter()
+    clusters, _ = scalable_clusters(store, ontology_index, mode=mode, genre_ontology=ontology)
+    elapsed = time.perf_counter() - start
+
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    print(json.dumps({'time': elapsed, 'peak_rss': peak_rss, 'clusters': int(clusters.max())}))
+
+
+def main(sizes):
+    print(f"{'usuarios':>10} {'modo':>8} {'tiempo (s)':>11} {'pico RSS (MiB)':>15} {'clusters':>9}")
+    for n_users in sizes:
+        for mode in MODES:
+            if mode == 'linkage' and n_users > EXACT_LINKAGE_MAX_USERS:
+                print(f"{n_users:>10} {mode:>8} {'omitido':>11}")
+                continue
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), '--single', mode, str(n_users)],
+                capture_output=True, text=True, check=True
+            ).stdout.strip().splitlines()[-1]
+            result = json.loads(output)
+            print(f"{n_users:>10} {mode:>8} {result['time']:>11.2f} "
+                  f"{result['peak_rss'] / 2**20:>15.1f} {result['clusters']:>9}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 4 and sys.argv[1] == '--single':
+        run_single(sys.argv[2], int(sys.argv[3]))
+    else:
+        main([int(arg) for arg in sys.argv[1:]] or [5000, 20000, 100000])
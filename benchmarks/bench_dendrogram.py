@@ -0,0 +1,74 @@
+"""Benchmark del dendrograma completo frente al truncado con despliegue por subárboles
+
+Mide el cálculo de coordenadas y el dibujo con matplotlib (backend Agg) del
+árbol completo y del truncado a las últimas uniones, y el coste de desplegar
+una rama contraída y de volver a un subárbol ya calculado.
+
+Uso: python benchmarks/bench_dendrogram.py [n_usuarios ...]
+"""
+import sys
+import time
+
+import matplotlib
+matplotlib.use('Agg')
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from scipy.cluster.hierarchy import dendrogram
+
+from reference import default_ontology_and_stem, random_preferences
+from engine import PreferenceEngine
+from hierarchy import DendrogramLayout
+
+# Por encima de este número de hojas no se dibuja el árbol completo (tarda minutos)
+FULL_RENDER_MAX = 3000
+
+
+def render(tree):
+    """Dibujar unas coordenadas de dendrograma como lo hace la interfaz"""
+    fig = Figure(figsize=(12, 6))
+    ax = fig.add_subplot(1, 1, 1)
+    for xs, ys, color in zip(tree['icoord'], tree['dcoord'], tree['color_list']):
+        ax.plot(xs, ys, color=color)
+    n_leaves = len(tree['ivl'])
+    ax.set_xlim(0, 10 * n_leaves)
+    ax.set_xticks(range(5, 10 * n_leaves, 10))
+    ax.set_xticklabels(tree['ivl'], rotation=45, ha='right')
+    FigureCanvasAgg(fig).draw()
+
+
+def timed(function, *args, **kwargs):
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def main(sizes):
+    ontology, _ = default_ontology_and_stem()
+    print(f"{'usuarios':>9} {'completo: coord.':>17} {'dibujo':>8} {'truncado: coord.':>17} {'dibujo':>8} "
+          f"{'despliegue':>11} {'en caché':>9}")
+    for n_users in sizes:
+        engine = PreferenceEngine()
+        engine.genre_ontology = ontology
+        engine.set_preferences(random_preferences(ontology, n_users))
+        engine.process(clustering='linkage')
+        users = engine.user_preferences.users
+
+        full, full_time = timed(dendrogram, engine.linkage_matrix, labels=users, no_plot=True)
+        full_render = f"{timed(render, full)[1]:.2f}s" if n_users <= FULL_RENDER_MAX else "-"
+
+        layout = DendrogramLayout(engine.linkage_matrix, users)
+        tree, layout_time = timed(layout.layout)
+        truncated_render = timed(render, tree)[1]
+        assert len(tree['ivl']) <= layout.p
+
+        # Desplegar la rama contraída más grande y volver a ella con las coordenadas guardadas
+        branch = max((node for node in tree['nodes'] if not layout.is_leaf(node)), key=layout.size)
+        _, expand_time = timed(lambda: render(layout.layout(branch)))
+        _, cached_time = timed(layout.layout, branch)
+
+        print(f"{n_users:>9} {full_time:>16.3f}s {full_render:>8} {layout_time:>16.3f}s "
+              f"{truncated_render:>7.2f}s {expand_time:>10.3f}s {cached_time * 1e6:>7.0f}µs")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [1000, 3000, 8000])
@@ -0,0 +1,71 @@
+"""Benchmark de actualizaciones incrementales frente a la reconstrucción completa
+
+Aplica inserciones, modificaciones y borrados con upsert_user / remove_user y
+comprueba que la matriz condensada y las listas de vecinos coinciden con las
+recalculadas desde cero.
+
+Uso: python benchmarks/bench_incremental.py [n_usuarios] [n_cambios]
+"""
+import random
+import sys
+import time
+
+import numpy as np
+
+from reference import default_ontology_and_stem, random_preferences
+from engine import PreferenceEngine
+from neighbors import TopKIndex
+from similarity import SimilarityEngine
+
+
+def main(n_users, n_changes, k=5):
+    ontology, _ = default_ontology_and_stem()
+    prefs = random_preferences(ontology, n_users)
+    extra = random_preferences(ontology, n_changes, seed=7)
+    vocabulary = sorted(set().union(*prefs.values()))
+
+    engine = PreferenceEngine()
+    engine.genre_ontology = ontology
+    engine.set_preferences(prefs)
+    start = time.perf_counter()
+    engine.process()
+    list(engine.batch_recommendations(k))
+    full_time = time.perf_counter() - start
+
+    rng = random.Random(3)
+    timings = {'upsert (nuevo)': [], 'upsert (edición)': [], 'remove': []}
+    new_users = iter(extra.items())
+    for _ in range(n_changes):
+        users = engine.user_preferences.users
+        operation = rng.choice(list(timings) if len(users) > k + 2 else list(timings)[:2])
+        start = time.perf_counter()
+        if operation == 'upsert (nuevo)':
+            user, genres = next(new_users)
+            engine.upsert_user(f"nuevo_{user}", genres)
+        elif operation == 'upsert (edición)':
+            engine.upsert_user(rng.choice(users), rng.sample(vocabulary, rng.randint(1, 8)))
+        else:
+            engine.remove_user(rng.choice(users))
+        timings[operation].append(time.perf_counter() - start)
+
+    # Comparar con el cálculo desde cero sobre el estado final
+    store = engine.user_preferences
+    condensed = SimilarityEngine(engine.ontology_index).condensed_distances(store)
+    max_diff = float(np.max(np.abs(condensed - engine.similarity_matrix.condensed))) if len(condensed) else 0.0
+    neighbors, _ = TopKIndex(store, engine.ontology_index).top_k_all(k)
+    mismatches = int((neighbors != engine.neighbor_lists.neighbors).any(axis=1).sum())
+    assert max_diff < 1e-6, f"La matriz condensada no coincide (diferencia {max_diff})"
+    assert mismatches == 0, f"{mismatches} listas de vecinos no coinciden"
+
+    print(f"Usuarios iniciales:         {n_users} (finales {len(store)})")
+    print(f"Reconstrucción completa:    {full_time:.3f} s")
+    for operation, values in timings.items():
+        if values:
+            print(f"{operation + ':':<28}{np.mean(values) * 1e3:.2f} ms de media ({len(values)} cambios)")
+    print(f"Cambios pendientes:         {engine.pending_changes} "
+          f"(re-clustering {'pendiente' if engine.clusters_stale() else 'no necesario'})")
+    print(f"Diferencia máxima:          {max_diff:.1e}, listas distintas: {mismatches}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 3000, int(sys.argv[2]) if len(sys.argv) > 2 else 100)
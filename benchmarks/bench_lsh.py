@@ -0,0 +1,52 @@
+"""Benchmark del índice MinHash + LSH: recall@k y latencia de consulta
+
+Uso: python benchmarks/bench_lsh.py [n_usuarios] [k]
+"""
+import sys
+import time
+
+import numpy as np
+
+from reference import default_ontology_and_stem, random_preferences
+from engine import PreferenceEngine
+from lsh import LSHIndex, recall_at_k
+from ontology import OntologyIndex
+from similarity import SimilarityEngine
+
+CONFIGS = [(32, 8), (64, 16), (64, 32), (128, 32), (128, 64)]
+
+
+def main(n_users, k, n_queries=200):
+    ontology, stem = default_ontology_and_stem()
+    prefs = random_preferences(ontology, n_users)
+    users = list(prefs)
+
+    # Motor sin interfaz para re-ordenar con la similitud mejorada exacta
+    engine = PreferenceEngine()
+    engine.ontology_index = OntologyIndex(ontology, stem, extra_genres=set().union(*prefs.values()))
+
+    similarity = SimilarityEngine(engine.ontology_index).similarity_matrix(prefs)
+    queries = np.random.default_rng(0).choice(n_users, size=min(n_queries, n_users), replace=False)
+    exact = {}
+    for i in queries:
+        row = similarity[i].copy()
+        row[i] = -np.inf
+        order = np.argsort(-row, kind='stable')[:k]
+        exact[i] = [(users[j], row[j]) for j in order]
+
+    print(f"{n_users} usuarios, {len(queries)} consultas, k={k}\n")
+    print(f"{'firmas':>7} {'bandas':>7} {'construcción (s)':>17} {'recall@k':>9} {'candidatos':>11} {'latencia (ms)':>14}")
+    for num_perm, bands in CONFIGS:
+        index = LSHIndex(engine.enhanced_jaccard_similarity, ontology, num_perm=num_perm, bands=bands)
+        start = time.perf_counter()
+        index.insert_many(prefs)
+        build_time = time.perf_counter() - start
+
+        recalls = [recall_at_k(index.query_user(users[i], k=k), exact[i], k) for i in queries]
+        stats = index.stats()
+        print(f"{num_perm:>7} {bands:>7} {build_time:>17.3f} {np.mean(recalls):>9.3f} "
+              f"{stats['mean_candidates']:>11.1f} {stats['mean_latency_ms']:>14.3f}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000, int(sys.argv[2]) if len(sys.argv) > 2 else 5)
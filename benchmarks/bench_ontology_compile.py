@@ -0,0 +1,86 @@
+"""Benchmark del compilador de ontologías con jerarquías grandes y profundas
+
+Genera ontologías JSON anidadas de varios tamaños y mide la compilación, la
+carga de la forma binaria en caché y la construcción de OntologyIndex con un
+vocabulario de usuarios tomado de la ontología. Comprueba además que el
+cierre transitivo coincide con recorrer los padres.
+
+Uso: python benchmarks/bench_ontology_compile.py [n_nodos ...]
+"""
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+from reference import default_ontology_and_stem
+from ontology import OntologyIndex
+from ontology_compiler import load_ontology
+
+VOCABULARY_SIZE = 2000
+
+
+def generate_ontology(n_nodes, branching=6, cross_links=0.05, seed=42):
+    """Ontología anidada de n_nodes géneros; una fracción cuelga también de un segundo padre"""
+    rng = random.Random(seed)
+    root = {}
+    frontier = [root]
+    names = []
+    while len(names) < n_nodes:
+        node = frontier.pop(0)
+        for _ in range(rng.randint(1, branching)):
+            if len(names) == n_nodes:
+                break
+            name = f"genero_{len(names)}"
+            names.append(name)
+            node[name] = {}
+            frontier.append(node[name])
+    # Hijos compartidos en formato de lista: {"name": ..., "children": [...]}
+    extra = [{'name': rng.choice(names[:len(names) // 2]), 'children': [rng.choice(names[len(names) // 2:])]}
+             for _ in range(int(n_nodes * cross_links))]
+    return {'raiz': root, 'compartidos': extra}, names
+
+
+def main(sizes):
+    _, stem = default_ontology_and_stem()
+    print(f"{'nodos':>7} {'JSON (KiB)':>11} {'profundidad':>12} {'compilar (ms)':>14} {'en caché (ms)':>14} "
+          f"{'índice (ms)':>12} {'tabla (MiB)':>12}")
+    with tempfile.TemporaryDirectory() as directory:
+        for n_nodes in sizes:
+            data, names = generate_ontology(n_nodes)
+            path = os.path.join(directory, f"{n_nodes}.json")
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+
+            start = time.perf_counter()
+            compiled = load_ontology(path, directory)
+            compile_time = time.perf_counter() - start
+            start = time.perf_counter()
+            cached = load_ontology(path, directory)
+            cached_time = time.perf_counter() - start
+            assert dict(cached) == dict(compiled)
+
+            # Cierre transitivo frente a subir por los padres
+            rng = random.Random(1)
+            for genre in rng.sample(names, min(200, len(names))):
+                pending, ancestors = [genre], set()
+                while pending:
+                    node = cached.genre_ids[pending.pop()]
+                    for parent in cached.parent_ids(node):
+                        if cached.genres[parent] not in ancestors:
+                            ancestors.add(cached.genres[parent])
+                            pending.append(cached.genres[parent])
+                assert ancestors == cached.ancestors_of(genre)
+
+            vocabulary = rng.sample(names, min(VOCABULARY_SIZE, len(names)))
+            start = time.perf_counter()
+            index = OntologyIndex(cached, stem, extra_genres=vocabulary)
+            index_time = time.perf_counter() - start
+            print(f"{n_nodes:>7} {os.path.getsize(path) / 1024:>11.0f} {cached.stats()['max_depth']:>12} "
+                  f"{compile_time * 1e3:>14.1f} {cached_time * 1e3:>14.1f} {index_time * 1e3:>12.1f} "
+                  f"{index.weights.nbytes / 2**20:>12.1f}")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [1000, 10000, 50000])
@@ -0,0 +1,68 @@
+"""Benchmark de la matriz de similitud por teselas en memmap
+
+Mide el tiempo por tipo de dato y número de hilos, comprueba la exactitud
+frente a SimilarityEngine y la reanudación tras interrumpir el cálculo.
+
+Uso: python benchmarks/bench_outofcore.py [n_usuarios] [lado_tesela]
+"""
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from reference import default_ontology_and_stem, random_preferences
+from ontology import OntologyIndex
+from outofcore import compute_memmap_similarity
+from similarity import SimilarityEngine
+from store import PreferenceStore
+
+
+class Interrupted(Exception):
+    pass
+
+
+def main(n_users, tile_size):
+    ontology, stem = default_ontology_and_stem()
+    store = PreferenceStore.from_preferences(random_preferences(ontology, n_users))
+    ontology_index = OntologyIndex(ontology, stem, extra_genres=store.genres)
+    expected = SimilarityEngine(ontology_index).similarity_matrix(store) if n_users <= 10000 else None
+
+    with tempfile.TemporaryDirectory() as directory:
+        print(f"{n_users} usuarios, teselas de {tile_size}\n")
+        print(f"{'dtype':>8} {'hilos':>6} {'tiempo (s)':>11} {'disco (MiB)':>12} {'error máx.':>11}")
+        for dtype in ('float32', 'float16'):
+            for workers in sorted({1, os.cpu_count() or 1}):
+                path = os.path.join(directory, f"{dtype}_{workers}.dat")
+                start = time.perf_counter()
+                matrix = compute_memmap_similarity(store, ontology_index, path, dtype=dtype,
+                                                   tile_size=tile_size, workers=workers)
+                elapsed = time.perf_counter() - start
+                error = float(np.max(np.abs(matrix.matrix - expected))) if expected is not None else float('nan')
+                print(f"{dtype:>8} {workers:>6} {elapsed:>11.2f} {os.path.getsize(path) / 2**20:>12.1f} "
+                      f"{error:>11.1e}")
+
+        # Interrumpir a mitad de cálculo y reanudar
+        path = os.path.join(directory, 'reanudar.dat')
+
+        def interrupt(done, total):
+            if done == total // 2:
+                raise Interrupted()
+
+        try:
+            compute_memmap_similarity(store, ontology_index, path, tile_size=tile_size, workers=1,
+                                      progress=interrupt)
+        except Interrupted:
+            pass
+        resumed = []
+        matrix = compute_memmap_similarity(store, ontology_index, path, tile_size=tile_size, workers=1,
+                                           progress=lambda done, total: resumed.append(total))
+        n_tiles = -(-n_users // tile_size)
+        print(f"\nReanudación: {resumed[-1] if resumed else 0} de {n_tiles * (n_tiles + 1) // 2} teselas recalculadas")
+        if expected is not None:
+            assert np.allclose(matrix.matrix, expected, atol=1e-6)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 8000, int(sys.argv[2]) if len(sys.argv) > 2 else 1024)
@@ -0,0 +1,46 @@
+"""Benchmark de escalado fuerte: vector condensado con 1/2/4/8/16 procesos
+
+El tamaño del problema es fijo; con un proceso se usa el cálculo secuencial.
+Comprueba además que todas las ejecuciones en paralelo son idénticas bit a
+bit y coinciden con el cálculo secuencial.
+
+Uso: python benchmarks/bench_parallel.py [n_usuarios] [lado_tesela]
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+from reference import default_ontology_and_stem, random_preferences
+from ontology import OntologyIndex
+from parallel import parallel_condensed_distances
+from store import PreferenceStore
+
+WORKERS = (1, 2, 4, 8, 16)
+
+
+def main(n_users, tile_size):
+    ontology, stem = default_ontology_and_stem()
+    store = PreferenceStore.from_preferences(random_preferences(ontology, n_users))
+    ontology_index = OntologyIndex(ontology, stem, extra_genres=store.genres)
+
+    print(f"{n_users} usuarios, teselas de {tile_size}, {os.cpu_count()} CPU disponibles\n")
+    print(f"{'procesos':>9} {'tiempo (s)':>11} {'aceleración':>12} {'eficiencia':>11}")
+    baseline = serial = reference = None
+    for workers in WORKERS:
+        start = time.perf_counter()
+        condensed = parallel_condensed_distances(store, ontology_index, workers=workers, tile_size=tile_size)
+        elapsed = time.perf_counter() - start
+        if baseline is None:
+            baseline, serial = elapsed, condensed
+        elif reference is None:
+            reference = condensed
+        else:
+            assert np.array_equal(condensed, reference), "Resultado distinto según el número de procesos"
+        assert np.max(np.abs(condensed - serial)) < 1e-6
+        print(f"{workers:>9} {elapsed:>11.2f} {baseline / elapsed:>12.2f} {baseline / elapsed / workers:>11.0%}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10000, int(sys.argv[2]) if len(sys.argv) > 2 else 1024)
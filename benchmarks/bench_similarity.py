@@ -0,0 +1,46 @@
+"""Benchmark: matriz de similitud con bucle por pares vs. motor vectorizado
+
+Uso: python benchmarks/bench_similarity.py [n_usuarios ...]
+"""
+import sys
+import time
+
+import numpy as np
+
+from reference import default_ontology_and_stem, random_preferences, loop_similarity_matrix
+from ontology import OntologyIndex
+from similarity import SimilarityEngine, CondensedSimilarity
+
+
+def main(sizes):
+    ontology, stem = default_ontology_and_stem()
+    engine = SimilarityEngine(OntologyIndex(ontology, stem))
+
+    print(f"{'usuarios':>10} {'bucle (s)':>12} {'vectorizado (s)':>16} {'condensado (s)':>15} "
+          f"{'aceleración':>12} {'dif. máx.':>12}")
+    for n_users in sizes:
+        prefs = random_preferences(ontology, n_users)
+
+        start = time.perf_counter()
+        reference = loop_similarity_matrix(prefs, ontology, stem)
+        loop_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        result = engine.similarity_matrix(prefs)
+        fast_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        condensed = engine.condensed_distances(prefs)
+        condensed_time = time.perf_counter() - start
+
+        max_diff = float(np.abs(reference - result).max())
+        assert max_diff < 1e-12, f"Los resultados no coinciden (diferencia {max_diff})"
+        # El vector condensado se guarda en float32
+        condensed_diff = float(np.abs(reference - CondensedSimilarity(condensed).to_dense()).max())
+        assert condensed_diff < 1e-6, f"El vector condensado no coincide (diferencia {condensed_diff})"
+        print(f"{n_users:>10} {loop_time:>12.3f} {fast_time:>16.4f} {condensed_time:>15.4f} "
+              f"{loop_time / fast_time:>11.1f}x {max_diff:>12.1e}")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [100, 200, 400])
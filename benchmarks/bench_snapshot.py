@@ -0,0 +1,51 @@
+"""Benchmark de la instantánea binaria frente a leer y normalizar el CSV
+
+Uso: python benchmarks/bench_snapshot.py [n_usuarios ...]
+"""
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from reference import default_ontology_and_stem
+from synthetic import generate_csv
+from ingest import CSVIngestor
+from snapshot import file_source, load_snapshot, save_snapshot
+
+
+def main(sizes):
+    ontology, _ = default_ontology_and_stem()
+    print(f"{'usuarios':>9} {'CSV (MiB)':>10} {'ingesta (s)':>12} {'guardar (s)':>12} {'.snap (MiB)':>12} "
+          f"{'carga (ms)':>11} {'sin verificar (ms)':>19}")
+    with tempfile.TemporaryDirectory() as directory:
+        for n_users in sizes:
+            csv_path = os.path.join(directory, f"{n_users}.csv")
+            snapshot_path = os.path.join(directory, f"{n_users}.snap")
+            generate_csv(csv_path, n_users)
+
+            start = time.perf_counter()
+            result = CSVIngestor(workers=1).ingest(csv_path)
+            ingest_time = time.perf_counter() - start
+            start = time.perf_counter()
+            save_snapshot(snapshot_path, result, ontology, file_source(csv_path))
+            save_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            loaded = load_snapshot(snapshot_path, ontology, file_source(csv_path), verify=True)
+            load_time = time.perf_counter() - start
+            start = time.perf_counter()
+            load_snapshot(snapshot_path, ontology)
+            unverified_time = time.perf_counter() - start
+
+            assert loaded.store.users == result.store.users and loaded.store.genres == result.store.genres
+            assert np.array_equal(loaded.store.indptr, result.store.indptr)
+            assert np.array_equal(loaded.store.indices, result.store.indices)
+            print(f"{n_users:>9} {os.path.getsize(csv_path) / 2**20:>10.1f} {ingest_time:>12.2f} {save_time:>12.2f} "
+                  f"{os.path.getsize(snapshot_path) / 2**20:>12.1f} {load_time * 1e3:>11.1f} "
+                  f"{unverified_time * 1e3:>19.1f}")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [10000, 100000, 1000000])
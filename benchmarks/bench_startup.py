@@ -0,0 +1,49 @@
+"""Benchmark de arranque en frío: tiempo de importación y de inicialización
+
+Cada caso se ejecuta en un intérprete nuevo para medir el coste real de un
+proceso de corta duración (mediana de varias repeticiones).
+
+Uso: python benchmarks/bench_startup.py [repeticiones]
+"""
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CASES = [
+    ('python vacío', "pass"),
+    ('import engine', "import engine"),
+    ('import main', "import main"),
+    ('import cli', "import cli"),
+    ('PreferenceEngine()', "from engine import PreferenceEngine; PreferenceEngine()"),
+    ('NLPProcessor()', "from nlp import NLPProcessor; NLPProcessor()"),
+    ('lemmatize (spaCy)', "from nlp import NLPProcessor; NLPProcessor().lemmatize('peliculas')"),
+    ('cli muestra (20 usuarios)', None),
+]
+
+
+def run_case(code, repeats):
+    """Mediana del tiempo de pared de un intérprete nuevo ejecutando code"""
+    if code is None:
+        command = [sys.executable, 'cli.py', 'muestra_usuarios_nlp.csv', '-o', os.devnull]
+    else:
+        command = [sys.executable, '-c', code]
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        subprocess.run(command, cwd=ROOT, capture_output=True, check=True)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def main(repeats):
+    print(f"{'caso':<28} {'mediana (ms)':>13}")
+    for name, code in CASES:
+        print(f"{name:<28} {run_case(code, repeats) * 1e3:>13.1f}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
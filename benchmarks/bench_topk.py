@@ -0,0 +1,59 @@
+"""Benchmark: top-k con fila completa de la matriz vs. índice invertido exacto
+
+Uso: python benchmarks/bench_topk.py [n_usuarios] [k]
+"""
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from reference import default_ontology_and_stem, random_preferences
+from neighbors import TopKIndex
+from ontology import OntologyIndex
+from similarity import SimilarityEngine, CondensedSimilarity
+
+
+def main(n_users, k, n_queries=200):
+    ontology, stem = default_ontology_and_stem()
+    prefs = random_preferences(ontology, n_users)
+    users = list(prefs)
+    ontology_index = OntologyIndex(ontology, stem)
+    queries = np.random.default_rng(0).choice(n_users, size=min(n_queries, n_users), replace=False)
+
+    # Camino anterior: matriz condensada completa y ordenación de la fila
+    start = time.perf_counter()
+    matrix = CondensedSimilarity(SimilarityEngine(ontology_index).condensed_distances(prefs))
+    matrix_time = time.perf_counter() - start
+    start = time.perf_counter()
+    for i in queries:
+        row = matrix[i]
+        sorted((users[j], row[j]) for j in range(n_users) if j != i)
+    row_time = (time.perf_counter() - start) / len(queries)
+
+    start = time.perf_counter()
+    index = TopKIndex(prefs, ontology_index)
+    index_time = time.perf_counter() - start
+    start = time.perf_counter()
+    for i in queries:
+        index.top_k_similar(users[i], k)
+    query_time = (time.perf_counter() - start) / len(queries)
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    neighbors, _ = index.top_k_all(k)
+    batch_time = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f"{n_users} usuarios, k={k}")
+    print(f"Matriz condensada:         {matrix_time:.3f} s, {matrix.condensed.nbytes / 2**20:.1f} MiB")
+    print(f"Consulta con fila + sort:  {row_time * 1e3:.3f} ms")
+    print(f"Índice invertido:          {index_time:.3f} s de construcción")
+    print(f"Consulta top_k_similar:    {query_time * 1e3:.3f} ms")
+    print(f"Top-k de todos:            {batch_time:.3f} s, pico {peak / 2**20:.1f} MiB, "
+          f"resultado {neighbors.nbytes / 2**20:.2f} MiB")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10000, int(sys.argv[2]) if len(sys.argv) > 2 else 5)
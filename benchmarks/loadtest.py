@@ -0,0 +1,92 @@
+"""Prueba de carga del servicio de recomendaciones en localhost
+
+Abre varias conexiones persistentes que consultan usuarios al azar durante un
+tiempo fijo y muestra las latencias vistas por el cliente, el QPS y las
+métricas del propio servicio.
+
+Uso: python benchmarks/loadtest.py usuarios.csv [--connections 64] [--duration 10] [--port 8080]
+     (arrancar antes: python service.py usuarios.csv --port 8080)
+"""
+import argparse
+import asyncio
+import csv
+import json
+import random
+import time
+from urllib.parse import quote
+
+import numpy as np
+
+
+def read_users(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return [row[0].strip() for row in csv.reader(f) if row and row[0].strip()]
+
+
+async def request(reader, writer, path):
+    """Enviar un GET por una conexión persistente y leer la respuesta JSON"""
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode('latin-1'))
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        if name.lower() == 'content-length':
+            length = int(value)
+    return status, json.loads(await reader.readexactly(length))
+
+
+async def client(host, port, users, routes, deadline, latencies, errors, rng):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while time.perf_counter() < deadline:
+            path = f"{rng.choice(routes)}?user={quote(rng.choice(users))}"
+            start = time.perf_counter()
+            status, _ = await request(reader, writer, path)
+            latencies.append(time.perf_counter() - start)
+            if status != 200:
+                errors.append(status)
+    finally:
+        writer.close()
+
+
+async def main(args):
+    users = read_users(args.users)
+    routes = {'similar': ['/similar'], 'genres': ['/genres'], 'mixto': ['/similar', '/genres']}[args.route]
+    latencies, errors = [], []
+    start = time.perf_counter()
+    deadline = start + args.duration
+    await asyncio.gather(*(
+        client(args.host, args.port, users, routes, deadline, latencies, errors, random.Random(args.seed + i))
+        for i in range(args.connections)
+    ))
+    elapsed = time.perf_counter() - start
+
+    reader, writer = await asyncio.open_connection(args.host, args.port)
+    _, metrics = await request(reader, writer, '/metrics')
+    writer.close()
+
+    latencies = np.array(latencies) * 1e3
+    print(f"Conexiones:      {args.connections}, rutas {', '.join(routes)}, {elapsed:.1f} s")
+    print(f"Consultas:       {len(latencies)} ({len(errors)} errores)")
+    print(f"QPS (cliente):   {len(latencies) / elapsed:.0f}")
+    if len(latencies):
+        print(f"Latencia (ms):   p50 {np.percentile(latencies, 50):.2f}  p99 {np.percentile(latencies, 99):.2f}  "
+              f"máx. {latencies.max():.2f}")
+    print(f"Servicio:        p50 {metrics['p50_ms']} ms, p99 {metrics['p99_ms']} ms, "
+          f"QPS {metrics['qps']}, lote medio {metrics['mean_batch']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prueba de carga del servicio de recomendaciones")
+    parser.add_argument('users', help="CSV de preferencias (usuario en la primera columna) (el mismo que carga el servicio)")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--connections', type=int, default=64)
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--route', choices=('similar', 'genres', 'mixto'), default='mixto')
+    parser.add_argument('--seed', type=int, default=42)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,80 @@
+"""Implementaciones de referencia y datos de prueba compartidos por los benchmarks"""
+import os
+import random
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engine import create_genre_ontology
+from nlp import NLPProcessor
+
+
+def default_ontology_and_stem():
+    """Ontología por defecto de la aplicación y función de stemming del procesador NLP"""
+    ontology = create_genre_ontology()
+    return ontology, NLPProcessor().stemmer.stem
+
+
+def random_preferences(ontology, n_users, seed=42):
+    """Generar preferencias aleatorias sobre el vocabulario de la ontología"""
+    rng = random.Random(seed)
+    vocabulary = sorted(set(ontology) | set().union(*ontology.values()))
+    # Géneros fuera de la ontología para cubrir la similitud léxica
+    vocabulary += ['deportes', 'deportivo', 'competencia', 'culto', 'surrealista', 'catastrofe']
+    return {
+        f"usuario{i + 1}": set(rng.sample(vocabulary, rng.randint(1, 8)))
+        for i in range(n_users)
+    }
+
+
+def reference_enhanced_jaccard(set1, set2, ontology, stem):
+    """Cálculo original por pares, recorriendo la ontología en cada comparación"""
+    intersection = len(set1.intersection(set2))
+    union = len(set1.union(set2))
+    basic_similarity = intersection / union if union > 0 else 0
+
+    semantic_score = 0
+    total_comparisons = 0
+    for genre1 in set1:
+        for genre2 in set2:
+            total_comparisons += 1
+            if genre1 == genre2:
+                semantic_score += 1
+            else:
+                related = False
+                if genre1 in ontology and genre2 in ontology.get(genre1, set()):
+                    semantic_score += 0.8
+                    related = True
+                elif genre2 in ontology and genre1 in ontology.get(genre2, set()):
+                    semantic_score += 0.8
+                    related = True
+
+                if not related:
+                    for parent, children in ontology.items():
+                        if genre1 in children and genre2 in children:
+                            semantic_score += 0.6
+                            break
+                    else:
+                        if stem(genre1) == stem(genre2):
+                            semantic_score += 0.4
+
+    semantic_similarity = semantic_score / total_comparisons if total_comparisons > 0 else 0
+    return 0.6 * basic_similarity + 0.4 * semantic_similarity
+
+
+def loop_similarity_matrix(user_preferences, ontology, stem):
+    """Matriz de similitud original con doble bucle"""
+    users = list(user_preferences.keys())
+    n_users = len(users)
+    matrix = np.zeros((n_users, n_users))
+    for i in range(n_users):
+        for j in range(n_users):
+            if i == j:
+                matrix[i][j] = 1.0
+            else:
+                matrix[i][j] = reference_enhanced_jaccard(
+                    user_preferences[users[i]], user_preferences[users[j]], ontology, stem
+                )
+    return matrix
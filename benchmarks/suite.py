@@ -0,0 +1,257 @@
+"""Suite de benchmarks reproducible por etapas con salida JSON y comparación entre ejecuciones
+
+Para cada tamaño se genera (o reutiliza) un CSV sintético y se miden el
+tiempo y el pico de memoria residente de cada etapa: ingesta, normalización
+de géneros, vector condensado de similitud, clustering y top-k.
+
+Uso:
+    python benchmarks/suite.py run [--sizes 1000 10000 100000 1000000] [-o resultados.json]
+    python benchmarks/suite.py compare base.json nuevo.json [--tolerance 0.15]
+"""
+import argparse
+import csv
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+from reference import default_ontology_and_stem
+from synthetic import generate_csv
+
+DEFAULT_SIZES = (1000, 10000)
+STAGES = ('ingest', 'normalize_genre', 'similarity', 'clustering', 'topk')
+
+# Por debajo de este tiempo las diferencias entre ejecuciones son ruido
+MIN_SECONDS = 0.05
+
+
+def _rss_bytes():
+    """Memoria residente actual del proceso (None si /proc no está disponible)"""
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except Exception:
+        return None
+
+
+class StageMeter:
+    """Tiempo de pared, CPU y pico de memoria residente de una etapa
+
+    Un hilo muestrea /proc/self/statm; así se cuentan también los buffers
+    de numpy/scipy, pero no la memoria de los procesos trabajadores.
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.extra = {}
+
+    def __enter__(self):
+        self._stop = threading.Event()
+        self.baseline = self.peak = _rss_bytes()
+        if self.baseline is not None:
+            self._thread = threading.Thread(target=self._sample, daemon=True)
+            self._thread.start()
+        self._cpu = time.process_time()
+        self._start = time.perf_counter()
+        return self
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, _rss_bytes())
+
+    def __exit__(self, *exc):
+        self.seconds = time.perf_counter() - self._start
+        self.cpu_seconds = time.process_time() - self._cpu
+        self._stop.set()
+        if self.baseline is not None:
+            self._thread.join()
+            self.peak = max(self.peak, _rss_bytes())
+        return False
+
+    def result(self):
+        peak = None if self.baseline is None else round((self.peak - self.baseline) / 2**20, 2)
+        return dict({'seconds': round(self.seconds, 4), 'cpu_seconds': round(self.cpu_seconds, 4),
+                     'peak_mib': peak}, **self.extra)
+
+
+def _git_commit():
+    try:
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=root, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def run_size(path, n_users, args):
+    """Medir todas las etapas sobre el CSV sintético de n_users usuarios"""
+    from scipy.cluster.hierarchy import linkage, fcluster
+    from clustering import scalable_clusters, LINKAGE_THRESHOLD
+    from ingest import CSVIngestor
+    from neighbors import TopKIndex
+    from nlp import NLPProcessor
+    from ontology import OntologyIndex
+    from parallel import parallel_condensed_distances
+
+    results = {}
+    ontology, stem = default_ontology_and_stem()
+    nlp_processor = NLPProcessor()
+
+    # Ingesta equivalente a load_csv (normaliza cada celda distinta una vez)
+    with StageMeter() as meter:
+        ingested = CSVIngestor(nlp_processor=nlp_processor, workers=args.workers).ingest(path)
+    meter.extra.update(rows=ingested.rows, cells=ingested.cells, unique_cells=ingested.unique_cells)
+    results['ingest'] = meter.result()
+    store = ingested.store
+
+    # Normalización sin caché de todas las celdas de la primera parte del fichero
+    with open(path, 'r', encoding='utf-8') as f:
+        # Solo se leen las filas necesarias, no el fichero entero
+        cells = list(itertools.islice((cell for row in csv.reader(f) for cell in row[1:]), args.normalize_cells))
+    nlp_processor.clear_cache()
+    with StageMeter() as meter:
+        for cell in cells:
+            nlp_processor._normalize_genre(cell)
+    meter.extra.update(cells=len(cells))
+    results['normalize_genre'] = meter.result()
+
+    ontology_index = OntologyIndex(ontology, stem, extra_genres=store.genres)
+    condensed = None
+    if n_users <= args.max_exact:
+        with StageMeter() as meter:
+            condensed = parallel_condensed_distances(store, ontology_index, workers=args.workers)
+        meter.extra.update(pairs=len(condensed))
+        results['similarity'] = meter.result()
+    else:
+        results['similarity'] = {'skipped': f"más de {args.max_exact} usuarios"}
+
+    with StageMeter() as meter:
+        if condensed is not None:
+            clusters = fcluster(linkage(condensed, method='ward'), t=LINKAGE_THRESHOLD, criterion='distance')
+            mode = 'linkage'
+        else:
+            clusters, _ = scalable_clusters(store, ontology_index, mode='minhash', genre_ontology=ontology)
+            mode = 'minhash'
+    meter.extra.update(mode=mode, clusters=int(len(np.unique(clusters))))
+    results['clustering'] = meter.result()
+    del condensed
+
+    # Con muchos usuarios se consulta una muestra fija; el coste por usuario sigue siendo comparable
+    with StageMeter() as meter:
+        index = TopKIndex(store, ontology_index)
+        if n_users <= args.max_topk:
+            index.top_k_all(args.k)
+            queried = n_users
+        else:
+            sample = np.random.default_rng(args.seed).choice(n_users, size=args.topk_sample, replace=False)
+            for i in sample:
+                index._top_k_row(int(i), args.k)
+            queried = len(sample)
+    meter.extra.update(users=queried, ms_per_user=round(meter.seconds * 1e3 / queried, 4))
+    results['topk'] = meter.result()
+    return results
+
+
+def run(args):
+    report = {
+        'meta': {
+            'date': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'commit': _git_commit(),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'args': {key: value for key, value in vars(args).items() if key != 'command'},
+        },
+        'results': {},
+    }
+    data_dir = args.data_dir or tempfile.mkdtemp(prefix='jaccard_bench_')
+    os.makedirs(data_dir, exist_ok=True)
+    for n_users in args.sizes:
+        path = os.path.join(data_dir, f"sintetico_{n_users}_{args.seed}.csv")
+        if not os.path.exists(path):
+            start = time.perf_counter()
+            generate_csv(path, n_users, seed=args.seed)
+            print(f"Generado {path} en {time.perf_counter() - start:.1f} s", file=sys.stderr)
+        results = run_size(path, n_users, args)
+        report['results'][str(n_users)] = results
+        for stage in STAGES:
+            values = results[stage]
+            if 'skipped' in values:
+                print(f"{n_users:>9} {stage:<16} omitida ({values['skipped']})", file=sys.stderr)
+            else:
+                print(f"{n_users:>9} {stage:<16} {values['seconds']:>9.3f} s {values['peak_mib']:>9} MiB",
+                      file=sys.stderr)
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"Resultados guardados en {args.output}", file=sys.stderr)
+    return 0
+
+
+def compare(args):
+    """Comparar dos ficheros de resultados; devuelve 1 si alguna etapa empeora más que la tolerancia"""
+    with open(args.base, 'r', encoding='utf-8') as f:
+        base = json.load(f)['results']
+    with open(args.new, 'r', encoding='utf-8') as f:
+        new = json.load(f)['results']
+
+    regressions = 0
+    print(f"{'usuarios':>9} {'etapa':<16} {'base (s)':>9} {'nuevo (s)':>10} {'ratio':>7} "
+          f"{'base MiB':>9} {'nuevo MiB':>10}")
+    for size in sorted(set(base) & set(new), key=int):
+        for stage in STAGES:
+            old, current = base[size].get(stage, {}), new[size].get(stage, {})
+            if 'seconds' not in old or 'seconds' not in current:
+                continue
+            ratio = current['seconds'] / old['seconds'] if old['seconds'] else float('inf')
+            slower = ratio > 1 + args.tolerance and current['seconds'] - old['seconds'] > MIN_SECONDS
+            bigger = (old.get('peak_mib') is not None and current.get('peak_mib') is not None
+                      and current['peak_mib'] > old['peak_mib'] * (1 + args.tolerance) + 1)
+            flag = ' REGRESIÓN' if slower or bigger else ''
+            regressions += bool(flag)
+            print(f"{size:>9} {stage:<16} {old['seconds']:>9.3f} {current['seconds']:>10.3f} {ratio:>7.2f} "
+                  f"{old.get('peak_mib')!s:>9} {current.get('peak_mib')!s:>10}{flag}")
+    print(f"\n{regressions} regresiones (tolerancia {args.tolerance:.0%})")
+    return 1 if regressions else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks por etapas sobre datos sintéticos")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help="Ejecutar la suite y guardar los resultados en JSON")
+    run_parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES),
+                            help="Números de usuarios (p. ej. 1000 10000 100000 1000000)")
+    run_parser.add_argument('-o', '--output', default='benchmark_results.json')
+    run_parser.add_argument('--data-dir', default=None, help="Directorio donde guardar y reutilizar los CSV")
+    run_parser.add_argument('--seed', type=int, default=42)
+    run_parser.add_argument('--workers', type=int, default=None)
+    run_parser.add_argument('-k', type=int, default=5)
+    run_parser.add_argument('--max-exact', type=int, default=20000,
+                            help="Usuarios máximos para el vector condensado y el linkage exacto")
+    run_parser.add_argument('--max-topk', type=int, default=20000,
+                            help="Por encima se consulta solo una muestra de usuarios")
+    run_parser.add_argument('--topk-sample', type=int, default=2000)
+    run_parser.add_argument('--normalize-cells', type=int, default=200000,
+                            help="Celdas del fichero usadas para medir normalize_genre sin caché")
+
+    compare_parser = commands.add_parser('compare', help="Comparar dos ficheros de resultados")
+    compare_parser.add_argument('base')
+    compare_parser.add_argument('new')
+    compare_parser.add_argument('--tolerance', type=float, default=0.15)
+
+    args = parser.parse_args(argv)
+    return run(args) if args.command == 'run' else compare(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
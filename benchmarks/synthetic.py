@@ -0,0 +1,107 @@
+"""Generador reproducible de CSV sintéticos de preferencias
+
+Los géneros siguen una distribución tipo Zipf sobre el vocabulario de la
+ontología y una parte de las celdas lleva el mismo ruido que normaliza
+NLPProcessor: sinónimos, parónimos, acentos, mayúsculas, espacios,
+signos de puntuación, stop words y celdas vacías.
+
+Uso: python benchmarks/synthetic.py n_usuarios salida.csv [semilla]
+"""
+import sys
+
+import numpy as np
+
+from reference import default_ontology_and_stem
+from nlp import NLPProcessor
+
+# Géneros fuera de la ontología (similitud solo léxica o por raíz)
+EXTRA_GENRES = ['deportes', 'deportivo', 'competencia', 'culto', 'surrealista', 'catastrofe',
+                'mockumentary', 'espionaje']
+
+# Celdas que la ingesta descarta (stop words o de menos de tres letras)
+DISCARDED_CELLS = ['de', 'la', 'y', 'los', 'con', ' ']
+
+ACCENTS = str.maketrans({'a': 'á', 'e': 'é', 'i': 'í', 'o': 'ó', 'u': 'ú'})
+
+
+def _accented(genre):
+    """Acentuar la última vocal: 'accion' -> 'acción'"""
+    for position in range(len(genre) - 1, -1, -1):
+        if genre[position] in 'aeiou':
+            return genre[:position] + genre[position].translate(ACCENTS) + genre[position + 1:]
+    return genre
+
+
+def genre_variants(genre, nlp_processor):
+    """Formas ruidosas de un género que la normalización debe reconducir"""
+    variants = {genre.upper(), genre.capitalize(), f"  {genre} ", _accented(genre), f"{genre}!"}
+    variants.update(nlp_processor.synonyms.get(genre, []))
+    variants.update(nlp_processor.paronyms.get(genre, []))
+    variants.discard(genre)
+    return sorted(variants)
+
+
+def zipf_weights(n, exponent=1.1):
+    """Probabilidades proporcionales a 1 / rango^exponent"""
+    weights = 1.0 / np.arange(1, n + 1) ** exponent
+    return weights / weights.sum()
+
+
+def generate_rows(n_users, seed=42, noise=0.3, discarded=0.02, min_genres=1, max_genres=8,
+                  exponent=1.1, chunk_size=100000):
+    """Generar filas [usuario, celda, ...] por bloques, sin materializar el CSV en memoria"""
+    ontology, _ = default_ontology_and_stem()
+    nlp_processor = NLPProcessor()
+    vocabulary = sorted(set(ontology) | set().union(*ontology.values()) | set(EXTRA_GENRES))
+    rng = np.random.default_rng(seed)
+    # El orden de popularidad también depende de la semilla
+    vocabulary = [vocabulary[i] for i in rng.permutation(len(vocabulary))]
+    probabilities = zipf_weights(len(vocabulary), exponent)
+
+    variants = [genre_variants(genre, nlp_processor) for genre in vocabulary]
+    variant_table = np.array([variant for options in variants for variant in options], dtype=object)
+    variant_counts = np.array([len(options) for options in variants])
+    variant_offsets = np.concatenate([[0], np.cumsum(variant_counts)[:-1]])
+    canonical = np.array(vocabulary, dtype=object)
+    discarded_cells = np.array(DISCARDED_CELLS, dtype=object)
+
+    for start in range(0, n_users, chunk_size):
+        stop = min(start + chunk_size, n_users)
+        counts = rng.integers(min_genres, max_genres + 1, size=stop - start)
+        total = int(counts.sum())
+        # Muestreo sin reemplazo ponderado (truco de Gumbel): los primeros counts[i] géneros de cada fila
+        keys = np.log(probabilities) + rng.gumbel(size=(stop - start, len(vocabulary)))
+        ranked = np.argsort(-keys, axis=1)[:, :max_genres]
+        genre_ids = ranked[np.arange(max_genres) < counts[:, None]]
+        cells = canonical[genre_ids]
+
+        noisy = rng.random(total) < noise
+        choice = (rng.random(int(noisy.sum())) * variant_counts[genre_ids[noisy]]).astype(np.int64)
+        cells[noisy] = variant_table[variant_offsets[genre_ids[noisy]] + choice]
+        dropped = rng.random(total) < discarded
+        cells[dropped] = discarded_cells[rng.integers(0, len(discarded_cells), size=int(dropped.sum()))]
+
+        bounds = np.concatenate([[0], np.cumsum(counts)])
+        for user, (first, last) in enumerate(zip(bounds[:-1], bounds[1:]), start + 1):
+            yield [f"usuario{user}"] + cells[first:last].tolist()
+
+
+def generate_csv(path, n_users, seed=42, **options):
+    """Escribir un CSV sintético de n_users usuarios y devolver el número de celdas"""
+    import csv
+
+    cells = 0
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        for row in generate_rows(n_users, seed=seed, **options):
+            writer.writerow(row)
+            cells += len(row) - 1
+    return cells
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print(__doc__)
+        sys.exit(1)
+    n_cells = generate_csv(sys.argv[2], int(sys.argv[1]), seed=int(sys.argv[3]) if len(sys.argv) > 3 else 42)
+    print(f"{sys.argv[2]}: {sys.argv[1]} usuarios, {n_cells} celdas")
@@ -0,0 +1,179 @@
+import hashlib
+import json
+import os
+import shutil
+
+import numpy as np
+
+import instrumentation
+from ontology import EXACT_WEIGHT, DIRECT_WEIGHT, SIBLING_WEIGHT, STEM_WEIGHT
+
+# Cambiar al modificar el formato de las entradas o el cálculo de los resultados
+CACHE_VERSION = 3
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'jaccard_similarity')
+DEFAULT_MAX_BYTES = 1 << 30
+
+
+def fingerprint(store, genre_ontology, weights, *params):
+    """Huella SHA-256 de las preferencias normalizadas, la ontología, los pesos y los parámetros"""
+    digest = hashlib.sha256()
+    header = {
+        'version': CACHE_VERSION,
+        'weights': list(weights) + [EXACT_WEIGHT, DIRECT_WEIGHT, SIBLING_WEIGHT, STEM_WEIGHT],
+        # Los conjuntos de la ontología se ordenan para que la huella no dependa del orden
+        'ontology': {parent: sorted(children) for parent, children in sorted(genre_ontology.items())},
+        'genres': sorted(store.genres),
+        'params': [str(param) for param in params],
+    }
+    digest.update(json.dumps(header, sort_keys=True, ensure_ascii=False).encode('utf-8'))
+    digest.update('\0'.join(store.users).encode('utf-8'))
+    # Identificadores por orden alfabético y ordenados dentro de cada fila: el orden
+    # de internado de los géneros depende del recorrido de los conjuntos
+    rank = np.empty(len(store.genres), dtype=np.int32)
+    rank[np.argsort(np.array(store.genres, dtype=object))] = np.arange(len(store.genres), dtype=np.int32)
+    indices = rank[np.asarray(store.indices, dtype=np.int64)]
+    rows = np.repeat(np.arange(len(store.users)), store.sizes())
+    indices = indices[np.lexsort((indices, rows))]
+    digest.update(np.ascontiguousarray(store.indptr, dtype=np.int64).tobytes())
+    digest.update(indices.tobytes())
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """Caché en disco de resultados (.npy mapeados en memoria) con expulsión LRU por tamaño
+
+    Los ficheros auxiliares guardados en el mismo directorio (instantáneas,
+    ontologías compiladas, perfiles) cuentan para el límite y se expulsan
+    igual que los resultados. Las entradas fijadas con pin() (las que el
+    motor tiene mapeadas en memoria) no se expulsan.
+    """
+
+    def __init__(self, directory=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory or DEFAULT_CACHE_DIR
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.pinned = set()
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key)
+
+    def get(self, key):
+        """Arrays de una entrada abiertos con mmap, o None si no está en la caché"""
+        path = self._path(key)
+        if not os.path.isdir(path):
+            self.misses += 1
+            instrumentation.count('cache.misses')
+            return None
+        try:
+            arrays = {
+                name[:-4]: np.load(os.path.join(path, name), mmap_mode='r')
+                for name in os.listdir(path) if name.endswith('.npy')
+            }
+        except Exception as e:
+            print(f"Entrada de caché ilegible, se descarta: {e}")
+            self.invalidate(key)
+            self.misses += 1
+            instrumentation.count('cache.misses')
+            return None
+        # La fecha de modificación del directorio marca el último uso (LRU)
+        os.utime(path)
+        self.hits += 1
+        instrumentation.count('cache.hits')
+        return arrays
+
+    def put(self, key, arrays):
+        """Guardar arrays bajo una clave de forma atómica y aplicar el límite de tamaño"""
+        path = self._path(key)
+        tmp_path = f"{path}.tmp-{os.getpid()}"
+        os.makedirs(tmp_path, exist_ok=True)
+        for name, array in arrays.items():
+            np.save(os.path.join(tmp_path, name + '.npy'), np.asarray(array))
+        try:
+            os.replace(tmp_path, path)
+        except OSError:
+            # Otro proceso escribió la misma entrada antes
+            shutil.rmtree(tmp_path, ignore_errors=True)
+        self.evict()
+
+    def artifact_path(self, name):
+        """Ruta de un fichero o directorio auxiliar dentro de la caché; si ya existe se marca como usado
+
+        Lo que tenga varios ficheros que deban expulsarse juntos (la matriz en
+        disco y sus metadatos) debe ir en un subdirectorio propio.
+        """
+        path = self._path(name)
+        if os.path.exists(path):
+            os.utime(path)
+        return path
+
+    def _key_of(self, path):
+        """Clave de la entrada que contiene path, o None si está fuera del directorio de la caché"""
+        relative = os.path.relpath(os.path.abspath(path), os.path.abspath(self.directory))
+        if relative == os.curdir or relative.split(os.sep)[0] == os.pardir:
+            return None
+        return relative.split(os.sep)[0]
+
+    def pin(self, path):
+        """No expulsar la entrada que contiene path (un fichero abierto o mapeado en memoria)"""
+        key = self._key_of(path)
+        if key is not None:
+            self.pinned.add(key)
+
+    def unpin(self, path):
+        key = self._key_of(path)
+        if key is not None:
+            self.pinned.discard(key)
+
+    def invalidate(self, key=None):
+        """Borrar una entrada o, sin clave, toda la caché"""
+        keys = [key] if key is not None else self.keys()
+        for key in keys:
+            path = self._path(key)
+            if os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+    def keys(self):
+        """Claves de las entradas guardadas: resultados y ficheros auxiliares"""
+        return [name for name in os.listdir(self.directory) if '.tmp-' not in name]
+
+    def _entry_size(self, key):
+        path = self._path(key)
+        if not os.path.isdir(path):
+            return os.path.getsize(path)
+        return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+
+    def size(self):
+        """Bytes ocupados por todas las entradas"""
+        return sum(self._entry_size(key) for key in self.keys())
+
+    def evict(self):
+        """Expulsar las entradas usadas hace más tiempo hasta respetar max_bytes (salvo las fijadas)"""
+        entries = sorted((os.path.getmtime(self._path(key)), key) for key in self.keys())
+        total = sum(self._entry_size(key) for _, key in entries)
+        for _, key in entries:
+            if total <= self.max_bytes:
+                break
+            if key in self.pinned:
+                continue
+            total -= self._entry_size(key)
+            self.invalidate(key)
+
+    def stats(self):
+        """Estadísticas de la caché: entradas, tamaño y aciertos"""
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self.keys()),
+            'bytes': self.size(),
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
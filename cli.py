@@ -0,0 +1,164 @@
+"""Ejecución por lotes sin interfaz gráfica: carga, normalización, similitud, clustering y recomendaciones
+
+Uso: python cli.py usuarios.csv -o resultados.jsonl [--ontology ontology.json]
+                   [--workers N] [--backend auto|sparse|bitset]
+                   [--clustering auto|linkage|knn|minhash] [--top-k 5] [--neighbors exact|lsh]
+                   [--cache-dir DIR | --no-cache] [--clear-cache]
+                   [--matrix-path similitud.dat [--matrix-dtype float16|float32] [--tile-size 2048]]
+                   [--top-genres 5] [--genres-output generos.csv]
+                   [--snapshot preferencias.snap] [--verify-snapshot] [--metrics metricas.json] [--profile perfil.prof]
+
+La entrada también puede ser una instantánea .snap guardada con --snapshot.
+"""
+import argparse
+import json
+import sys
+import time
+
+import instrumentation
+from cache import ResultCache
+from engine import PreferenceEngine, CLUSTERING_MODES, NEIGHBOR_MODES
+from outofcore import OUT_OF_CORE_DTYPES
+from similarity import BACKENDS
+
+
+def parse_args(argv=None):
+    """Argumentos de la línea de comandos"""
+    parser = argparse.ArgumentParser(description="Similitud de preferencias de usuarios sin interfaz gráfica")
+    parser.add_argument('input', help="CSV de preferencias (usuario,género1,género2,...)")
+    parser.add_argument('-o', '--output', help="Fichero de resultados (por defecto, salida estándar)")
+    parser.add_argument('--format', choices=('jsonl', 'json'), default=None,
+                        help="Formato de salida (por defecto según la extensión; jsonl si no se reconoce)")
+    parser.add_argument('--ontology', help="Ontología en JSON (por defecto, la ontología incorporada)")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="Procesos para la normalización NLP y el cálculo de similitudes")
+    parser.add_argument('--backend', choices=('auto',) + tuple(BACKENDS), default='auto',
+                        help="Backend de similitud")
+    parser.add_argument('--clustering', choices=CLUSTERING_MODES, default='auto', help="Modo de clustering")
+    parser.add_argument('--top-k', type=int, default=5, help="Número de vecinos por usuario")
+    parser.add_argument('--neighbors', choices=NEIGHBOR_MODES, default='exact',
+                        help="Vecinos exactos o aproximados con MinHash + LSH (más rápido con muchos usuarios)")
+    parser.add_argument('--top-genres', type=int, default=None,
+                        help="Géneros recomendados por usuario, puntuados por la similitud de sus vecinos (5)")
+    parser.add_argument('--genres-output', default=None,
+                        help="Escribir solo los géneros recomendados de todos los usuarios en un CSV "
+                             "(usuario,género1,puntuación1,...) en lugar de los registros completos")
+    parser.add_argument('--cache-dir', default=None, help="Directorio de la caché de resultados")
+    parser.add_argument('--no-cache', action='store_true', help="No leer ni guardar resultados en la caché")
+    parser.add_argument('--clear-cache', action='store_true', help="Vaciar la caché antes de procesar")
+    parser.add_argument('--matrix-path', default=None,
+                        help="Memmap donde guardar la matriz n x n completa en los modos escalables")
+    parser.add_argument('--matrix-dtype', choices=OUT_OF_CORE_DTYPES, default='float32',
+                        help="Tipo de dato de la matriz en disco")
+    parser.add_argument('--tile-size', type=int, default=2048, help="Lado de las teselas de la matriz en disco")
+    parser.add_argument('--snapshot', default=None,
+                        help="Instantánea binaria de las preferencias normalizadas: se reutiliza si el CSV "
+                             "y la ontología no han cambiado y, si no, se crea")
+    parser.add_argument('--verify-snapshot', action='store_true',
+                        help="Comprobar la suma SHA-256 de la instantánea .snap de entrada (lee el fichero entero)")
+    parser.add_argument('--metrics', default=None,
+                        help="Guardar en JSON los tiempos por etapa y los contadores de la instrumentación")
+    parser.add_argument('--profile', default=None, help="Volcar un perfil de cProfile (formato pstats)")
+    return parser.parse_args(argv)
+
+
+def write_results(records, output, output_format):
+    """Escribir un registro JSON por usuario (jsonl) o una lista JSON"""
+    if output_format == 'jsonl':
+        for record in records:
+            output.write(json.dumps(record, ensure_ascii=False))
+            output.write('\n')
+    else:
+        json.dump(list(records), output, ensure_ascii=False, indent=2)
+        output.write('\n')
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.metrics or args.profile:
+        instrumentation.enable(profile=bool(args.profile))
+    engine, summary = instrumentation.profiled(run, args)
+    # Resumen legible por máquina en stderr para no mezclarlo con los resultados
+    print(json.dumps(summary, ensure_ascii=False), file=sys.stderr)
+
+    if args.metrics:
+        instrumentation.write_metrics(args.metrics, extra={
+            'summary': summary,
+            'nlp_cache': engine.nlp_processor.cache_stats(),
+            'ontology_index': engine.ontology_index.stats(),
+            'result_cache': engine.cache.stats() if engine.cache is not None else None,
+        })
+    if args.profile:
+        instrumentation.dump_profile(args.profile)
+    return 0
+
+
+def run(args):
+    """Ejecutar todas las etapas; devuelve el motor y el resumen de la ejecución"""
+    output_format = args.format
+    if output_format is None:
+        output_format = 'json' if args.output and args.output.endswith('.json') else 'jsonl'
+
+    timings = {}
+    start = time.perf_counter()
+    cache = None if args.no_cache else ResultCache(args.cache_dir)
+    if cache is not None and args.clear_cache:
+        cache.invalidate()
+    engine = PreferenceEngine(backend=args.backend, workers=args.workers, cache=cache,
+                              matrix_path=args.matrix_path, matrix_dtype=args.matrix_dtype, tile_size=args.tile_size,
+                              neighbor_mode=args.neighbors)
+    if args.ontology:
+        engine.genre_ontology = engine.load_ontology_from_file(args.ontology)
+    timings['setup'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    if args.input.endswith('.snap'):
+        result = engine.load_snapshot(args.input, verify=args.verify_snapshot)
+    else:
+        result = engine.load_csv(args.input, snapshot_path=args.snapshot)
+    timings['load'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    mode = engine.process(clustering=args.clustering)
+    timings['cluster'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    if args.genres_output:
+        from recommend import write_genre_recommendations
+
+        # Trabajo nocturno: solo la matriz de géneros recomendados, sin serializar registros JSON
+        genre_ids, scores = engine.genre_recommendations(k=args.top_k, m=args.top_genres)
+        write_genre_recommendations(args.genres_output, engine.user_preferences, genre_ids, scores)
+        timings['recommendations'] = time.perf_counter() - start
+        return engine, _summary(engine, result, mode, args.genres_output, timings)
+
+    records = engine.batch_recommendations(k=args.top_k, top_genres=args.top_genres)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            write_results(records, f, output_format)
+    else:
+        write_results(records, sys.stdout, output_format)
+    timings['recommendations'] = time.perf_counter() - start
+
+    return engine, _summary(engine, result, mode, args.output, timings)
+
+
+def _summary(engine, result, mode, output, timings):
+    """Resumen de la ejecución"""
+    return {
+        'users': len(engine.user_preferences),
+        'genres': len(result.genre_counts),
+        'rows': result.rows,
+        'clustering': mode,
+        'backend': engine.backend,
+        'neighbors': engine.neighbor_mode,
+        'clusters': len(set(engine.clusters.tolist())) if engine.clusters is not None else 0,
+        'cache_hit': engine.cache_hit,
+        'snapshot_hit': engine.snapshot_hit,
+        'output': output,
+        'timings': {name: round(seconds, 4) for name, seconds in timings.items()},
+    }
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,173 @@
+from collections import defaultdict
+
+import numpy as np
+from scipy import sparse
+from scipy.cluster.hierarchy import linkage, fcluster
+from scipy.sparse.csgraph import connected_components
+
+from engine import CLUSTERING_MODES
+from lsh import MinHasher, expand_genres
+from neighbors import TopKIndex
+from ontology_compiler import compile_ontology
+from similarity import SimilarityEngine
+from store import PreferenceStore
+
+# Umbral de corte de fcluster usado por el clustering jerárquico exacto
+LINKAGE_THRESHOLD = 0.7
+
+# Por encima de este número de usuarios el vector condensado no cabe en memoria
+EXACT_LINKAGE_MAX_USERS = 20000
+
+
+def exact_linkage_clusters(user_preferences, ontology_index, threshold=LINKAGE_THRESHOLD, backend='auto'):
+    """Clustering jerárquico exacto (Ward) sobre el vector condensado completo"""
+    condensed = SimilarityEngine(ontology_index, backend=backend).condensed_distances(user_preferences)
+    if len(condensed) == 0:
+        return np.ones(len(user_preferences), dtype=np.int32), None
+    linkage_matrix = linkage(condensed, method='ward')
+    return fcluster(linkage_matrix, t=threshold, criterion='distance'), linkage_matrix
+
+
+def knn_graph_clusters(user_preferences, ontology_index, k=10, max_distance=0.5, backend='auto'):
+    """Agrupación por enlace simple sobre el grafo de k vecinos más cercanos
+
+    Se conservan las aristas k-NN con distancia (1 - similitud) menor o
+    igual que max_distance y cada componente conexa es un cluster. La
+    memoria es O(n·k) en lugar de O(n²).
+    """
+    store = PreferenceStore.from_preferences(user_preferences)
+    n_users = len(store)
+    if n_users < 2:
+        return np.ones(n_users, dtype=np.int32)
+
+    neighbors, similarities = TopKIndex(store, ontology_index, backend=backend).top_k_all(k)
+    rows = np.repeat(np.arange(n_users), neighbors.shape[1])
+    keep = 1.0 - similarities.ravel().astype(np.float64) <= max_distance
+    # El corte del enlace simple a max_distance equivale a las componentes
+    # conexas del grafo con las aristas de distancia <= max_distance
+    graph = sparse.csr_matrix((np.ones(int(keep.sum())), (rows[keep], neighbors.ravel()[keep])),
+                              shape=(n_users, n_users))
+    _, labels = connected_components(graph, directed=False)
+    return _renumber(labels)
+
+
+def minhash_bucket_clusters(user_preferences, ontology_index, genre_ontology=None, num_perm=4,
+                            max_bucket_size=2000, min_bucket_size=16, threshold=LINKAGE_THRESHOLD, seed=1,
+                            backend='auto'):
+    """Pre-agrupación por cubetas MinHash y clustering Ward exacto dentro de cada cubeta
+
+    Cada usuario cae en la cubeta de su firma MinHash (sobre sus géneros
+    ampliados con sus ancestros en la ontología). Una firma exacta de
+    num_perm valores separa usuarios parecidos, así que las cubetas con menos
+    de min_bucket_size usuarios se unen a la cubeta de su vecino más similar
+    según el índice LSH por bandas. Las cubetas mayores que max_bucket_size se parten en
+    trozos para acotar la memoria a O(max_bucket_size²).
+
+    Es una aproximación del modo 'linkage': Ward no ve pares de usuarios de
+    cubetas distintas, por lo que salen algo más de clusters que con el
+    dendrograma global y más usuarios solos. Con 2000 usuarios sintéticos
+    salen ~1.1 veces los clusters y ~2 veces los usuarios solos (sin unir las
+    cubetas pequeñas, 1.4 y 4); tests/test_clustering.py acota la diferencia.
+    """
+    store = PreferenceStore.from_preferences(user_preferences)
+    n_users = len(store)
+    hasher = MinHasher(num_perm=num_perm, seed=seed)
+    ontology = compile_ontology(genre_ontology or {})
+    expanded = [expand_genres(store.genre_set(i), ontology) for i in range(n_users)]
+    signatures = hasher.signatures(expanded)
+
+    buckets = defaultdict(list)
+    for i, signature in enumerate(signatures):
+        buckets[signature.tobytes()].append(i)
+    buckets = _merge_small_buckets(store, ontology_index, ontology, list(buckets.values()), min_bucket_size)
+
+    engine = SimilarityEngine(ontology_index, backend=backend)
+    labels = np.zeros(n_users, dtype=np.int64)
+    next_label = 1
+    for members in buckets:
+        for start in range(0, len(members), max_bucket_size):
+            chunk = members[start:start + max_bucket_size]
+            if len(chunk) == 1:
+                labels[chunk[0]] = next_label
+                next_label += 1
+                continue
+            sub_store = PreferenceStore([store.users[i] for i in chunk], store.genres,
+                                        *_sub_rows(store, chunk))
+            condensed = engine.condensed_distances(sub_store)
+            sub_labels = fcluster(linkage(condensed, method='ward'), t=threshold, criterion='distance')
+            labels[chunk] = sub_labels + next_label - 1
+            next_label += int(sub_labels.max())
+    return _renumber(labels)
+
+
+def _merge_small_buckets(store, ontology_index, genre_ontology, buckets, min_size):
+    """Unir cada cubeta con menos de min_size usuarios a la cubeta de su vecino LSH más similar
+
+    Cada cubeta pequeña aporta una sola arista (su mejor vecino fuera de
+    ella), así que una componente conexa contiene como mucho una de las
+    cubetas grandes.
+    """
+    small = [label for label, members in enumerate(buckets) if len(members) < min_size]
+    if not small or len(store) < 2:
+        return buckets
+    from lsh import LSHNeighbors
+
+    neighbors = LSHNeighbors(store, ontology_index, genre_ontology)
+    labels = np.empty(len(store), dtype=np.int64)
+    for label, members in enumerate(buckets):
+        labels[members] = label
+    rows, cols = [], []
+    for label in small:
+        best, best_score = None, 0.0
+        for i in buckets[label]:
+            candidates = neighbors.candidates(i)
+            candidates = candidates[labels[candidates] != label]
+            if not len(candidates):
+                continue
+            scores = neighbors.exact.score(i, candidates)
+            j = int(np.argmax(scores))
+            if scores[j] > best_score:
+                best, best_score = int(candidates[j]), scores[j]
+        # Sin ningún candidato similar la cubeta se queda como está
+        if best is not None:
+            rows.append(label)
+            cols.append(labels[best])
+    graph = sparse.csr_matrix((np.ones(len(rows)), (rows, cols)), shape=(len(buckets), len(buckets)))
+    _, components = connected_components(graph, directed=False)
+    merged = defaultdict(list)
+    for label, members in enumerate(buckets):
+        merged[components[label]].extend(members)
+    return list(merged.values())
+
+
+def scalable_clusters(user_preferences, ontology_index, mode='auto', genre_ontology=None, backend='auto'):
+    """Clusters con el mismo formato que fcluster eligiendo el modo según el tamaño
+
+    Devuelve (clusters, linkage_matrix); linkage_matrix es None en los modos
+    escalables porque no existe un dendrograma global.
+    """
+    if mode not in CLUSTERING_MODES:
+        raise ValueError(f"Modo de clustering desconocido: {mode}")
+    if mode == 'auto':
+        mode = 'linkage' if len(user_preferences) <= EXACT_LINKAGE_MAX_USERS else 'minhash'
+
+    if mode == 'linkage':
+        return exact_linkage_clusters(user_preferences, ontology_index, backend=backend)
+    if mode == 'knn':
+        return knn_graph_clusters(user_preferences, ontology_index, backend=backend), None
+    return minhash_bucket_clusters(user_preferences, ontology_index, genre_ontology, backend=backend), None
+
+
+def _sub_rows(store, rows):
+    """indptr / indices de un subconjunto de filas del almacén"""
+    lengths = store.sizes()[rows]
+    indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=indptr[1:])
+    indices = np.concatenate([store.row(i) for i in rows]) if len(rows) else np.empty(0, dtype=np.int32)
+    return indptr, indices
+
+
+def _renumber(labels):
+    """Etiquetas consecutivas empezando en 1, como las de fcluster"""
+    _, labels = np.unique(labels, return_inverse=True)
+    return (labels + 1).astype(np.int32)
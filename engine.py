@@ -0,0 +1,544 @@
+import os
+
+import numpy as np
+
+import instrumentation
+from nlp import NLPProcessor
+from ontology import OntologyIndex
+from store import PreferenceStore
+
+# El clustering, los vecinos y la ingesta (scipy.cluster, nltk, ...) se importan
+# en el primer uso para que importar el motor sea casi instantáneo
+
+# Modos de clustering (clustering.scalable_clusters); aquí para no cargar scipy al leer las opciones
+CLUSTERING_MODES = ('auto', 'linkage', 'knn', 'minhash')
+
+# Vecinos exactos (TopKIndex) o aproximados con MinHash + LSH
+NEIGHBOR_MODES = ('exact', 'lsh')
+
+
+def create_genre_ontology():
+    """Crear una ontología semántica mejorada de géneros"""
+    ontology = {
+        'ciencia_ficcion': {'cyberpunk', 'distopia', 'espacial', 'alienigenas', 'tecnologia', 'futuro', 'scifi'},
+        'terror': {'paranormal', 'gore', 'slasher', 'psicologico', 'vampiros', 'zombis', 'miedo', 'horror'},
+        'aventura': {'epico', 'superheroes', 'road_movie', 'exploracion', 'viaje', 'descubrimiento'},
+        'drama': {'biografia', 'psicologico', 'coming_of_age', 'independiente', 'emocional', 'serio'},
+        'comedia': {'romantico', 'parodia', 'sketch', 'buddy_movie', 'mockumentary', 'humor', 'risa'},
+        'thriller': {'suspenso', 'policiaco', 'espionaje', 'misterio', 'noir', 'tension', 'emocionante'},
+        'romance': {'romantico', 'romance_historico', 'amor', 'pasion', 'sentimental'},
+        'fantasia': {'medieval', 'mitologia', 'fantasia_urbana', 'epico', 'magia', 'sobrenatural'},
+        'animacion': {'infantil', 'familiar', 'animacion_adulta', 'dibujos', 'cartoon'},
+        'accion': {'superheroes', 'guerra', 'epico', 'lucha', 'pelea', 'emocion'},
+        'documental': {'naturaleza', 'ciencia', 'historia', 'biografia', 'realidad', 'educativo'},
+        'historia': {'biografia', 'epico', 'guerra', 'romance_historico', 'historico', 'epoca'},
+        'musical': {'familiar', 'romance', 'biografia', 'musica', 'baile', 'cantos'},
+        'western': {'epico', 'aventura', 'vaquero', 'frontera', 'oeste'},
+        'crimen': {'noir', 'policiaco', 'thriller', 'delito', 'investigacion'},
+        'independiente': {'arte', 'experimental', 'festival', 'alternativo'}
+    }
+    return ontology
+
+
+class PreferenceEngine:
+    """Motor sin interfaz gráfica: carga, normalización, similitud, clustering y recomendaciones"""
+
+    def __init__(self, nlp_processor=None, backend='auto', workers=None, cache=None, drift_threshold=0.05,
+                 matrix_path=None, matrix_dtype='float32', tile_size=2048, neighbor_mode='exact'):
+        self._nlp_processor = nlp_processor
+        self.backend = backend
+        self.workers = workers
+        # Matriz n x n por teselas en un memmap de disco cuando no cabe el vector condensado
+        self.matrix_path = matrix_path
+        self.matrix_dtype = matrix_dtype
+        self.tile_size = tile_size
+        # ResultCache opcional para reutilizar similitudes y clusters entre ejecuciones
+        self.cache = cache
+        # Ficheros de la caché mapeados en memoria por el motor (papel -> ruta), fijados para no expulsarlos
+        self._held = {}
+        self.cache_hit = False
+        self.snapshot_hit = False
+        # Fracción de usuarios cambiados desde el último clustering que obliga a re-agrupar
+        self.drift_threshold = drift_threshold
+
+        # Variables de datos
+        self.similarity_matrix = None
+        self.linkage_matrix = None
+        self.clusters = None
+        self.clustering_mode = None
+        self.pending_changes = 0
+        self.neighbor_index = None
+        self.neighbor_lists = None
+        self.neighbor_mode = 'exact'
+        self.set_neighbor_mode(neighbor_mode)
+        self.user_preferences = PreferenceStore.from_preferences({})
+        self.genre_ontology = create_genre_ontology()
+
+    @property
+    def nlp_processor(self):
+        """Procesador NLP, creado la primera vez que se necesita"""
+        if self._nlp_processor is None:
+            with instrumentation.timer('nlp.init'):
+                self._nlp_processor = NLPProcessor()
+        return self._nlp_processor
+
+    @property
+    def genre_ontology(self):
+        return self._genre_ontology
+
+    @genre_ontology.setter
+    def genre_ontology(self, ontology):
+        """Invalidar el índice de relaciones cada vez que cambia la ontología"""
+        self._genre_ontology = ontology
+        # Una ontología compilada leída de la caché sigue mapeada mientras se use
+        self._hold('ontology', getattr(ontology, 'path', None))
+        self._ontology_index = None
+        self.neighbor_index = None
+        self.neighbor_lists = None
+
+    @property
+    def ontology_index(self):
+        """Índice de relaciones de la ontología, recompilado en el primer uso"""
+        if self._ontology_index is None:
+            self._ontology_index = OntologyIndex(self._genre_ontology, self.nlp_processor.stemmer.stem,
+                                                 extra_genres=self.user_preferences.genres)
+        return self._ontology_index
+
+    @ontology_index.setter
+    def ontology_index(self, ontology_index):
+        self._ontology_index = ontology_index
+
+    def _hold(self, role, path):
+        """Fijar en la caché el fichero que el motor tiene mapeado para role, soltando el anterior"""
+        if self.cache is None:
+            return
+        previous = self._held.pop(role, None)
+        if previous is not None:
+            self.cache.unpin(previous)
+        if path is not None:
+            self.cache.pin(path)
+            self._held[role] = path
+
+    def load_ontology_from_file(self, file_path):
+        """Cargar y compilar una ontología JSON de cualquier profundidad
+
+        La forma compilada se guarda junto a la caché de resultados, con la
+        suma SHA-256 del JSON como clave, para no recompilar en cada arranque.
+        """
+        from ontology_compiler import load_ontology
+
+        try:
+            ontology = load_ontology(file_path, self.cache.directory if self.cache is not None else None)
+            if self.cache is not None:
+                # La ontología en uso ya está fijada; la recién leída, mientras se aplica el límite
+                # (queda fijada de nuevo al asignarla a genre_ontology)
+                self._hold('loading', getattr(ontology, 'path', None))
+                self.cache.evict()
+                self._hold('loading', None)
+            return ontology
+        except Exception as e:
+            print(f"Error al cargar ontología: {e}")
+            return create_genre_ontology()
+
+    def load_csv(self, file_path, progress=None, snapshot_path=None):
+        """Cargar un CSV de preferencias con procesamiento NLP
+
+        Con snapshot_path se reutiliza la instantánea binaria si corresponde al
+        mismo CSV y a la misma ontología; si no, se ingiere el CSV y se guarda.
+        """
+        from ingest import CSVIngestor
+        from snapshot import file_source, load_snapshot, save_snapshot
+
+        source = file_source(file_path)
+        normalization = self.nlp_processor.rules_fingerprint() if snapshot_path is not None else None
+        self.snapshot_hit = False
+        if snapshot_path is not None and os.path.exists(snapshot_path):
+            try:
+                with instrumentation.timer('load_csv.snapshot'):
+                    result = load_snapshot(snapshot_path, self.genre_ontology, source, normalization)
+                self.set_preferences(result.store)
+                self._hold('snapshot', snapshot_path)
+                self.snapshot_hit = True
+                return result
+            except Exception as e:
+                print(f"Instantánea descartada, se vuelve a leer el CSV: {e}")
+
+        ingestor = CSVIngestor(nlp_processor=self.nlp_processor, workers=self.workers)
+        with instrumentation.timer('load_csv.ingest'):
+            result = ingestor.ingest(file_path, progress=progress)
+        self.set_preferences(result.store)
+        self._hold('snapshot', None)
+        if snapshot_path is not None:
+            try:
+                save_snapshot(snapshot_path, result, self.genre_ontology, source, normalization)
+                # La instantánea puede estar en el directorio de la caché y contar para su límite
+                if self.cache is not None:
+                    self.cache.evict()
+            except Exception as e:
+                print(f"No se pudo guardar la instantánea: {e}")
+        return result
+
+    def load_snapshot(self, file_path, verify=False):
+        """Cargar preferencias ya normalizadas desde una instantánea binaria de la misma ontología y reglas
+
+        verify recalcula la suma SHA-256 de los datos (lee el fichero entero).
+        """
+        from snapshot import load_snapshot
+        with instrumentation.timer('load_csv.snapshot'):
+            result = load_snapshot(file_path, self.genre_ontology,
+                                   normalization=self.nlp_processor.rules_fingerprint(), verify=verify)
+        self.set_preferences(result.store)
+        self._hold('snapshot', file_path)
+        return result
+
+    def set_preferences(self, user_preferences):
+        """Sustituir las preferencias e invalidar los resultados derivados"""
+        self.user_preferences = PreferenceStore.from_preferences(user_preferences)
+        self.similarity_matrix = None
+        self.linkage_matrix = None
+        self.clusters = None
+        self.clustering_mode = None
+        self.pending_changes = 0
+        self.neighbor_index = None
+        self.neighbor_lists = None
+        # Internar los géneros de los usuarios en el índice de la ontología
+        if self._ontology_index is not None:
+            self._ontology_index.add_genres(self.user_preferences.genres)
+
+    def jaccard_similarity(self, set1, set2):
+        """Calcular similitud de Jaccard entre dos conjuntos"""
+        intersection = len(set1.intersection(set2))
+        union = len(set1.union(set2))
+        return intersection / union if union > 0 else 0
+
+    def enhanced_jaccard_similarity(self, set1, set2):
+        """Similitud de Jaccard mejorada con ontología semántica y NLP"""
+        from similarity import BASIC_WEIGHT, SEMANTIC_WEIGHT
+
+        # Similitud básica de Jaccard
+        basic_similarity = self.jaccard_similarity(set1, set2)
+
+        # Similitud semántica basada en el índice precompilado de la ontología
+        total_comparisons = len(set1) * len(set2)
+        semantic_score = self.ontology_index.pair_weights(list(set1), list(set2)).sum()
+        semantic_similarity = semantic_score / total_comparisons if total_comparisons > 0 else 0
+
+        # Combinar similitudes (60% básica, 40% semántica)
+        return BASIC_WEIGHT * basic_similarity + SEMANTIC_WEIGHT * semantic_similarity
+
+    def process(self, clustering='auto', progress=None):
+        """Calcular similitudes y clusters
+
+        En modo 'auto' se usa el clustering jerárquico exacto hasta
+        EXACT_LINKAGE_MAX_USERS usuarios y las cubetas MinHash por encima.
+        progress(etapa, hechos, total) se llama durante el cálculo; si lanza
+        una excepción el cálculo se aborta sin modificar los resultados previos.
+        """
+        from scipy.cluster.hierarchy import linkage, fcluster
+        from clustering import scalable_clusters, EXACT_LINKAGE_MAX_USERS, LINKAGE_THRESHOLD
+        from parallel import parallel_condensed_distances
+        from similarity import CondensedSimilarity, BASIC_WEIGHT, SEMANTIC_WEIGHT
+
+        if clustering not in CLUSTERING_MODES:
+            raise ValueError(f"Modo de clustering desconocido: {clustering}")
+        n_users = len(self.user_preferences)
+        if clustering == 'auto':
+            clustering = 'linkage' if n_users <= EXACT_LINKAGE_MAX_USERS else 'minhash'
+
+        def report(stage):
+            if progress is None:
+                return None
+            return lambda done, total: progress(stage, done, total)
+
+        # Con las mismas preferencias, ontología y pesos se reutiliza el resultado guardado
+        key = None
+        self.cache_hit = False
+        if self.cache is not None:
+            from cache import fingerprint
+            key = fingerprint(self.user_preferences, self.genre_ontology, (BASIC_WEIGHT, SEMANTIC_WEIGHT),
+                              clustering, LINKAGE_THRESHOLD)
+            with instrumentation.timer('process.cache_lookup'):
+                cached = self.cache.get(key)
+            if cached is not None:
+                condensed_dist = cached.get('condensed')
+                if condensed_dist is not None:
+                    similarity_matrix = CondensedSimilarity(condensed_dist)
+                else:
+                    similarity_matrix = self._out_of_core_matrix(progress=report('similitud'))
+                self._set_results(clustering, similarity_matrix, cached.get('linkage'), np.asarray(cached['clusters']))
+                self._hold('result', os.path.join(self.cache.directory, key))
+                self.cache_hit = True
+                return clustering
+        self._hold('result', None)
+
+        results = {}
+        if clustering == 'linkage':
+            # Calcular solo el triángulo superior como vector condensado de distancias,
+            # repartiendo las teselas entre procesos cuando hay suficientes usuarios
+            with instrumentation.timer('process.similarity'):
+                condensed_dist = parallel_condensed_distances(self.user_preferences, self.ontology_index,
+                                                              workers=self.workers, backend=self.backend,
+                                                              progress=report('similitud'))
+
+            # Calcular clustering jerárquico y generar clusters
+            # (las filas de la matriz cuadrada se materializan solo cuando se necesitan)
+            with instrumentation.timer('process.linkage'):
+                linkage_matrix = linkage(condensed_dist, method='ward')
+                clusters = fcluster(linkage_matrix, t=LINKAGE_THRESHOLD, criterion='distance')
+            if progress is not None:
+                progress('clustering', 1, 1)
+            self._set_results(clustering, CondensedSimilarity(condensed_dist), linkage_matrix, clusters)
+            results['condensed'] = condensed_dist
+            results['linkage'] = linkage_matrix
+        else:
+            # Sin dendrograma; la matriz solo existe en disco si se configuró matrix_path
+            with instrumentation.timer('process.similarity'):
+                similarity_matrix = self._out_of_core_matrix(progress=report('similitud'))
+            with instrumentation.timer('process.clustering'):
+                clusters, linkage_matrix = scalable_clusters(
+                    self.user_preferences, self.ontology_index, mode=clustering,
+                    genre_ontology=self.genre_ontology, backend=self.backend
+                )
+            if progress is not None:
+                progress('clustering', 1, 1)
+            self._set_results(clustering, similarity_matrix, linkage_matrix, clusters)
+        results['clusters'] = self.clusters
+
+        if key is not None:
+            try:
+                with instrumentation.timer('process.cache_store'):
+                    self.cache.put(key, results)
+            except Exception as e:
+                print(f"No se pudo guardar el resultado en la caché: {e}")
+        return clustering
+
+    def _set_results(self, clustering, similarity_matrix, linkage_matrix, clusters):
+        """Publicar de una vez los resultados de process()"""
+        self.clustering_mode = clustering
+        self.pending_changes = 0
+        self.similarity_matrix = similarity_matrix
+        self.linkage_matrix = linkage_matrix
+        self.clusters = clusters
+
+    def _out_of_core_matrix(self, progress=None):
+        """Matriz de similitud en memmap (reanudando un cálculo interrumpido) o None"""
+        if self.matrix_path is None:
+            return None
+        from outofcore import compute_memmap_similarity
+        matrix = compute_memmap_similarity(self.user_preferences, self.ontology_index, self.matrix_path,
+                                           dtype=self.matrix_dtype, tile_size=self.tile_size,
+                                           workers=self.workers, backend=self.backend, progress=progress)
+        # Si matrix_path está dentro de la caché, no se expulsa mientras esté mapeada
+        self._hold('matrix', self.matrix_path)
+        return matrix
+
+    def normalize_genres(self, genres):
+        """Normalizar géneros crudos como en la carga del CSV (sin stop words ni celdas vacías)"""
+        normalized = set()
+        for genre in genres:
+            if genre.strip():
+                genre = self.nlp_processor.normalize_genre(genre)
+                if not self.nlp_processor.is_stop_word(genre):
+                    normalized.add(genre)
+        return normalized
+
+    def upsert_user(self, user, genres):
+        """Insertar o modificar un usuario recalculando solo su fila y su columna de similitud"""
+        n_users = len(self.user_preferences)
+        store, i = self.user_preferences.with_user(user, self.normalize_genres(genres))
+        self._apply_change(store, i, added=len(store) > n_users)
+
+    def remove_user(self, user):
+        """Borrar un usuario sin recalcular las similitudes del resto"""
+        store, i = self.user_preferences.without_user(user)
+        self._apply_change(store, i, removed=True)
+
+    def _apply_change(self, store, i, added=False, removed=False):
+        """Actualizar las estructuras derivadas tras cambiar la fila i"""
+        from similarity import SimilarityEngine
+
+        self.user_preferences = store
+        if self._ontology_index is not None:
+            self._ontology_index.add_genres(store.genres)
+        # El índice invertido se reconstruye en O(nnz) en la próxima consulta
+        self.neighbor_index = None
+
+        from outofcore import MemmapSimilarity
+        if isinstance(self.similarity_matrix, MemmapSimilarity):
+            # La matriz en disco no se parchea: se recalcula en el próximo process
+            self.similarity_matrix = None
+
+        similarities = None
+        if not removed and (self.similarity_matrix is not None or (added and self.clusters is not None)):
+            similarities = SimilarityEngine(self.ontology_index, backend=self.backend).row_similarities(store, i)
+
+        if self.similarity_matrix is not None:
+            if removed:
+                self.similarity_matrix = self.similarity_matrix.delete_row(i)
+            elif added:
+                self.similarity_matrix = self.similarity_matrix.append_row(similarities)
+            else:
+                self.similarity_matrix.update_row(i, similarities)
+
+        if self.neighbor_lists is not None:
+            if removed:
+                self.neighbor_lists.remove(store, i)
+            else:
+                self.neighbor_lists.update(store, i)
+
+        if self.clusters is not None:
+            # Asignación provisional: un usuario nuevo entra en el cluster de su vecino más similar
+            if removed:
+                self.clusters = np.delete(self.clusters, i)
+            elif added:
+                others = similarities[:i]
+                label = self.clusters[int(np.argmax(others))] if len(others) else 1
+                self.clusters = np.append(self.clusters, label)
+            # El dendrograma ya no corresponde a los usuarios actuales
+            self.linkage_matrix = None
+            self.pending_changes += 1
+
+    def clusters_stale(self):
+        """Indica si los cambios acumulados superan el umbral de deriva"""
+        return self.pending_changes > self.drift_threshold * max(len(self.user_preferences), 1)
+
+    def refresh_clusters(self, force=False):
+        """Re-agrupar por completo solo si se ha superado el umbral de deriva"""
+        if self.clusters is not None and (force or self.clusters_stale()):
+            self.process(self.clustering_mode)
+            return True
+        return False
+
+    def clear_cache(self):
+        """Invalidar todos los resultados guardados en la caché en disco"""
+        if self.cache is not None:
+            self.cache.invalidate()
+
+    def set_neighbor_mode(self, mode):
+        """Elegir vecinos exactos ('exact') o aproximados con MinHash + LSH ('lsh')"""
+        if mode not in NEIGHBOR_MODES:
+            raise ValueError(f"Modo de vecinos desconocido: {mode} (opciones: {', '.join(NEIGHBOR_MODES)})")
+        if mode != self.neighbor_mode:
+            self.neighbor_mode = mode
+            self.neighbor_index = None
+            self.neighbor_lists = None
+
+    def _neighbors(self):
+        """Índice de vecinos (exacto o LSH), construido la primera vez que se necesita"""
+        if self.neighbor_index is None:
+            if self.neighbor_mode == 'lsh' and self.neighbor_lists is not None:
+                # Las listas mantienen su índice LSH al día con cada cambio de usuario
+                self.neighbor_index = self.neighbor_lists.index
+            elif self.neighbor_mode == 'lsh':
+                from lsh import LSHNeighbors
+                self.neighbor_index = LSHNeighbors(self.user_preferences, self.ontology_index, self.genre_ontology)
+            else:
+                from neighbors import TopKIndex
+                self.neighbor_index = TopKIndex(self.user_preferences, self.ontology_index, backend=self.backend)
+        return self.neighbor_index
+
+    def top_k_similar(self, user, k=5):
+        """Los k usuarios más similares a user como lista de (usuario, similitud)"""
+        from outofcore import MemmapSimilarity
+        if self.neighbor_mode == 'exact' and isinstance(self.similarity_matrix, MemmapSimilarity):
+            # Con la matriz en disco basta con leer la fila del usuario
+            indices, scores = self.similarity_matrix.top_k(self.user_preferences.index_of(user), k)
+            return [(self.user_preferences.users[j], score) for j, score in zip(indices, scores.tolist())]
+        return self._neighbors().top_k_similar(user, k)
+
+    def cluster_members(self, user):
+        """Cluster de un usuario y el resto de miembros del mismo cluster"""
+        self.refresh_clusters()
+        if self.clusters is None:
+            return None, []
+        users = self.user_preferences.users
+        user_idx = self.user_preferences.index_of(user)
+        user_cluster = self.clusters[user_idx]
+        members = [users[i] for i, cluster in enumerate(self.clusters) if cluster == user_cluster and i != user_idx]
+        return int(user_cluster), members
+
+    def recommendations(self, user, k=5):
+        """Vecinos similares, géneros en común y géneros que podrían gustar a un usuario"""
+        from recommend import recommend_genres, DEFAULT_TOP_GENRES
+
+        user_prefs = self.user_preferences[user]
+        neighbors = []
+        with instrumentation.timer('recommendations.top_k'):
+            similar_users = self.top_k_similar(user, k)
+        for similar_user, similarity in similar_users:
+            similar_prefs = self.user_preferences[similar_user]
+            neighbors.append({
+                'user': similar_user,
+                'similarity': float(similarity),
+                'common_genres': sorted(user_prefs & similar_prefs),
+                'suggested_genres': sorted(similar_prefs - user_prefs),
+            })
+        # Géneros de los vecinos ponderados por su similitud
+        store = self.user_preferences
+        recommended = []
+        if similar_users:
+            genre_ids, scores = recommend_genres(
+                store, [[store.index_of(similar_user) for similar_user, _ in similar_users]],
+                [[similarity for _, similarity in similar_users]], m=DEFAULT_TOP_GENRES, users=[store.index_of(user)]
+            )
+            recommended = [{'genre': store.genres[genre_id], 'score': float(score)}
+                           for genre_id, score in zip(genre_ids[0], scores[0]) if genre_id >= 0]
+        cluster, members = self.cluster_members(user)
+        return {
+            'user': user,
+            'genres': sorted(user_prefs),
+            'neighbors': neighbors,
+            'recommended_genres': recommended,
+            'cluster': cluster,
+            'cluster_members': members,
+        }
+
+    def top_k_lists(self, k, progress=None):
+        """Listas de k vecinos de todos los usuarios; se conservan para upsert_user / remove_user"""
+        if self.neighbor_lists is None or self.neighbor_lists.k != k:
+            with instrumentation.timer('recommendations.top_k_all'):
+                if self.neighbor_mode == 'lsh':
+                    from lsh import LSHNeighborLists
+                    self.neighbor_lists = LSHNeighborLists(self.user_preferences, self.ontology_index, k,
+                                                           self.genre_ontology, progress=progress)
+                else:
+                    from neighbors import IncrementalNeighbors
+                    self.neighbor_lists = IncrementalNeighbors(self.user_preferences, self.ontology_index, k,
+                                                               backend=self.backend, progress=progress)
+        return self.neighbor_lists
+
+    def genre_recommendations(self, k=5, m=None, progress=None):
+        """Top-m géneros de todos los usuarios puntuados por sus k vecinos (arrays n x m de ids y puntuaciones)"""
+        from recommend import recommend_genres, DEFAULT_TOP_GENRES
+
+        lists = self.top_k_lists(k, progress)
+        with instrumentation.timer('recommendations.genres'):
+            return recommend_genres(self.user_preferences, lists.neighbors, lists.similarities,
+                                    m=m or DEFAULT_TOP_GENRES)
+
+    def batch_recommendations(self, k=5, progress=None, top_genres=None):
+        """Vecinos y géneros sugeridos de todos los usuarios (memoria proporcional a n·k)"""
+        self.refresh_clusters()
+        store = self.user_preferences
+        lists = self.top_k_lists(k, progress)
+        neighbors, similarities = lists.neighbors, lists.similarities
+        genre_ids, genre_scores = self.genre_recommendations(k, top_genres)
+        for i, user in enumerate(store.users):
+            user_prefs = store.genre_set(i)
+            suggested = set()
+            for j in neighbors[i]:
+                suggested |= store.genre_set(j)
+            yield {
+                'user': user,
+                'genres': sorted(user_prefs),
+                'cluster': int(self.clusters[i]) if self.clusters is not None else None,
+                'neighbors': [
+                    {'user': store.users[j], 'similarity': round(float(similarity), 6)}
+                    for j, similarity in zip(neighbors[i], similarities[i])
+                ],
+                'suggested_genres': sorted(suggested - user_prefs),
+                'recommended_genres': [
+                    {'genre': store.genres[genre_id], 'score': round(float(score), 6)}
+                    for genre_id, score in zip(genre_ids[i], genre_scores[i]) if genre_id >= 0
+                ],
+            }
@@ -0,0 +1,94 @@
+import numpy as np
+
+# Hojas que se dibujan como máximo; el resto de uniones se contraen en "(n)"
+DEFAULT_TRUNCATE_LEAVES = 40
+
+
+def subtree_linkage(linkage_matrix, node):
+    """Matriz de enlace del subárbol con raíz en node y los ids originales de sus nodos
+
+    Devuelve (Z, leaves, internal): Z usa los ids locales de scipy (hojas
+    0..m-1 y uniones m..2m-2), leaves e internal traducen ids locales a
+    los ids de la matriz completa.
+    """
+    n_leaves = len(linkage_matrix) + 1
+    leaves = []
+    internal = []
+    stack = [node]
+    while stack:
+        current = stack.pop()
+        if current < n_leaves:
+            leaves.append(current)
+        else:
+            internal.append(current)
+            left, right = linkage_matrix[current - n_leaves, :2].astype(np.int64)
+            stack.extend((right, left))
+    # Las uniones hijas siempre preceden a la madre en la matriz de enlace
+    internal.sort()
+    leaves = np.array(leaves, dtype=np.int64)
+    internal = np.array(internal, dtype=np.int64)
+
+    local = {int(leaf): i for i, leaf in enumerate(leaves)}
+    local.update((int(merge), len(leaves) + i) for i, merge in enumerate(internal))
+    rows = linkage_matrix[internal - n_leaves].copy()
+    for row in rows:
+        row[0], row[1] = local[int(row[0])], local[int(row[1])]
+    return rows, leaves, internal
+
+
+class DendrogramLayout:
+    """Coordenadas de dendrogramas truncados, calculadas una vez por subárbol
+
+    layout(node) aplica truncate_mode='lastp' sobre el subárbol de node, de
+    modo que el coste de dibujarlo no depende del número de usuarios. Cada
+    hoja dibujada conserva el id del nodo original para poder desplegarla.
+    """
+
+    def __init__(self, linkage_matrix, labels, p=DEFAULT_TRUNCATE_LEAVES):
+        self.linkage_matrix = np.asarray(linkage_matrix, dtype=np.float64)
+        self.labels = np.asarray(labels, dtype=object)
+        self.n_leaves = len(self.linkage_matrix) + 1
+        self.root = 2 * self.n_leaves - 2
+        self.p = p
+        # Umbral de color común a todos los subárboles, como el de scipy para el árbol completo
+        self.color_threshold = 0.7 * float(self.linkage_matrix[:, 2].max()) if len(self.linkage_matrix) else 0.0
+        self._layouts = {}
+
+    def size(self, node):
+        """Número de usuarios bajo un nodo"""
+        if node < self.n_leaves:
+            return 1
+        return int(self.linkage_matrix[node - self.n_leaves, 3])
+
+    def is_leaf(self, node):
+        return node < self.n_leaves
+
+    def layout(self, node=None, p=None):
+        """Resultado de scipy dendrogram(no_plot=True) del subárbol, con 'nodes' en ids originales"""
+        node = self.root if node is None else node
+        p = p or self.p
+        key = (node, p)
+        cached = self._layouts.get(key)
+        if cached is not None:
+            return cached
+        if self.is_leaf(node):
+            raise ValueError(f"El nodo {node} es una hoja y no tiene subárbol")
+
+        from scipy.cluster.hierarchy import dendrogram
+        rows, leaves, internal = subtree_linkage(self.linkage_matrix, node)
+        tree = dendrogram(rows, truncate_mode='lastp', p=p, labels=self.labels[leaves].tolist(),
+                          color_threshold=self.color_threshold, no_plot=True)
+        # Traducir los ids locales de cada hoja dibujada (usuario o unión contraída)
+        tree['nodes'] = [int(leaves[leaf]) if leaf < len(leaves) else int(internal[leaf - len(leaves)])
+                         for leaf in tree['leaves']]
+        tree['root'] = node
+        tree['size'] = self.size(node)
+        self._layouts[key] = tree
+        return tree
+
+    def leaf_at(self, tree, x):
+        """Nodo original de la hoja dibujada más cercana a la coordenada x (hojas cada 10 unidades)"""
+        if not tree['nodes']:
+            return None
+        index = min(max(int(x // 10), 0), len(tree['nodes']) - 1)
+        return tree['nodes'][index]
@@ -0,0 +1,168 @@
+import csv
+import os
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+import numpy as np
+
+import instrumentation
+from nlp import NLPProcessor
+from store import PreferenceStore
+
+# Procesador NLP propio de cada proceso trabajador
+_worker_nlp = None
+
+
+def _init_worker():
+    """Inicializar el procesador NLP una sola vez por proceso trabajador"""
+    global _worker_nlp
+    _worker_nlp = NLPProcessor()
+
+
+def _normalize_cells(cells, nlp_processor=None):
+    """Normalizar celdas crudas; las stop words se devuelven como None"""
+    nlp_processor = nlp_processor or _worker_nlp
+    normalized = []
+    for cell in cells:
+        genre = nlp_processor.normalize_genre(cell)
+        normalized.append(None if nlp_processor.is_stop_word(genre) else genre)
+    return normalized
+
+
+class IngestResult:
+    """Resultado de la ingesta: almacén compacto de preferencias y estadísticas"""
+
+    def __init__(self, store, genre_counts, rows, cells, unique_cells):
+        self.store = store
+        self.genre_counts = genre_counts
+        self.rows = rows
+        self.cells = cells
+        self.unique_cells = unique_cells
+
+
+class CSVIngestor:
+    """Ingesta por bloques de CSV de preferencias con normalización en paralelo"""
+
+    def __init__(self, nlp_processor=None, workers=None, chunk_size=10000, min_parallel_bytes=1 << 20):
+        self.nlp_processor = nlp_processor
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        # Por debajo de este tamaño arrancar procesos cuesta más de lo que ahorra
+        self.min_parallel_bytes = min_parallel_bytes
+
+    def ingest(self, file_path, progress=None):
+        """Leer el CSV por bloques y construir el almacén compacto de preferencias"""
+        total_bytes = os.path.getsize(file_path)
+        executor = None
+        if self.workers > 1 and total_bytes >= self.min_parallel_bytes:
+            executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker)
+        elif self.nlp_processor is None:
+            self.nlp_processor = NLPProcessor()
+
+        try:
+            return self._ingest(file_path, total_bytes, executor, progress)
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+    def _normalize(self, cells, executor):
+        """Normalizar celdas distintas, repartidas entre los procesos si hay pool"""
+        instrumentation.count('ingest.cells_normalized', len(cells))
+        if executor is None:
+            return _normalize_cells(cells, self.nlp_processor)
+
+        batch_size = max(1, -(-len(cells) // self.workers))
+        batches = [cells[i:i + batch_size] for i in range(0, len(cells), batch_size)]
+        normalized = []
+        for batch in executor.map(_normalize_cells, batches):
+            normalized.extend(batch)
+        return normalized
+
+    def _ingest(self, file_path, total_bytes, executor, progress):
+        genres = []
+        genre_ids = {}
+        # Celda cruda -> id de género (-1 para stop words); los valores se repiten mucho
+        cell_ids = {}
+        genre_counts = array('q')
+
+        users = {}
+        starts = array('q')
+        ends = array('q')
+        indices = array('i')
+        rows = cells = 0
+
+        with open(file_path, 'r', encoding='utf-8') as file:
+            csv_reader = csv.reader(file)
+            while True:
+                chunk = list(islice(csv_reader, self.chunk_size))
+                if not chunk:
+                    break
+
+                # Normalizar solo las celdas que no se han visto antes
+                pending = list({
+                    genre for row in chunk if row for genre in row[1:]
+                    if genre not in cell_ids and genre.strip()
+                })
+                for cell, genre in zip(pending, self._normalize(pending, executor)):
+                    if genre is None:
+                        cell_ids[cell] = -1
+                        continue
+                    genre_id = genre_ids.get(genre)
+                    if genre_id is None:
+                        genre_id = genre_ids[genre] = len(genres)
+                        genres.append(genre)
+                        genre_counts.append(0)
+                    cell_ids[cell] = genre_id
+
+                for row in chunk:
+                    if not row:  # Verificar que la fila no esté vacía
+                        continue
+                    row_ids = set()
+                    for genre in row[1:]:
+                        if genre.strip():  # Ignorar celdas vacías
+                            genre_id = cell_ids[genre]
+                            if genre_id >= 0:
+                                row_ids.add(genre_id)
+                                genre_counts[genre_id] += 1
+                            cells += 1
+
+                    # Un usuario repetido conserva su posición y toma la última fila
+                    users[row[0].strip()] = len(starts)
+                    starts.append(len(indices))
+                    indices.extend(sorted(row_ids))
+                    ends.append(len(indices))
+                    rows += 1
+
+                if progress is not None:
+                    progress(rows, min(file.buffer.tell(), total_bytes), total_bytes)
+
+        instrumentation.count('ingest.rows', rows)
+        instrumentation.count('ingest.cells', cells)
+        return self._finalize(users, starts, ends, indices, genres, genre_counts, rows, cells, len(cell_ids))
+
+    def _finalize(self, users, starts, ends, indices, genres, genre_counts, rows, cells, unique_cells):
+        """Compactar las filas en formato CSR (indptr / indices)"""
+        starts = np.frombuffer(starts, dtype=np.int64)
+        ends = np.frombuffer(ends, dtype=np.int64)
+        indices = np.frombuffer(indices, dtype=np.int32)
+        segments = np.fromiter(users.values(), dtype=np.int64, count=len(users))
+
+        if len(segments) != len(starts):
+            # Descartar las filas sobrescritas por usuarios repetidos
+            lengths = ends[segments] - starts[segments]
+            indices = np.concatenate([indices[starts[s]:ends[s]] for s in segments]) if len(segments) else indices[:0]
+        else:
+            lengths = ends - starts
+
+        indptr = np.zeros(len(segments) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=indptr[1:])
+        genre_counts = dict(zip(genres, np.frombuffer(genre_counts, dtype=np.int64).tolist()))
+        store = PreferenceStore(list(users), genres, indptr, np.array(indices))
+        return IngestResult(store, genre_counts, rows, cells, unique_cells)
+
+
+def ingest_csv(file_path, nlp_processor=None, workers=None, chunk_size=10000, progress=None):
+    """Atajo para ingerir un CSV de preferencias sin interfaz gráfica"""
+    ingestor = CSVIngestor(nlp_processor=nlp_processor, workers=workers, chunk_size=chunk_size)
+    return ingestor.ingest(file_path, progress=progress)
@@ -0,0 +1,150 @@
+"""Instrumentación opcional: temporizadores por etapa, contadores y volcados de cProfile
+
+Desactivada por defecto: timer() devuelve un contexto vacío compartido y
+count() solo comprueba un booleano, así que las llamadas pueden quedarse
+en el código sin coste apreciable. Los contadores se incrementan por
+bloque o por llamada, nunca por par de usuarios.
+"""
+import json
+import threading
+import time
+from collections import defaultdict
+
+_enabled = False
+_profiling = False
+_lock = threading.Lock()
+_timers = {}
+_counters = defaultdict(int)
+_profiles = []
+
+
+class _NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Timer:
+    """Tiempo de pared y de CPU del hilo actual de una etapa"""
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self._cpu = time.thread_time()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        wall = time.perf_counter() - self._start
+        cpu = time.thread_time() - self._cpu
+        with _lock:
+            calls, total_wall, total_cpu = _timers.get(self.stage, (0, 0.0, 0.0))
+            _timers[self.stage] = (calls + 1, total_wall + wall, total_cpu + cpu)
+        return False
+
+
+def enable(profile=False):
+    """Activar temporizadores y contadores y, opcionalmente, cProfile en las tareas"""
+    global _enabled, _profiling
+    _enabled = True
+    _profiling = profile
+
+
+def disable():
+    global _enabled, _profiling
+    _enabled = False
+    _profiling = False
+
+
+def is_enabled():
+    return _enabled
+
+
+def reset():
+    """Borrar los tiempos, contadores y perfiles acumulados"""
+    with _lock:
+        _timers.clear()
+        _counters.clear()
+        _profiles.clear()
+
+
+def timer(stage):
+    """Contexto que acumula el tiempo de una etapa (vacío si la instrumentación está desactivada)"""
+    if not _enabled:
+        return _NULL_TIMER
+    return _Timer(stage)
+
+
+def count(name, n=1):
+    """Sumar n a un contador"""
+    if _enabled:
+        with _lock:
+            _counters[name] += n
+
+
+def profiled(function, *args, **kwargs):
+    """Llamar a function bajo cProfile si está activado; cada hilo necesita su propio perfil"""
+    if not _profiling:
+        return function(*args, **kwargs)
+    import cProfile
+    profile = cProfile.Profile()
+    try:
+        return profile.runcall(function, *args, **kwargs)
+    finally:
+        with _lock:
+            _profiles.append(profile)
+
+
+def snapshot():
+    """Tiempos y contadores acumulados como diccionario serializable"""
+    with _lock:
+        return {
+            'timers': {
+                stage: {'calls': calls, 'wall_seconds': round(wall, 6), 'cpu_seconds': round(cpu, 6)}
+                for stage, (calls, wall, cpu) in sorted(_timers.items())
+            },
+            'counters': dict(sorted(_counters.items())),
+        }
+
+
+def format_report(metrics=None):
+    """Informe legible de tiempos y contadores"""
+    metrics = metrics or snapshot()
+    lines = ["Tiempos por etapa (pared / CPU del hilo, llamadas):"]
+    for stage, values in metrics['timers'].items():
+        lines.append(f"  {stage}: {values['wall_seconds']:.3f} s / {values['cpu_seconds']:.3f} s "
+                     f"({values['calls']})")
+    lines.append("Contadores:")
+    for name, value in metrics['counters'].items():
+        lines.append(f"  {name}: {value}")
+    return '\n'.join(lines) + '\n'
+
+
+def write_metrics(path, extra=None):
+    """Guardar tiempos y contadores en JSON, junto con estadísticas adicionales"""
+    metrics = snapshot()
+    if extra:
+        metrics.update(extra)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(metrics, f, indent=2, ensure_ascii=False)
+    return metrics
+
+
+def dump_profile(path):
+    """Volcar los perfiles acumulados a un fichero pstats; devuelve False si no hay ninguno"""
+    import pstats
+    with _lock:
+        profiles = list(_profiles)
+    if not profiles:
+        return False
+    stats = pstats.Stats(profiles[0])
+    for profile in profiles[1:]:
+        stats.add(profile)
+    stats.dump_stats(path)
+    return True
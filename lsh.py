@@ -0,0 +1,383 @@
+import time
+import zlib
+from collections import defaultdict
+
+import numpy as np
+
+from ontology_compiler import compile_ontology
+
+# Primo de Mersenne 2^61 - 1 para la familia de hashes universales (a·x + b) mod p
+MERSENNE_PRIME = (1 << 61) - 1
+MAX_HASH = np.uint64(MERSENNE_PRIME)
+
+# 32 bandas de 2 filas: recall@5 ~0.83 con 2000 usuarios aleatorios (16 bandas de 4 filas se queda en ~0.47)
+DEFAULT_NUM_PERM = 64
+DEFAULT_BANDS = 32
+# Candidatos puntuados con la similitud exacta por consulta de LSHNeighbors (los que más bandas comparten)
+DEFAULT_MAX_CANDIDATES = 1024
+
+
+def expand_genres(genres, genre_ontology):
+    """Añadir a un conjunto de géneros todos sus ancestros en la ontología
+
+    Con una ontología compilada se leen del cierre transitivo precalculado;
+    un diccionario se compila en cada llamada.
+    """
+    return compile_ontology(genre_ontology).with_ancestors(genres)
+
+
+class MinHasher:
+    """Generador de firmas MinHash para conjuntos de géneros"""
+
+    def __init__(self, num_perm=64, seed=1):
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        # Con a, b, x < 2^32 el producto a·x + b cabe en uint64 sin desbordar
+        self.a = rng.integers(1, 1 << 32, size=num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, 1 << 32, size=num_perm, dtype=np.uint64)
+        self._genre_hashes = {}
+
+    def genre_hashes(self, genre):
+        """Valores de las num_perm funciones hash para un género (estables entre ejecuciones)"""
+        hashes = self._genre_hashes.get(genre)
+        if hashes is None:
+            x = np.uint64(zlib.crc32(genre.encode('utf-8')))
+            hashes = (self.a * x + self.b) % MAX_HASH
+            self._genre_hashes[genre] = hashes
+        return hashes
+
+    def signature(self, genres):
+        """Firma MinHash de un conjunto de géneros"""
+        if not genres:
+            return np.full(self.num_perm, MAX_HASH, dtype=np.uint64)
+        return np.min([self.genre_hashes(genre) for genre in genres], axis=0)
+
+    def signatures(self, genre_sets):
+        """Firmas de varios conjuntos a la vez (una fila por conjunto)"""
+        genre_sets = list(genre_sets)
+        vocabulary = sorted(set().union(*genre_sets)) if genre_sets else []
+        genre_ids = {genre: i for i, genre in enumerate(vocabulary)}
+        hashes = np.array([self.genre_hashes(genre) for genre in vocabulary]).reshape(-1, self.num_perm)
+
+        signatures = np.full((len(genre_sets), self.num_perm), MAX_HASH, dtype=np.uint64)
+        lengths = np.array([len(genres) for genres in genre_sets], dtype=np.int64)
+        non_empty = np.flatnonzero(lengths)
+        if len(non_empty):
+            ids = np.fromiter((genre_ids[genre] for genres in genre_sets for genre in genres),
+                              dtype=np.int64, count=int(lengths.sum()))
+            starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+            signatures[non_empty] = np.minimum.reduceat(hashes[ids], starts[non_empty], axis=0)
+        return signatures
+
+
+class LSHIndex:
+    """Índice LSH por bandas sobre firmas MinHash para vecinos aproximados"""
+
+    def __init__(self, scorer=None, genre_ontology=None, num_perm=DEFAULT_NUM_PERM, bands=DEFAULT_BANDS, seed=1):
+        if num_perm % bands:
+            raise ValueError("num_perm debe ser múltiplo del número de bandas")
+        self.scorer = scorer
+        # Compilada una sola vez para ampliar cada conjunto con sus ancestros sin recorrerla
+        self.genre_ontology = compile_ontology(genre_ontology or {})
+        self.hasher = MinHasher(num_perm=num_perm, seed=seed)
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.buckets = [defaultdict(list) for _ in range(bands)]
+        self.preferences = {}
+        self.band_keys = {}
+
+        self.queries = 0
+        self.candidates_seen = 0
+        self.query_time = 0.0
+
+    def _band_keys(self, signature):
+        """Clave de cada banda de la firma"""
+        return [signature[band * self.rows:(band + 1) * self.rows].tobytes() for band in range(self.bands)]
+
+    def _insert_signature(self, user, genres, signature):
+        if user in self.preferences:
+            raise ValueError(f"El usuario ya está en el índice: {user}")
+        self.preferences[user] = genres
+        self.band_keys[user] = self._band_keys(signature)
+        for band, key in enumerate(self.band_keys[user]):
+            self.buckets[band][key].append(user)
+
+    def insert(self, user, genres):
+        """Insertar un usuario de forma incremental"""
+        expanded = expand_genres(genres, self.genre_ontology)
+        self._insert_signature(user, genres, self.hasher.signature(expanded))
+
+    def insert_many(self, user_preferences):
+        """Insertar muchos usuarios calculando sus firmas de forma vectorizada"""
+        users = list(user_preferences)
+        expanded = [expand_genres(user_preferences[user], self.genre_ontology) for user in users]
+        for user, signature in zip(users, self.hasher.signatures(expanded)):
+            self._insert_signature(user, user_preferences[user], signature)
+
+    def remove(self, user):
+        """Quitar un usuario del índice (y de sus cubetas)"""
+        del self.preferences[user]
+        for band, key in enumerate(self.band_keys.pop(user)):
+            bucket = self.buckets[band][key]
+            bucket.remove(user)
+            if not bucket:
+                del self.buckets[band][key]
+
+    def candidates(self, genres):
+        """Usuarios que comparten al menos una banda con el conjunto consultado"""
+        signature = self.hasher.signature(expand_genres(genres, self.genre_ontology))
+        found = {}
+        for band, key in enumerate(self._band_keys(signature)):
+            for user in self.buckets[band].get(key, ()):
+                found[user] = None
+        return list(found)
+
+    def query(self, genres, k=5, exclude=None):
+        """Top-k usuarios similares: candidatos LSH re-ordenados con la similitud exacta (scorer)"""
+        start = time.perf_counter()
+        scored = [
+            (self.scorer(genres, self.preferences[user]), user)
+            for user in self.candidates(genres) if user != exclude
+        ]
+        scored.sort(key=lambda item: item[0], reverse=True)
+
+        self.queries += 1
+        self.candidates_seen += len(scored)
+        self.query_time += time.perf_counter() - start
+        return [(user, score) for score, user in scored[:k]]
+
+    def query_user(self, user, k=5):
+        """Top-k usuarios similares a un usuario ya indexado"""
+        return self.query(self.preferences[user], k=k, exclude=user)
+
+    def stats(self):
+        """Estadísticas de consultas: candidatos y latencia media"""
+        return {
+            'users': len(self.preferences),
+            'bands': self.bands,
+            'rows_per_band': self.rows,
+            'queries': self.queries,
+            'mean_candidates': self.candidates_seen / self.queries if self.queries else 0.0,
+            'mean_latency_ms': 1e3 * self.query_time / self.queries if self.queries else 0.0,
+        }
+
+
+def recall_at_k(approximate, exact, k):
+    """Fracción de los k vecinos exactos que recupera la consulta aproximada"""
+    if not exact:
+        return 1.0
+    expected = {user for user, _ in exact[:k]}
+    return len(expected & {user for user, _ in approximate[:k]}) / len(expected)
+
+
+class LSHNeighbors:
+    """Vecinos aproximados: candidatos de las bandas LSH puntuados con la similitud mejorada exacta
+
+    Misma interfaz que TopKIndex (top_k_similar, top_k_all). Si un usuario
+    tiene menos de k candidatos, la lista se completa con usuarios de
+    similitud 0 en orden de índice, como en TopKIndex. update y remove
+    aplican el cambio de un usuario al índice LSH sin recalcular las firmas
+    del resto.
+    """
+
+    def __init__(self, user_preferences, ontology_index, genre_ontology=None, num_perm=DEFAULT_NUM_PERM,
+                 bands=DEFAULT_BANDS, seed=1, max_candidates=DEFAULT_MAX_CANDIDATES):
+        from neighbors import TopKIndex
+        from store import PreferenceStore
+
+        self.store = PreferenceStore.from_preferences(user_preferences)
+        self.ontology_index = ontology_index
+        self.max_candidates = max_candidates
+        # Solo se usa para puntuar los candidatos de forma vectorizada
+        self.exact = TopKIndex(self.store, ontology_index)
+        # En el índice LSH cada fila tiene un identificador estable: borrar un
+        # usuario no obliga a renumerar las cubetas (ids: fila -> id, rows: id -> fila o -1)
+        self.index = LSHIndex(genre_ontology=genre_ontology, num_perm=num_perm, bands=bands, seed=seed)
+        n_users = len(self.store)
+        self.ids = np.arange(n_users, dtype=np.int64)
+        self.rows = np.arange(n_users, dtype=np.int64)
+        genre_sets = [self.store.genre_set(i) for i in range(n_users)]
+        expanded = [expand_genres(genres, self.index.genre_ontology) for genres in genre_sets]
+        for i, signature in enumerate(self.index.hasher.signatures(expanded)):
+            self.index._insert_signature(i, genre_sets[i], signature)
+        # Cubetas como arrays para unir los candidatos con numpy (se rehacen al cambiar la cubeta)
+        self._arrays = [{} for _ in range(bands)]
+
+    def _bucket(self, band, key):
+        array = self._arrays[band].get(key)
+        if array is None:
+            array = self._arrays[band][key] = np.array(self.index.buckets[band][key], dtype=np.int64)
+        return array
+
+    def _bucket_rows(self, i):
+        """Filas de todas las cubetas de la fila i, repetidas una vez por banda compartida"""
+        keys = self.index.band_keys[int(self.ids[i])]
+        return self.rows[np.concatenate([self._bucket(band, key) for band, key in enumerate(keys)])]
+
+    def candidates(self, i):
+        """Filas que comparten alguna banda con la fila i, las que más bandas comparten primero
+
+        Se quedan como mucho max_candidates: con vocabularios pequeños casi
+        todos los usuarios coinciden en alguna banda y puntuarlos todos
+        costaría tanto como el cálculo exacto.
+        """
+        rows = self._bucket_rows(i)
+        votes = np.bincount(rows, minlength=len(self.store))
+        votes[i] = 0
+        if len(rows) > self.max_candidates and len(votes) > self.max_candidates:
+            # Los max_candidates con más bandas compartidas (argpartition evita ordenar todas las filas)
+            found = np.argpartition(-votes, self.max_candidates)[:self.max_candidates]
+            found = found[votes[found] > 0]
+        else:
+            found = np.flatnonzero(votes)
+        return np.sort(found)
+
+    def bucket_mates(self, i):
+        """Filas que comparten alguna banda con la fila i, sin límite (sin incluirla)"""
+        mates = np.unique(self._bucket_rows(i))
+        return mates[mates != i]
+
+    def _discard(self, user_id):
+        for band, key in enumerate(self.index.band_keys[user_id]):
+            self._arrays[band].pop(key, None)
+        self.index.remove(user_id)
+
+    def _rescorer(self, store):
+        from neighbors import TopKIndex
+
+        self.store = store
+        self.exact = TopKIndex(store, self.ontology_index)
+
+    def update(self, store, i):
+        """Aplicar la inserción (fila nueva al final) o la modificación de la fila i
+
+        Devuelve las filas cuyas cubetas compartidas con i han cambiado: sus
+        candidatos, y por tanto sus listas, pueden ser otros.
+        """
+        if i == len(self.ids):
+            user_id = len(self.rows)
+            self.ids = np.append(self.ids, user_id)
+            self.rows = np.append(self.rows, i)
+            before = np.zeros(0, dtype=np.int64)
+        else:
+            user_id = int(self.ids[i])
+            before = self.bucket_mates(i)
+            self._discard(user_id)
+        self._rescorer(store)
+        self.index.insert(user_id, store.genre_set(i))
+        for band, key in enumerate(self.index.band_keys[user_id]):
+            self._arrays[band].pop(key, None)
+        return np.union1d(before, self.bucket_mates(i))
+
+    def remove(self, store, i):
+        """Aplicar el borrado de la fila i; devuelve (ya renumeradas) las filas que compartían cubeta con ella"""
+        user_id = int(self.ids[i])
+        before = self.bucket_mates(i)
+        self._discard(user_id)
+        self.ids = np.delete(self.ids, i)
+        self.rows[user_id] = -1
+        self.rows[self.rows > i] -= 1
+        self._rescorer(store)
+        before[before > i] -= 1
+        return before
+
+    def _top_k_row(self, i, k):
+        """Índices y similitudes de los k vecinos aproximados de la fila i"""
+        from neighbors import RANK_DECIMALS
+
+        n_users = len(self.store)
+        k = min(k, n_users - 1)
+        if k <= 0:
+            return [], []
+        candidates = self.candidates(i)
+        scores = self.exact.score(i, candidates) if len(candidates) else np.zeros(0)
+        # Similitud descendente y, en caso de empate, índice de usuario
+        order = np.lexsort((candidates, -np.round(scores, RANK_DECIMALS)))[:k]
+        indices = candidates[order].tolist()
+        similarities = scores[order].tolist()
+
+        if len(indices) < k:
+            taken = set(indices) | {i}
+            for j in range(n_users):
+                if len(indices) == k:
+                    break
+                if j not in taken:
+                    indices.append(j)
+                    similarities.append(0.0)
+        return indices, similarities
+
+    def top_k_similar(self, user, k=5):
+        """Los k usuarios más similares a user (aproximado) como lista de (usuario, similitud)"""
+        indices, scores = self._top_k_row(self.store.index_of(user), k)
+        return [(self.store.users[j], score) for j, score in zip(indices, scores)]
+
+    def top_k_all(self, k=5, progress=None, dtype=np.float32):
+        """Arrays n x k de vecinos aproximados y sus similitudes, como TopKIndex.top_k_all"""
+        n_users = len(self.store)
+        k = max(0, min(k, n_users - 1))
+        neighbors = np.zeros((n_users, k), dtype=np.int32)
+        similarities = np.zeros((n_users, k), dtype=dtype)
+        for i in range(n_users):
+            if k:
+                neighbors[i], similarities[i] = self._top_k_row(i, k)
+            if progress is not None and ((i + 1) % 1024 == 0 or i + 1 == n_users):
+                progress(i + 1, n_users)
+        return neighbors, similarities
+
+
+class LSHNeighborLists:
+    """Listas de k vecinos aproximados de todos los usuarios (misma interfaz que IncrementalNeighbors)
+
+    Al insertar, modificar o borrar un usuario se actualizan solo sus cubetas
+    y se vuelven a puntuar su lista, las de los usuarios que comparten (o
+    compartían) cubeta con él y las que lo contenían. El resultado coincide
+    con reconstruir el índice completo.
+    """
+
+    def __init__(self, user_preferences, ontology_index, k=5, genre_ontology=None, progress=None):
+        from store import PreferenceStore
+
+        self.ontology_index = ontology_index
+        self.genre_ontology = genre_ontology
+        self.k = k
+        self._rebuild(PreferenceStore.from_preferences(user_preferences), progress)
+
+    def _rebuild(self, store, progress=None):
+        self.store = store
+        self.index = LSHNeighbors(store, self.ontology_index, self.genre_ontology)
+        self.neighbors, self.similarities = self.index.top_k_all(self.k, progress=progress)
+
+    def _rescore(self, rows):
+        for v in rows:
+            self.neighbors[v], self.similarities[v] = self.index._top_k_row(int(v), self.k)
+
+    def update(self, store, i):
+        """Aplicar la inserción (fila nueva al final) o la modificación del usuario de la fila i"""
+        if len(store) - 1 < self.k or len(store) < 3:
+            # Con tan pocos usuarios las listas cambian de anchura: reconstruir
+            self._rebuild(store)
+            return
+        containing = np.flatnonzero((self.neighbors == i).any(axis=1))
+        mates = self.index.update(store, i)
+        self.store = store
+        if i == len(self.neighbors):
+            self.neighbors = np.vstack([self.neighbors, np.zeros((1, self.k), dtype=self.neighbors.dtype)])
+            self.similarities = np.vstack([self.similarities, np.zeros((1, self.k), dtype=self.similarities.dtype)])
+        self._rescore(np.union1d(np.union1d(containing, mates), [i]))
+
+    def remove(self, store, i):
+        """Aplicar el borrado del usuario que ocupaba la fila i"""
+        if len(store) - 1 < self.k or len(store) < 3:
+            self._rebuild(store)
+            return
+        containing = np.flatnonzero((self.neighbors == i).any(axis=1))
+        mates = self.index.remove(store, i)
+        self.store = store
+        keep = np.arange(len(self.neighbors)) != i
+        self.neighbors = self.neighbors[keep]
+        self.similarities = self.similarities[keep]
+        # Las filas posteriores a i bajan una posición
+        self.neighbors[self.neighbors > i] -= 1
+        containing = containing[containing != i]
+        containing[containing > i] -= 1
+        self._rescore(np.union1d(containing, mates))
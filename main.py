@@ -1,139 +1,19 @@
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox, scrolledtext
-import pandas as pd
-import numpy as np
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-import seaborn as sns
-from scipy.cluster.hierarchy import dendrogram, linkage, fcluster
-from scipy.spatial.distance import pdist, squareform
-import csv
 from collections import defaultdict
+import os
 import warnings
-import json
-import re
-from unidecode import unidecode
-import spacy
-from nltk.corpus import stopwords
-from nltk.stem import SnowballStemmer
-import nltk
+from engine import PreferenceEngine
+from cache import ResultCache
+from tasks import TaskRunner
+import instrumentation
 
-warnings.filterwarnings('ignore')
-
-# Descargar recursos de NLTK si no están disponibles
-try:
-    nltk.download('stopwords', quiet=True)
-except:
-    pass
+# Ontología del proyecto, junto a este script
+ONTOLOGY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ontology.json')
+# Fuera del directorio de la caché: la matriz n x n puede superar su límite de tamaño
+MATRIX_PATH = os.path.join(os.path.expanduser('~'), '.cache', 'jaccard_similarity_matriz', 'similarity_matrix.dat')
 
-class NLPProcessor:
-    """Procesador de lenguaje natural para español"""
-    
-    def __init__(self):
-        self.stop_words = set(stopwords.words('spanish'))
-        self.stemmer = SnowballStemmer('spanish')
-        
-        # Cargar modelo de spaCy para español si está disponible
-        try:
-            self.nlp = spacy.load("es_core_news_sm")
-            self.spacy_available = True
-        except:
-            self.spacy_available = False
-            print("spaCy español no disponible, usando procesamiento básico")
-        
-        # Diccionario de sinónimos y parónimos
-        self.synonyms = self._load_synonyms()
-        self.paronyms = self._load_paronyms()
-    
-    def _load_synonyms(self):
-        """Cargar diccionario de sinónimos"""
-        synonyms = {
-            'ciencia_ficcion': ['scifi', 'ciencia ficcion', 'ficcion_cientifica'],
-            'terror': ['miedo', 'horror', 'suspenso'],
-            'comedia': ['risa', 'humor', 'divertido'],
-            'drama': ['serio', 'emocional', 'intenso'],
-            'accion': ['aventura', 'emocion', 'movimiento'],
-            'romance': ['amor', 'pasion', 'sentimental'],
-            'fantasia': ['magia', 'imaginacion', 'sobrenatural'],
-            'documental': ['realidad', 'informacion', 'educativo'],
-            'animacion': ['dibujos', 'cartoon', 'animado'],
-            'thriller': ['suspense', 'tension', 'emocionante'],
-            'musical': ['musica', 'cantos', 'baile'],
-            'aventura': ['exploracion', 'viaje', 'descubrimiento'],
-            'biografia': ['vida', 'historia_personal', 'real'],
-            'historia': ['historico', 'epoca', 'pasado'],
-            'crimen': ['delito', 'policial', 'investigacion'],
-            'western': ['vaquero', 'frontera', 'oeste']
-        }
-        return synonyms
-    
-    def _load_paronyms(self):
-        """Cargar diccionario de parónimos"""
-        paronyms = {
-            'accion': ['acion', 'accion', 'axion'],
-            'comedia': ['comedia', 'comedia', 'komedia'],
-            'drama': ['drama', 'drama', 'dramma'],
-            'terror': ['terror', 'teror', 'terror'],
-            'romance': ['romance', 'romanse', 'romance'],
-            'fantasia': ['fantasia', 'fantasía', 'fantasia'],
-            'ciencia_ficcion': ['ciencia_ficcion', 'ciencia ficcion', 'sci-fi'],
-            'documental': ['documental', 'documental', 'documental'],
-            'animacion': ['animacion', 'animación', 'animation'],
-            'thriller': ['thriller', 'triller', 'suspenso'],
-            'aventura': ['aventura', 'aventura', 'adventura'],
-            'biografia': ['biografia', 'biografía', 'biography'],
-            'historia': ['historia', 'história', 'history'],
-            'musical': ['musical', 'musical', 'music'],
-            'crimen': ['crimen', 'crimen', 'crime'],
-            'western': ['western', 'western', 'wester']
-        }
-        return paronyms
-    
-    def preprocess_text(self, text):
-        """Preprocesar texto: normalizar, eliminar stop words, etc."""
-        if not isinstance(text, str):
-            return text
-            
-        # Convertir a minúsculas y normalizar
-        text = text.lower().strip()
-        text = unidecode(text)  # Eliminar acentos
-        text = re.sub(r'[^a-z0-9_\s]', '', text)  # Eliminar caracteres especiales
-        text = re.sub(r'\s+', ' ', text)  # Eliminar espacios múltiples
-        
-        return text
-    
-    def normalize_genre(self, genre):
-        """Normalizar género cinematográfico"""
-        genre = self.preprocess_text(genre)
-        
-        # Reemplazar sinónimos
-        for main_genre, synonyms in self.synonyms.items():
-            if genre in synonyms or genre == main_genre:
-                return main_genre
-        
-        # Corregir parónimos
-        for main_genre, variations in self.paronyms.items():
-            if genre in variations:
-                return main_genre
-        
-        # Stemming
-        stemmed = self.stemmer.stem(genre)
-        for main_genre in self.synonyms.keys():
-            if stemmed in [self.stemmer.stem(s) for s in [main_genre] + self.synonyms[main_genre]]:
-                return main_genre
-        
-        return genre
-    
-    def is_stop_word(self, word):
-        """Verificar si una palabra es stop word"""
-        return word in self.stop_words or len(word) < 3
-    
-    def lemmatize(self, text):
-        """Lematizar texto usando spaCy si está disponible"""
-        if self.spacy_available:
-            doc = self.nlp(text)
-            return ' '.join([token.lemma_ for token in doc])
-        return text
+warnings.filterwarnings('ignore')
 
 class UserPreferencesApp:
     def __init__(self, root):
@@ -142,40 +22,20 @@ class UserPreferencesApp:
         self.root.geometry("1200x800")
         self.root.configure(bg='#f0f0f0')
         
-        # Inicializar procesador NLP
-        self.nlp_processor = NLPProcessor()
+        # Motor sin interfaz: datos, similitud, clustering y recomendaciones
+        # Los resultados de "Procesar Datos" se guardan en una caché en disco
+        # y, en poblaciones grandes, la matriz completa se escribe por teselas en un memmap
+        self.engine = PreferenceEngine(cache=ResultCache(), matrix_path=MATRIX_PATH, matrix_dtype='float16')
         
-        # Variables de datos
-        self.data = None
-        self.similarity_matrix = None
-        self.linkage_matrix = None
-        self.clusters = None
-        self.user_preferences = {}
-        self.genre_ontology = self._create_genre_ontology()
+        # Carga, procesamiento y dendrograma se ejecutan en un hilo de trabajo
+        self.tasks = TaskRunner(self.root, self._show_task_progress, self._update_task_state)
         
-        self._setup_ui()
+        # Coordenadas del dendrograma por subárbol y ruta de despliegue actual
+        self._dendrogram_layout = None
+        self._dendrogram_source = None
+        self._dendrogram_path = []
         
-    def _create_genre_ontology(self):
-        """Crear una ontología semántica mejorada de géneros"""
-        ontology = {
-            'ciencia_ficcion': {'cyberpunk', 'distopia', 'espacial', 'alienigenas', 'tecnologia', 'futuro', 'scifi'},
-            'terror': {'paranormal', 'gore', 'slasher', 'psicologico', 'vampiros', 'zombis', 'miedo', 'horror'},
-            'aventura': {'epico', 'superheroes', 'road_movie', 'exploracion', 'viaje', 'descubrimiento'},
-            'drama': {'biografia', 'psicologico', 'coming_of_age', 'independiente', 'emocional', 'serio'},
-            'comedia': {'romantico', 'parodia', 'sketch', 'buddy_movie', 'mockumentary', 'humor', 'risa'},
-            'thriller': {'suspenso', 'policiaco', 'espionaje', 'misterio', 'noir', 'tension', 'emocionante'},
-            'romance': {'romantico', 'romance_historico', 'amor', 'pasion', 'sentimental'},
-            'fantasia': {'medieval', 'mitologia', 'fantasia_urbana', 'epico', 'magia', 'sobrenatural'},
-            'animacion': {'infantil', 'familiar', 'animacion_adulta', 'dibujos', 'cartoon'},
-            'accion': {'superheroes', 'guerra', 'epico', 'lucha', 'pelea', 'emocion'},
-            'documental': {'naturaleza', 'ciencia', 'historia', 'biografia', 'realidad', 'educativo'},
-            'historia': {'biografia', 'epico', 'guerra', 'romance_historico', 'historico', 'epoca'},
-            'musical': {'familiar', 'romance', 'biografia', 'musica', 'baile', 'cantos'},
-            'western': {'epico', 'aventura', 'vaquero', 'frontera', 'oeste'},
-            'crimen': {'noir', 'policiaco', 'thriller', 'delito', 'investigacion'},
-            'independiente': {'arte', 'experimental', 'festival', 'alternativo'}
-        }
-        return ontology
+        self._setup_ui()
     
     def _setup_ui(self):
         """Configurar la interfaz de usuario"""
@@ -204,6 +64,24 @@ class UserPreferencesApp:
                   command=self.show_similarity_matrix).grid(row=0, column=3, padx=(0, 5))
         ttk.Button(control_frame, text="Ver Ontología", 
                   command=self.show_ontology).grid(row=0, column=4, padx=(0, 5))
+        ttk.Button(control_frame, text="Limpiar Caché", 
+                  command=self.clear_cache).grid(row=0, column=5, padx=(0, 5))
+        self.cancel_button = ttk.Button(control_frame, text="Cancelar", state=tk.DISABLED,
+                                        command=self.tasks.cancel)
+        self.cancel_button.grid(row=0, column=6, padx=(0, 5))
+        
+        # Instrumentación opcional: tiempos y contadores por tarea y volcado de cProfile
+        self.instrumentation_var = tk.BooleanVar(value=False)
+        self.profile_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(control_frame, text="Instrumentación", variable=self.instrumentation_var,
+                        command=self._toggle_instrumentation).grid(row=0, column=7, padx=(0, 5))
+        ttk.Checkbutton(control_frame, text="cProfile", variable=self.profile_var,
+                        command=self._toggle_instrumentation).grid(row=0, column=8, padx=(0, 5))
+        
+        # Vecinos aproximados con MinHash + LSH para conjuntos de usuarios grandes
+        self.lsh_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(control_frame, text="Vecinos aproximados (LSH)", variable=self.lsh_var,
+                        command=self._toggle_neighbor_mode).grid(row=0, column=9)
         
         # Panel de información
         info_frame = ttk.LabelFrame(main_frame, text="Información", padding="10")
@@ -235,20 +113,10 @@ class UserPreferencesApp:
         self.viz_frame.columnconfigure(0, weight=1)
         self.viz_frame.rowconfigure(0, weight=1)
     
-    def load_ontology_from_file(self, file_path):
-        """Cargar ontología desde archivo JSON"""
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                ontology_data = json.load(f)
-                return ontology_data
-        except Exception as e:
-            print(f"Error al cargar ontología: {e}")
-            return self._create_genre_ontology()
-    
     def show_ontology(self):
         """Mostrar información de la ontología"""
         ontology_text = "Ontología de Géneros:\n\n"
-        for main_genre, related in self.genre_ontology.items():
+        for main_genre, related in self.engine.genre_ontology.items():
             ontology_text += f"{main_genre}: {', '.join(related)}\n"
         
         # Crear ventana emergente
@@ -261,201 +129,274 @@ class UserPreferencesApp:
         text_widget.insert(tk.END, ontology_text)
         text_widget.config(state=tk.DISABLED)
     
+    def _start_task(self, name, work, on_done, error_title):
+        """Lanzar una tarea larga en segundo plano; el avance se muestra en el panel de información"""
+        self.info_text.insert(tk.END, f"{name}...\n")
+        # El avance se reescribe siempre en la última línea del panel
+        self.info_text.mark_set('task_progress', 'end-1c')
+        self.info_text.mark_gravity('task_progress', tk.LEFT)
+        self.info_text.see(tk.END)
+        
+        def on_success(result):
+            with instrumentation.timer(f"gui.{name}"):
+                on_done(result)
+            if instrumentation.is_enabled():
+                self._show_instrumentation()
+        
+        def on_error(e):
+            messagebox.showerror("Error", f"{error_title}: {str(e)}")
+        
+        def on_cancel():
+            self._show_task_progress(None, f"✗ {name} cancelado\n")
+        
+        return self.tasks.run(name, work, on_done=on_success, on_error=on_error, on_cancel=on_cancel)
+    
+    def _toggle_instrumentation(self):
+        """Activar o desactivar la instrumentación; al activarla se empieza desde cero"""
+        if self.instrumentation_var.get() or self.profile_var.get():
+            if not instrumentation.is_enabled():
+                instrumentation.reset()
+            instrumentation.enable(profile=self.profile_var.get())
+        else:
+            instrumentation.disable()
+    
+    def _toggle_neighbor_mode(self):
+        """Cambiar entre vecinos exactos y aproximados; las listas se recalculan en la próxima consulta"""
+        if not self._ensure_idle():
+            self.lsh_var.set(self.engine.neighbor_mode == 'lsh')
+            return
+        self.engine.set_neighbor_mode('lsh' if self.lsh_var.get() else 'exact')
+        mode = "aproximados (MinHash + LSH)" if self.lsh_var.get() else "exactos"
+        self.info_text.insert(tk.END, f"✓ Vecinos {mode}\n")
+    
+    def _show_instrumentation(self):
+        """Añadir al panel de información los tiempos y contadores acumulados"""
+        self.info_text.insert(tk.END, "\n" + instrumentation.format_report())
+        if self.profile_var.get():
+            profile_path = self.engine.cache.artifact_path('perfil.prof')
+            try:
+                if instrumentation.dump_profile(profile_path):
+                    self.info_text.insert(tk.END, f"Perfil de cProfile guardado en {profile_path}\n")
+            except Exception as e:
+                self.info_text.insert(tk.END, f"No se pudo guardar el perfil: {e}\n")
+        self.info_text.see(tk.END)
+    
+    def _ensure_idle(self):
+        """Avisar si hay una tarea en curso; los datos del motor no se tocan mientras tanto"""
+        if self.tasks.busy:
+            messagebox.showwarning("Advertencia", "Espera a que termine la tarea en curso o cancélala")
+            return False
+        return True
+    
+    def _show_task_progress(self, task, text):
+        """Reemplazar la línea de avance del panel de información (se ejecuta en el hilo de Tk)"""
+        self.info_text.delete('task_progress', tk.END)
+        self.info_text.insert(tk.END, text)
+        self.info_text.see(tk.END)
+    
+    def _update_task_state(self, task):
+        """Activar el botón de cancelar y mostrar la tarea en el título mientras se ejecuta"""
+        if task is None:
+            self.cancel_button.config(state=tk.DISABLED)
+            self.root.title("Preferencias de Usuarios")
+        else:
+            self.cancel_button.config(state=tk.NORMAL)
+            self.root.title(f"Preferencias de Usuarios - {task.name}")
+    
     def load_csv(self):
         """Cargar archivo CSV con procesamiento NLP"""
+        if not self._ensure_idle():
+            return
         file_path = filedialog.askopenfilename(
             title="Seleccionar archivo CSV",
             filetypes=[("CSV files", "*.csv"), ("All files", "*.*")]
         )
         
         if file_path:
-            try:
-                # Cargar ontología desde archivo si existe
-                ontology_path = "C:/Users/ferna/Desktop/jaccardSimilarity/ontology.json"
-                try:
-                    self.genre_ontology = self.load_ontology_from_file(ontology_path)
-                    self.info_text.insert(tk.END, f"✓ Ontología cargada desde {ontology_path}\n")
-                except:
-                    self.info_text.insert(tk.END, "✓ Usando ontología por defecto\n")
-                
-                # Leer CSV
-                self.data = []
-                self.user_preferences = {}
-                genres_count = defaultdict(int)
-                
-                with open(file_path, 'r', encoding='utf-8') as file:
-                    csv_reader = csv.reader(file)
-                    for row_num, row in enumerate(csv_reader):
-                        if row:  # Verificar que la fila no esté vacía
-                            user = row[0].strip()
-                            processed_genres = set()
-                            
-                            for genre in row[1:]:
-                                if genre.strip():  # Ignorar celdas vacías
-                                    # Procesar con NLP
-                                    normalized_genre = self.nlp_processor.normalize_genre(genre)
-                                    
-                                    # Ignorar stop words y palabras muy cortas
-                                    if not self.nlp_processor.is_stop_word(normalized_genre):
-                                        processed_genres.add(normalized_genre)
-                                        genres_count[normalized_genre] += 1
-                            
-                            self.user_preferences[user] = processed_genres
-                            self.data.append([user] + list(processed_genres))
-                
-                # Actualizar combo de usuarios
-                self.user_combo['values'] = list(self.user_preferences.keys())
-                
-                self.info_text.delete(1.0, tk.END)
-                self.info_text.insert(tk.END, f"✓ CSV cargado exitosamente con procesamiento NLP\n")
-                self.info_text.insert(tk.END, f"Usuarios cargados: {len(self.user_preferences)}\n")
-                self.info_text.insert(tk.END, f"Géneros únicos después de normalización: {len(genres_count)}\n\n")
+            def work(task):
+                # Cargar ontología desde archivo si existe; leerla y compilarla
+                # (o abrir su forma binaria en caché) también queda fuera del hilo de Tk
+                ontology_loaded = os.path.exists(ONTOLOGY_PATH) and os.path.getsize(ONTOLOGY_PATH) > 0
+                if ontology_loaded:
+                    task.report("Cargando ontología...\n", force=True)
+                    self.engine.genre_ontology = self.engine.load_ontology_from_file(ONTOLOGY_PATH)
                 
-                # Mostrar estadísticas de géneros
-                top_genres = sorted(genres_count.items(), key=lambda x: x[1], reverse=True)[:10]
-                self.info_text.insert(tk.END, "Top 10 géneros más populares:\n")
-                for genre, count in top_genres:
-                    self.info_text.insert(tk.END, f"{genre}: {count} usuarios\n")
-                
-                # Mostrar muestra de datos procesados
-                self.info_text.insert(tk.END, "\nMuestra de datos procesados:\n")
-                for i, (user, prefs) in enumerate(list(self.user_preferences.items())[:3]):
-                    self.info_text.insert(tk.END, f"{user}: {', '.join(list(prefs)[:5])}\n")
-                
-            except Exception as e:
-                messagebox.showerror("Error", f"Error al cargar CSV: {str(e)}")
-    
-    def _get_all_genres(self):
-        """Obtener todos los géneros únicos"""
-        all_genres = set()
-        for preferences in self.user_preferences.values():
-            all_genres.update(preferences)
-        return all_genres
+                # Leer CSV por bloques, normalizando en paralelo las celdas distintas
+                def progress(rows, bytes_read, total_bytes):
+                    percent = 100 * bytes_read / total_bytes if total_bytes else 100
+                    task.report(f"Cargando CSV: {rows} filas ({percent:.0f}%)\n")
+                task.report("Cargando CSV...\n", force=True)
+                result = self.engine.load_csv(file_path, progress=progress,
+                                              snapshot_path=self._snapshot_path(file_path))
+                return ontology_loaded, result
+            
+            self._start_task("Carga del CSV", work, lambda loaded: self._show_csv_loaded(*loaded),
+                             "Error al cargar CSV")
     
-    def jaccard_similarity(self, set1, set2):
-        """Calcular similitud de Jaccard entre dos conjuntos"""
-        intersection = len(set1.intersection(set2))
-        union = len(set1.union(set2))
-        return intersection / union if union > 0 else 0
+    def _snapshot_path(self, file_path):
+        """Instantánea binaria de un CSV en el directorio de la caché (una por ruta de origen)"""
+        import hashlib
+        name = hashlib.sha256(os.path.abspath(file_path).encode('utf-8')).hexdigest()[:16]
+        return self.engine.cache.artifact_path(f"preferencias_{name}.snap")
     
-    def enhanced_jaccard_similarity(self, set1, set2):
-        """Similitud de Jaccard mejorada con ontología semántica y NLP"""
-        # Similitud básica de Jaccard
-        basic_similarity = self.jaccard_similarity(set1, set2)
-        
-        # Similitud semántica basada en ontología
-        semantic_score = 0
-        total_comparisons = 0
-        
-        for genre1 in set1:
-            for genre2 in set2:
-                total_comparisons += 1
-                if genre1 == genre2:
-                    semantic_score += 1
-                else:
-                    # Verificar relaciones ontológicas
-                    related = False
-                    # Relaciones directas
-                    if (genre1 in self.genre_ontology and 
-                        genre2 in self.genre_ontology.get(genre1, set())):
-                        semantic_score += 0.8
-                        related = True
-                    elif (genre2 in self.genre_ontology and 
-                          genre1 in self.genre_ontology.get(genre2, set())):
-                        semantic_score += 0.8
-                        related = True
-                    
-                    # Relaciones indirectas (mismo grupo ontológico)
-                    if not related:
-                        for parent, children in self.genre_ontology.items():
-                            if genre1 in children and genre2 in children:
-                                semantic_score += 0.6
-                                break
-                        else:
-                            # Similitud léxica como último recurso
-                            if self.nlp_processor.stemmer.stem(genre1) == self.nlp_processor.stemmer.stem(genre2):
-                                semantic_score += 0.4
-        
-        semantic_similarity = semantic_score / total_comparisons if total_comparisons > 0 else 0
-        
-        # Combinar similitudes (60% básica, 40% semántica)
-        return 0.6 * basic_similarity + 0.4 * semantic_similarity
+    def _show_csv_loaded(self, ontology_loaded, result):
+        """Mostrar el resumen de la carga del CSV"""
+        genres_count = result.genre_counts
+        
+        # Actualizar combo de usuarios
+        self.user_combo['values'] = list(self.engine.user_preferences.keys())
+        
+        self.info_text.delete(1.0, tk.END)
+        self.info_text.insert(tk.END, f"✓ CSV cargado exitosamente con procesamiento NLP\n")
+        if ontology_loaded:
+            self.info_text.insert(tk.END, f"✓ Ontología cargada desde {ONTOLOGY_PATH} "
+                                          f"({len(self.engine.genre_ontology)} géneros con subgéneros)\n")
+        else:
+            self.info_text.insert(tk.END, "✓ Usando ontología por defecto\n")
+        if self.engine.snapshot_hit:
+            self.info_text.insert(tk.END, "Preferencias normalizadas cargadas desde la instantánea binaria\n")
+        self.info_text.insert(tk.END, f"Usuarios cargados: {len(self.engine.user_preferences)}\n")
+        self.info_text.insert(tk.END, f"Géneros únicos después de normalización: {len(genres_count)}\n")
+        self.info_text.insert(tk.END, f"Celdas procesadas: {result.cells} "
+                                      f"({result.unique_cells} valores distintos normalizados)\n\n")
+        
+        # Mostrar estadísticas de géneros
+        top_genres = sorted(genres_count.items(), key=lambda x: x[1], reverse=True)[:10]
+        self.info_text.insert(tk.END, "Top 10 géneros más populares:\n")
+        for genre, count in top_genres:
+            self.info_text.insert(tk.END, f"{genre}: {count} usuarios\n")
+        
+        # Mostrar muestra de datos procesados
+        self.info_text.insert(tk.END, "\nMuestra de datos procesados:\n")
+        for i, (user, prefs) in enumerate(list(self.engine.user_preferences.items())[:3]):
+            self.info_text.insert(tk.END, f"{user}: {', '.join(list(prefs)[:5])}\n")
     
     def process_data(self):
         """Procesar datos y calcular matriz de similitud"""
-        if not self.user_preferences:
+        if not self._ensure_idle():
+            return
+        if not self.engine.user_preferences:
             messagebox.showwarning("Advertencia", "Primero carga un archivo CSV")
             return
         
+        def work(task):
+            # Ward exacto sobre el vector condensado o, en poblaciones grandes,
+            # cubetas MinHash sin matriz global ni dendrograma
+            def progress(stage, done, total):
+                task.report(f"Calculando {stage}: {done}/{total}\n", force=done == total)
+            return self.engine.process(progress=progress)
+        
+        self._start_task("Procesamiento", work, self._show_processed, "Error al procesar datos")
+    
+    def _show_processed(self, mode):
+        """Mostrar el resumen del procesamiento y la distribución de clusters"""
+        n_users = len(self.engine.user_preferences)
+        if mode == 'linkage':
+            matrix_info = f"{n_users}x{n_users}"
+        elif self.engine.similarity_matrix is not None:
+            matrix_info = f"{n_users}x{n_users} en disco ({self.engine.matrix_dtype}, clustering por cubetas MinHash)"
+        else:
+            matrix_info = "omitida (clustering por cubetas MinHash)"
+        
+        self.info_text.delete(1.0, tk.END)
+        self.info_text.insert(tk.END, "✓ Datos procesados exitosamente con NLP\n")
+        self.info_text.insert(tk.END, f"Matriz de similitud: {matrix_info}\n")
+        if self.engine.cache_hit:
+            self.info_text.insert(tk.END, "Resultados cargados desde la caché en disco\n")
+        self.info_text.insert(tk.END, f"Clusters identificados: {len(set(self.engine.clusters))}\n\n")
+        
+        # Mostrar estadísticas de clusters
+        cluster_counts = defaultdict(int)
+        for cluster in self.engine.clusters:
+            cluster_counts[cluster] += 1
+        
+        self.info_text.insert(tk.END, "Distribución de clusters:\n")
+        for cluster, count in sorted(cluster_counts.items()):
+            self.info_text.insert(tk.END, f"Cluster {cluster}: {count} usuarios\n")
+    
+    def clear_cache(self):
+        """Borrar los resultados guardados en la caché en disco"""
+        if not self._ensure_idle():
+            return
         try:
-            users = list(self.user_preferences.keys())
-            n_users = len(users)
-            
-            # Crear matriz de similitud
-            self.similarity_matrix = np.zeros((n_users, n_users))
-            
-            for i in range(n_users):
-                for j in range(n_users):
-                    if i == j:
-                        self.similarity_matrix[i][j] = 1.0
-                    else:
-                        similarity = self.enhanced_jaccard_similarity(
-                            self.user_preferences[users[i]], 
-                            self.user_preferences[users[j]]
-                        )
-                        self.similarity_matrix[i][j] = similarity
-            
-            # Calcular clustering jerárquico
-            distance_matrix = 1 - self.similarity_matrix
-            np.fill_diagonal(distance_matrix, 0)
-            
-            condensed_dist = squareform(distance_matrix)
-            self.linkage_matrix = linkage(condensed_dist, method='ward')
-            
-            # Generar clusters
-            self.clusters = fcluster(self.linkage_matrix, t=0.7, criterion='distance')
-            
-            self.info_text.delete(1.0, tk.END)
-            self.info_text.insert(tk.END, "✓ Datos procesados exitosamente con NLP\n")
-            self.info_text.insert(tk.END, f"Matriz de similitud: {n_users}x{n_users}\n")
-            self.info_text.insert(tk.END, f"Clusters identificados: {len(set(self.clusters))}\n\n")
-            
-            # Mostrar estadísticas de clusters
-            cluster_counts = defaultdict(int)
-            for cluster in self.clusters:
-                cluster_counts[cluster] += 1
-            
-            self.info_text.insert(tk.END, "Distribución de clusters:\n")
-            for cluster, count in sorted(cluster_counts.items()):
-                self.info_text.insert(tk.END, f"Cluster {cluster}: {count} usuarios\n")
-            
+            self.engine.clear_cache()
+            self.info_text.insert(tk.END, "✓ Caché de resultados vaciada\n")
         except Exception as e:
-            messagebox.showerror("Error", f"Error al procesar datos: {str(e)}")
+            messagebox.showerror("Error", f"Error al vaciar la caché: {str(e)}")
     
     def create_dendrogram(self):
-        """Crear y mostrar dendrograma"""
-        if self.linkage_matrix is None:
+        """Crear y mostrar dendrograma (truncado a las últimas uniones)"""
+        if not self._ensure_idle():
+            return
+        if self.engine.linkage_matrix is None:
             messagebox.showwarning("Advertencia", "Primero procesa los datos")
             return
         
+        # Las coordenadas de cada subárbol se guardan mientras no cambie la matriz de enlace
+        if self._dendrogram_layout is None or self._dendrogram_source is not self.engine.linkage_matrix:
+            from hierarchy import DendrogramLayout
+            self._dendrogram_source = self.engine.linkage_matrix
+            self._dendrogram_layout = DendrogramLayout(self.engine.linkage_matrix,
+                                                       self.engine.user_preferences.users)
+        self._dendrogram_path = []
+        self._show_dendrogram_node(self._dendrogram_layout.root)
+    
+    def _show_dendrogram_node(self, node):
+        """Calcular en segundo plano el subárbol de node y dibujarlo"""
+        layout = self._dendrogram_layout
+        
+        def work(task):
+            # Las coordenadas se calculan en el hilo de trabajo; matplotlib solo se usa en el de Tk
+            task.report(f"Calculando coordenadas del dendrograma ({layout.size(node)} usuarios)\n", force=True)
+            return layout.layout(node)
+        
+        def on_done(tree):
+            self._dendrogram_path.append(node)
+            self._draw_dendrogram(tree)
+        
+        self._start_task("Dendrograma", work, on_done, "Error al generar el dendrograma")
+    
+    def _dendrogram_up(self):
+        """Volver al subárbol anterior del dendrograma"""
+        if len(self._dendrogram_path) > 1 and self._ensure_idle():
+            self._dendrogram_path.pop()
+            self._show_dendrogram_node(self._dendrogram_path.pop())
+    
+    def _dendrogram_home(self):
+        """Volver al árbol completo"""
+        if len(self._dendrogram_path) > 1 and self._ensure_idle():
+            self._dendrogram_path = []
+            self._show_dendrogram_node(self._dendrogram_layout.root)
+    
+    def _draw_dendrogram(self, tree):
+        """Dibujar un dendrograma ya calculado en el panel de visualización"""
+        # matplotlib solo se importa al dibujar el primer dendrograma
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+        
         # Limpiar frame de visualización
         for widget in self.viz_frame.winfo_children():
             widget.destroy()
         
-        # Crear figura
-        fig, ax = plt.subplots(1, 1, figsize=(12, 6))
-        
-        # Crear dendrograma
-        users = list(self.user_preferences.keys())
-        dendrogram(self.linkage_matrix, labels=users, ax=ax, orientation='top')
-        
-        ax.set_title('Dendrograma de Clustering Jerárquico de Usuarios', fontsize=14, fontweight='bold')
-        ax.set_xlabel('Usuarios', fontsize=12)
+        # Crear figura (sin pyplot, para no acumular figuras al desplegar subárboles)
+        fig = Figure(figsize=(12, 6))
+        ax = fig.add_subplot(1, 1, 1)
+        
+        # Mismo trazado que scipy: cada unión es una U con hojas separadas 10 unidades
+        for xs, ys, color in zip(tree['icoord'], tree['dcoord'], tree['color_list']):
+            ax.plot(xs, ys, color=color)
+        n_leaves = len(tree['ivl'])
+        ax.set_xlim(0, 10 * n_leaves)
+        ax.set_xticks(range(5, 10 * n_leaves, 10))
+        ax.set_xticklabels(tree['ivl'], rotation=45, ha='right')
+        
+        title = 'Dendrograma de Clustering Jerárquico de Usuarios'
+        if tree['root'] != self._dendrogram_layout.root:
+            title += f" (subárbol de {tree['size']} usuarios)"
+        ax.set_title(title, fontsize=14, fontweight='bold')
+        ax.set_xlabel('Usuarios (doble clic en una rama "(n)" para desplegarla)', fontsize=12)
         ax.set_ylabel('Distancia', fontsize=12)
         
-        # Rotar etiquetas para mejor legibilidad
-        plt.setp(ax.get_xticklabels(), rotation=45, ha='right')
-        
         # Ajustar layout
         fig.tight_layout()
         
@@ -464,16 +405,32 @@ class UserPreferencesApp:
         canvas.draw()
         canvas.get_tk_widget().grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
         
-        # Scrollbar para el canvas
-        scrollbar = ttk.Scrollbar(self.viz_frame, orient="horizontal", command=canvas.get_tk_widget().xview)
-        scrollbar.grid(row=1, column=0, sticky=(tk.W, tk.E))
-        canvas.get_tk_widget().configure(xscrollcommand=scrollbar.set)
+        def on_click(event):
+            # Desplegar solo el subárbol de la rama contraída más cercana al clic
+            if not event.dblclick or event.inaxes is not ax or event.xdata is None:
+                return
+            node = self._dendrogram_layout.leaf_at(tree, event.xdata)
+            if node is not None and not self._dendrogram_layout.is_leaf(node) and self._ensure_idle():
+                self._show_dendrogram_node(node)
+        
+        canvas.mpl_connect('button_press_event', on_click)
+        
+        # Navegación entre subárboles
+        nav_frame = ttk.Frame(self.viz_frame)
+        nav_frame.grid(row=1, column=0, sticky=(tk.W, tk.E))
+        ttk.Button(nav_frame, text="Subir", command=self._dendrogram_up).pack(side=tk.LEFT, padx=(0, 5))
+        ttk.Button(nav_frame, text="Árbol completo", command=self._dendrogram_home).pack(side=tk.LEFT, padx=(0, 5))
+        ttk.Label(nav_frame, text=f"{tree['size']} usuarios, {n_leaves} ramas visibles").pack(side=tk.LEFT)
+        self.info_text.insert(tk.END, f"✓ Dendrograma generado ({n_leaves} ramas de {tree['size']} usuarios)\n")
     
     def show_similarity_matrix(self):
-        """Mostrar matriz de similitud como tabla de datos"""
-        if self.similarity_matrix is None:
+        """Mostrar matriz de similitud como tabla de datos virtualizada"""
+        if not self._ensure_idle():
+            return
+        if self.engine.similarity_matrix is None:
             messagebox.showwarning("Advertencia", "Primero procesa los datos")
             return
+        from matrix_viewer import SimilarityMatrixView
         
         # Limpiar frame de visualización
         for widget in self.viz_frame.winfo_children():
@@ -484,69 +441,25 @@ class UserPreferencesApp:
         matrix_window.title("Matriz de Similitud - Vista de Datos")
         matrix_window.geometry("800x600")
         
-        # Crear frame principal con scrollbars
-        main_frame = ttk.Frame(matrix_window)
-        main_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
-        
-        # Crear canvas y scrollbars
-        canvas = tk.Canvas(main_frame)
-        v_scrollbar = ttk.Scrollbar(main_frame, orient="vertical", command=canvas.yview)
-        h_scrollbar = ttk.Scrollbar(main_frame, orient="horizontal", command=canvas.xview)
-        
-        # Configurar canvas
-        canvas.configure(yscrollcommand=v_scrollbar.set, xscrollcommand=h_scrollbar.set)
-        
-        # Empaquetar scrollbars y canvas
-        v_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-        h_scrollbar.pack(side=tk.BOTTOM, fill=tk.X)
-        canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        
-        # Crear frame interno para la tabla
-        table_frame = ttk.Frame(canvas)
-        canvas.create_window((0, 0), window=table_frame, anchor="nw")
-        
-        # Obtener usuarios y datos
-        users = list(self.user_preferences.keys())
-        n_users = len(users)
-        
-        # Crear encabezados de columnas
-        for j, user in enumerate(users):
-            ttk.Label(table_frame, text=user, borderwidth=1, relief="solid", 
-                     width=12, background="#f0f0f0", anchor="center").grid(row=0, column=j+1, sticky="nsew")
-        
-        # Crear filas con datos
-        for i, user_row in enumerate(users):
-            # Nombre de usuario en la primera columna
-            ttk.Label(table_frame, text=user_row, borderwidth=1, relief="solid", 
-                     width=12, background="#f0f0f0", anchor="center").grid(row=i+1, column=0, sticky="nsew")
-            
-            # Valores de similitud
-            for j, user_col in enumerate(users):
-                similarity = self.similarity_matrix[i][j]
-                # Determinar color de fondo basado en el valor de similitud
-                color_intensity = int(255 * (1 - similarity))  # Invertido para mejor contraste
-                bg_color = f"#{color_intensity:02x}{color_intensity:02x}ff"  # Azul más intenso para mayor similitud
-                
-                label = ttk.Label(table_frame, text=f"{similarity:.3f}", borderwidth=1, 
-                                 relief="solid", width=12, anchor="center")
-                label.grid(row=i+1, column=j+1, sticky="nsew")
-                
-                # Aplicar color de fondo (necesitamos usar tk.Label para bg)
-                tk_label = tk.Label(table_frame, text=f"{similarity:.3f}", borderwidth=1, 
-                                   relief="solid", width=12, anchor="center", bg=bg_color)
-                tk_label.grid(row=i+1, column=j+1, sticky="nsew")
+        # Solo se dibujan las celdas visibles: abrir la ventana cuesta lo mismo para cualquier n
+        view = SimilarityMatrixView(matrix_window, self.engine.similarity_matrix, self.engine.user_preferences)
         
-        # Configurar grid para expandirse
-        for i in range(n_users + 1):
-            table_frame.rowconfigure(i, weight=1)
-        for j in range(n_users + 1):
-            table_frame.columnconfigure(j, weight=1)
+        # Búsqueda de usuario para saltar a su fila y columna
+        search_frame = ttk.Frame(matrix_window)
+        search_frame.pack(fill=tk.X, padx=10, pady=(10, 0))
+        ttk.Label(search_frame, text=f"{view.n_users} usuarios. Ir a usuario:").pack(side=tk.LEFT)
+        search_var = tk.StringVar()
+        search_entry = ttk.Entry(search_frame, textvariable=search_var, width=20)
+        search_entry.pack(side=tk.LEFT, padx=5)
         
-        # Actualizar scrollregion después de crear los widgets
-        def configure_scroll_region(event):
-            canvas.configure(scrollregion=canvas.bbox("all"))
+        def go_to_user(event=None):
+            if not view.find_user(search_var.get().strip()):
+                messagebox.showwarning("Advertencia", "Usuario no encontrado", parent=matrix_window)
         
-        table_frame.bind("<Configure>", configure_scroll_region)
+        search_entry.bind("<Return>", go_to_user)
+        ttk.Button(search_frame, text="Ir", command=go_to_user).pack(side=tk.LEFT)
+        
+        view.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
         
         # Añadir leyenda
         legend_frame = ttk.Frame(matrix_window)
@@ -559,30 +472,20 @@ class UserPreferencesApp:
     
     def get_recommendations(self):
         """Obtener recomendaciones para usuario seleccionado"""
+        if not self._ensure_idle():
+            return
         selected_user = self.user_combo.get()
         if not selected_user:
             messagebox.showwarning("Advertencia", "Selecciona un usuario")
             return
         
-        if self.similarity_matrix is None:
-            messagebox.showwarning("Advertencia", "Primero procesa los datos")
+        if not self.engine.user_preferences:
+            messagebox.showwarning("Advertencia", "Primero carga un archivo CSV")
             return
         
         try:
-            users = list(self.user_preferences.keys())
-            user_idx = users.index(selected_user)
-            
-            # Obtener similitudes para el usuario seleccionado
-            similarities = self.similarity_matrix[user_idx]
-            
-            # Crear lista de usuarios con sus similitudes (excluyendo al propio usuario)
-            user_similarities = []
-            for i, similarity in enumerate(similarities):
-                if i != user_idx:  # Excluir al propio usuario
-                    user_similarities.append((users[i], similarity))
-            
-            # Ordenar por similitud descendente
-            user_similarities.sort(key=lambda x: x[1], reverse=True)
+            # Top 5 vecinos (exactos con el índice invertido o aproximados con LSH)
+            recommendations = self.engine.recommendations(selected_user, k=5)
             
             # Mostrar recomendaciones
             self.rec_text.delete(1.0, tk.END)
@@ -590,33 +493,33 @@ class UserPreferencesApp:
             self.rec_text.insert(tk.END, "=" * 40 + "\n\n")
             
             # Mostrar preferencias del usuario seleccionado
-            user_prefs = self.user_preferences[selected_user]
-            self.rec_text.insert(tk.END, f"Géneros preferidos:\n{', '.join(sorted(user_prefs))}\n\n")
+            self.rec_text.insert(tk.END, f"Géneros preferidos:\n{', '.join(recommendations['genres'])}\n\n")
+            
+            # Géneros puntuados por la similitud de los vecinos que los tienen
+            if recommendations['recommended_genres']:
+                self.rec_text.insert(tk.END, "Géneros recomendados:\n")
+                for genre in recommendations['recommended_genres']:
+                    self.rec_text.insert(tk.END, f"  {genre['genre']} ({genre['score']:.2f})\n")
+                self.rec_text.insert(tk.END, "\n")
             
             # Top 5 usuarios similares
             self.rec_text.insert(tk.END, "Top 5 usuarios similares:\n")
-            for i, (similar_user, similarity) in enumerate(user_similarities[:5]):
-                similar_prefs = self.user_preferences[similar_user]
-                common_genres = user_prefs.intersection(similar_prefs)
-                
-                self.rec_text.insert(tk.END, f"\n{i+1}. {similar_user} (Similitud: {similarity:.3f})\n")
-                self.rec_text.insert(tk.END, f"   Géneros en común: {', '.join(sorted(common_genres))}\n")
+            for i, neighbor in enumerate(recommendations['neighbors']):
+                self.rec_text.insert(tk.END, f"\n{i+1}. {neighbor['user']} (Similitud: {neighbor['similarity']:.3f})\n")
+                self.rec_text.insert(tk.END, f"   Géneros en común: {', '.join(neighbor['common_genres'])}\n")
                 
                 # Géneros únicos del usuario similar que podrían gustar
-                unique_genres = similar_prefs - user_prefs
-                if unique_genres:
-                    self.rec_text.insert(tk.END, f"   Podrían gustarte: {', '.join(sorted(unique_genres))}\n")
+                if neighbor['suggested_genres']:
+                    self.rec_text.insert(tk.END, f"   Podrían gustarte: {', '.join(neighbor['suggested_genres'])}\n")
             
             # Información del cluster
-            if self.clusters is not None:
-                user_cluster = self.clusters[user_idx]
-                cluster_members = [users[i] for i, cluster in enumerate(self.clusters) if cluster == user_cluster and i != user_idx]
-                if cluster_members:
-                    self.rec_text.insert(tk.END, f"\nMiembros del mismo cluster ({user_cluster}):\n")
-                    self.rec_text.insert(tk.END, ", ".join(cluster_members[:10]))  # Limitar a 10
-                    if len(cluster_members) > 10:
-                        self.rec_text.insert(tk.END, f" y {len(cluster_members) - 10} más...")
-                    self.rec_text.insert(tk.END, "\n")
+            cluster_members = recommendations['cluster_members']
+            if cluster_members:
+                self.rec_text.insert(tk.END, f"\nMiembros del mismo cluster ({recommendations['cluster']}):\n")
+                self.rec_text.insert(tk.END, ", ".join(cluster_members[:10]))  # Limitar a 10
+                if len(cluster_members) > 10:
+                    self.rec_text.insert(tk.END, f" y {len(cluster_members) - 10} más...")
+                self.rec_text.insert(tk.END, "\n")
             
         except Exception as e:
             messagebox.showerror("Error", f"Error al generar recomendaciones: {str(e)}")
@@ -0,0 +1,183 @@
+import tkinter as tk
+from tkinter import ttk
+
+import instrumentation
+
+# Geometría fija de la tabla en píxeles
+CELL_WIDTH = 70
+CELL_HEIGHT = 22
+HEADER_WIDTH = 110
+HEADER_HEIGHT = 24
+
+# Filas materializadas que se conservan entre redibujados
+ROW_CACHE_SIZE = 256
+
+
+def similarity_color(similarity):
+    """Color de fondo de una celda: azul más intenso para mayor similitud"""
+    intensity = int(255 * (1 - min(max(float(similarity), 0.0), 1.0)))
+    return f"#{intensity:02x}{intensity:02x}ff"
+
+
+class SimilarityMatrixView(ttk.Frame):
+    """Tabla virtualizada de la matriz de similitud sobre un Canvas
+
+    Solo se dibujan las celdas del área visible, leyendo de la matriz
+    (condensada o en memmap) las filas que aparecen en pantalla. El coste de
+    abrir la ventana y de cada desplazamiento no depende del número de usuarios.
+    store es el PreferenceStore de la matriz: da los nombres y su índice.
+    """
+
+    def __init__(self, parent, matrix, store):
+        super().__init__(parent)
+        self.matrix = matrix
+        self.store = store
+        self.users = store.users
+        self.n_users = len(self.users)
+        self.top_row = 0
+        self.left_col = 0
+        self._rows = {}
+
+        self.canvas = tk.Canvas(self, bg='white', highlightthickness=0)
+        self.v_scrollbar = ttk.Scrollbar(self, orient="vertical", command=self._on_yscroll)
+        self.h_scrollbar = ttk.Scrollbar(self, orient="horizontal", command=self._on_xscroll)
+        self.status = ttk.Label(self, text="", anchor="w")
+
+        self.status.pack(side=tk.BOTTOM, fill=tk.X)
+        self.h_scrollbar.pack(side=tk.BOTTOM, fill=tk.X)
+        self.v_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+
+        self.canvas.bind("<Configure>", lambda event: self.redraw())
+        self.canvas.bind("<Motion>", self._on_motion)
+        self.canvas.bind("<MouseWheel>", self._on_mousewheel)
+        self.canvas.bind("<Shift-MouseWheel>", lambda event: self._on_mousewheel(event, horizontal=True))
+        # En X11 la rueda llega como botones 4 y 5
+        self.canvas.bind("<Button-4>", lambda event: self.scroll_rows(-3))
+        self.canvas.bind("<Button-5>", lambda event: self.scroll_rows(3))
+        self.canvas.bind("<Shift-Button-4>", lambda event: self.scroll_cols(-3))
+        self.canvas.bind("<Shift-Button-5>", lambda event: self.scroll_cols(3))
+        for key, action in (("<Up>", lambda: self.scroll_rows(-1)), ("<Down>", lambda: self.scroll_rows(1)),
+                            ("<Left>", lambda: self.scroll_cols(-1)), ("<Right>", lambda: self.scroll_cols(1)),
+                            ("<Prior>", lambda: self.scroll_rows(-self.visible_rows())),
+                            ("<Next>", lambda: self.scroll_rows(self.visible_rows()))):
+            self.canvas.bind(key, lambda event, action=action: action())
+        self.canvas.bind("<Button-1>", lambda event: self.canvas.focus_set())
+
+    def visible_rows(self):
+        """Número de filas completas que caben en el área de datos"""
+        return max(1, (self.canvas.winfo_height() - HEADER_HEIGHT) // CELL_HEIGHT)
+
+    def visible_cols(self):
+        """Número de columnas completas que caben en el área de datos"""
+        return max(1, (self.canvas.winfo_width() - HEADER_WIDTH) // CELL_WIDTH)
+
+    def row(self, i):
+        """Fila i de la matriz, con una caché acotada de filas recientes"""
+        values = self._rows.pop(i, None)
+        if values is None:
+            values = self.matrix[i]
+            if len(self._rows) >= ROW_CACHE_SIZE:
+                del self._rows[next(iter(self._rows))]
+        self._rows[i] = values
+        return values
+
+    def find_user(self, user):
+        """Mostrar la fila y la columna de un usuario; devuelve False si no existe"""
+        index = self.store.user_index.get(user)
+        if index is None:
+            return False
+        self.show_cell(index, index)
+        return True
+
+    def scroll_rows(self, delta):
+        self.show_cell(self.top_row + delta, self.left_col)
+
+    def scroll_cols(self, delta):
+        self.show_cell(self.top_row, self.left_col + delta)
+
+    def show_cell(self, row, col):
+        """Colocar la celda (row, col) en la esquina superior izquierda del área visible"""
+        self.top_row = min(max(0, int(row)), max(0, self.n_users - self.visible_rows()))
+        self.left_col = min(max(0, int(col)), max(0, self.n_users - self.visible_cols()))
+        self.redraw()
+
+    def _scroll_target(self, args, offset, visible):
+        """Traducir los argumentos de una Scrollbar a un índice de fila o columna"""
+        if args[0] == 'moveto':
+            return float(args[1]) * self.n_users
+        step = visible if args[2] == 'pages' else 1
+        return offset + int(args[1]) * step
+
+    def _on_yscroll(self, *args):
+        self.show_cell(self._scroll_target(args, self.top_row, self.visible_rows()), self.left_col)
+
+    def _on_xscroll(self, *args):
+        self.show_cell(self.top_row, self._scroll_target(args, self.left_col, self.visible_cols()))
+
+    def _on_mousewheel(self, event, horizontal=False):
+        delta = -3 if event.delta > 0 else 3
+        if horizontal:
+            self.scroll_cols(delta)
+        else:
+            self.scroll_rows(delta)
+
+    def _cell_at(self, x, y):
+        """Índices (fila, columna) de la celda bajo el puntero, o None"""
+        if x < HEADER_WIDTH or y < HEADER_HEIGHT:
+            return None
+        i = self.top_row + (y - HEADER_HEIGHT) // CELL_HEIGHT
+        j = self.left_col + (x - HEADER_WIDTH) // CELL_WIDTH
+        if i >= self.n_users or j >= self.n_users:
+            return None
+        return i, j
+
+    def _on_motion(self, event):
+        cell = self._cell_at(event.x, event.y)
+        if cell is None:
+            return
+        i, j = cell
+        self.status.config(text=f"{self.users[i]} × {self.users[j]}: {self.row(i)[j]:.4f}")
+
+    def redraw(self):
+        """Dibujar solo las cabeceras y celdas del área visible"""
+        with instrumentation.timer('gui.matrix_redraw'):
+            self._redraw()
+
+    def _redraw(self):
+        canvas = self.canvas
+        canvas.delete('all')
+        if self.n_users == 0:
+            return
+        width, height = canvas.winfo_width(), canvas.winfo_height()
+        n_rows = min(self.n_users - self.top_row, -(-(height - HEADER_HEIGHT) // CELL_HEIGHT))
+        n_cols = min(self.n_users - self.left_col, -(-(width - HEADER_WIDTH) // CELL_WIDTH))
+        rows = range(self.top_row, self.top_row + max(0, n_rows))
+        cols = range(self.left_col, self.left_col + max(0, n_cols))
+
+        # Cabeceras de columnas y de filas
+        for c, j in enumerate(cols):
+            x = HEADER_WIDTH + c * CELL_WIDTH
+            canvas.create_rectangle(x, 0, x + CELL_WIDTH, HEADER_HEIGHT, fill='#f0f0f0', outline='#999999')
+            canvas.create_text(x + CELL_WIDTH // 2, HEADER_HEIGHT // 2, text=str(self.users[j])[:10])
+        for r, i in enumerate(rows):
+            y = HEADER_HEIGHT + r * CELL_HEIGHT
+            canvas.create_rectangle(0, y, HEADER_WIDTH, y + CELL_HEIGHT, fill='#f0f0f0', outline='#999999')
+            canvas.create_text(HEADER_WIDTH // 2, y + CELL_HEIGHT // 2, text=str(self.users[i])[:14])
+
+            # Valores de similitud (la fila se materializa una sola vez)
+            values = self.row(i)
+            for c, j in enumerate(cols):
+                x = HEADER_WIDTH + c * CELL_WIDTH
+                similarity = float(values[j])
+                canvas.create_rectangle(x, y, x + CELL_WIDTH, y + CELL_HEIGHT,
+                                        fill=similarity_color(similarity), outline='#999999')
+                canvas.create_text(x + CELL_WIDTH // 2, y + CELL_HEIGHT // 2, text=f"{similarity:.3f}",
+                                   fill='white' if similarity > 0.6 else 'black')
+        canvas.create_rectangle(0, 0, HEADER_WIDTH, HEADER_HEIGHT, fill='#e0e0e0', outline='#999999')
+
+        # Las barras reflejan la fracción visible de la matriz completa
+        self.v_scrollbar.set(self.top_row / self.n_users,
+                             min(1.0, (self.top_row + self.visible_rows()) / self.n_users))
+        self.h_scrollbar.set(self.left_col / self.n_users,
+                             min(1.0, (self.left_col + self.visible_cols()) / self.n_users))
@@ -0,0 +1,247 @@
+import heapq
+
+import numpy as np
+
+from similarity import SimilarityEngine, BASIC_WEIGHT, SEMANTIC_WEIGHT
+from store import PreferenceStore
+
+# Las similitudes se comparan redondeadas para que el desempate por índice no
+# dependa del orden de las sumas en coma flotante de cada backend
+RANK_DECIMALS = 12
+
+
+class TopKIndex:
+    """Consultas exactas de los k usuarios más similares sin materializar la matriz n x n"""
+
+    def __init__(self, user_preferences, ontology_index, chunk_size=4096, block_size=1024, backend='auto'):
+        self.store = PreferenceStore.from_preferences(user_preferences)
+        self.ontology_index = ontology_index
+        self.backend = backend
+        self.chunk_size = chunk_size
+        self.block_size = block_size
+
+        self.weights = ontology_index.weight_matrix(self.store.genres)
+        self.matrix = self.store.to_csr()
+        self.sizes = self.store.sizes().astype(np.float64)
+        # Índice invertido género -> usuarios (columnas de la matriz en formato CSC)
+        postings = self.matrix.tocsc()
+        self.postings_indptr = postings.indptr
+        self.postings_indices = postings.indices
+        # Géneros relacionados por la ontología (incluido el propio género)
+        self.related = [np.flatnonzero(row > 0) for row in self.weights]
+        self.related_counts = np.array([len(related) for related in self.related], dtype=np.float64)
+
+    def _postings(self, genre_ids):
+        """Usuarios que tienen alguno de los géneros indicados"""
+        lists = [self.postings_indices[self.postings_indptr[g]:self.postings_indptr[g + 1]] for g in genre_ids]
+        return np.unique(np.concatenate(lists)) if lists else np.empty(0, dtype=np.int32)
+
+    def score(self, i, candidates):
+        """Similitud mejorada exacta del usuario i contra un conjunto de candidatos"""
+        genres = self.store.row(i)
+        block = self.matrix[candidates]
+        indicator = np.zeros(len(self.store.genres))
+        indicator[genres] = 1.0
+
+        intersection = block @ indicator
+        union = self.sizes[i] + self.sizes[candidates] - intersection
+        basic = intersection / np.maximum(union, 1)
+
+        semantic_score = block @ self.weights[:, genres].sum(axis=1)
+        semantic = semantic_score / np.maximum(self.sizes[i] * self.sizes[candidates], 1)
+        return BASIC_WEIGHT * basic + SEMANTIC_WEIGHT * semantic
+
+    def _upper_bounds(self, i, candidates):
+        """Cota superior de la similitud a partir de los tamaños de los conjuntos"""
+        size_i = self.sizes[i]
+        sizes = self.sizes[candidates]
+        basic = np.minimum(size_i, sizes) / np.maximum(np.maximum(size_i, sizes), 1)
+        # Cada género de i aporta como mucho min(|B|, nº de géneros relacionados con él)
+        related = self.related_counts[self.store.row(i)]
+        semantic = np.minimum(sizes[:, None], related[None, :]).sum(axis=1) / np.maximum(size_i * sizes, 1)
+        return BASIC_WEIGHT * basic + SEMANTIC_WEIGHT * np.minimum(semantic, 1.0)
+
+    def _top_k_row(self, i, k):
+        """Índices y similitudes de los k vecinos del usuario en la fila i"""
+        n_users = len(self.store)
+        k = min(k, n_users - 1)
+        if k <= 0:
+            return [], []
+
+        # Solo puntúan los usuarios con algún género igual o relacionado
+        genres = self.store.row(i)
+        related = np.unique(np.concatenate([self.related[g] for g in genres])) if len(genres) else []
+        candidates = self._postings(related)
+        candidates = candidates[candidates != i]
+
+        # Recorrer por cota descendente y parar cuando la cota no supera al k-ésimo
+        bounds = self._upper_bounds(i, candidates)
+        order = np.argsort(-bounds, kind='stable')
+        heap = []
+        for start in range(0, len(order), self.chunk_size):
+            chunk = order[start:start + self.chunk_size]
+            if len(heap) == k and round(bounds[chunk[0]], RANK_DECIMALS) < heap[0][0]:
+                break
+            scores = self.score(i, candidates[chunk])
+            ranked = np.round(scores, RANK_DECIMALS)
+            # Solo pasan por el heap los que pueden desplazar al k-ésimo actual
+            keep = np.flatnonzero(ranked >= heap[0][0]) if len(heap) == k else np.arange(len(chunk))
+            for j, rank, score in zip(candidates[chunk][keep].tolist(), ranked[keep].tolist(), scores[keep].tolist()):
+                # Los empates se resuelven por índice de usuario (como el ordenamiento estable)
+                item = (rank, -j, score)
+                if len(heap) < k:
+                    heapq.heappush(heap, item)
+                elif item > heap[0]:
+                    heapq.heapreplace(heap, item)
+
+        best = sorted(heap, reverse=True)
+        indices = [-j for _, j, _ in best]
+        scores = [score for _, _, score in best]
+
+        # Completar con usuarios sin relación (similitud 0) en orden de índice
+        if len(indices) < k:
+            taken = set(indices) | {i}
+            for j in range(n_users):
+                if len(indices) == k:
+                    break
+                if j not in taken:
+                    indices.append(j)
+                    scores.append(0.0)
+        return indices, scores
+
+    def top_k_similar(self, user, k=5):
+        """Los k usuarios más similares a user como lista de (usuario, similitud)"""
+        indices, scores = self._top_k_row(self.store.index_of(user), k)
+        return [(self.store.users[j], score) for j, score in zip(indices, scores)]
+
+    def top_k_all(self, k=5, progress=None, dtype=np.float32):
+        """Top-k para todos los usuarios con memoria proporcional a n·k
+
+        Devuelve dos arrays n x k: índices de los vecinos (int32) y sus
+        similitudes (dtype), ordenados por similitud descendente y, en caso
+        de empate, por índice de usuario.
+        """
+        n_users = len(self.store)
+        k = max(0, min(k, n_users - 1))
+        neighbors = np.zeros((n_users, k), dtype=np.int32)
+        similarities = np.zeros((n_users, k), dtype=dtype)
+        if k == 0:
+            return neighbors, similarities
+
+        engine = SimilarityEngine(self.ontology_index, block_size=self.block_size, backend=self.backend)
+        _, backend, sizes = engine._prepare(self.store)
+        for start in range(0, n_users, self.block_size):
+            stop = min(start + self.block_size, n_users)
+            scores = np.round(engine._score_block(backend, sizes, start, stop), RANK_DECIMALS)
+            rows = np.arange(stop - start)
+            scores[rows, rows + start] = -np.inf
+
+            neighbors[start:stop], similarities[start:stop] = _select_top_k(scores, k)
+            if progress is not None:
+                progress(stop, n_users)
+        return neighbors, similarities
+
+
+def _select_top_k(scores, k):
+    """Seleccionar los k mayores de cada fila desempatando por columna"""
+    kth = -np.partition(-scores, k - 1, axis=1)[:, k - 1]
+    rows, cols = np.nonzero(scores >= kth[:, None])
+    values = scores[rows, cols]
+    order = np.lexsort((cols, -values, rows))
+    rows, cols, values = rows[order], cols[order], values[order]
+
+    # Posición de cada elemento dentro de su fila para quedarse con los k primeros
+    starts = np.searchsorted(rows, np.arange(len(scores)))
+    rank = np.arange(len(rows)) - starts[rows]
+    keep = rank < k
+    return cols[keep].reshape(-1, k), values[keep].reshape(-1, k)
+
+
+class IncrementalNeighbors:
+    """Listas de k vecinos de todos los usuarios actualizadas usuario a usuario
+
+    Al insertar, modificar o borrar un usuario solo se puntúa su fila y se
+    recalculan las listas que lo contenían; el resto solo compara la nueva
+    similitud con su k-ésimo vecino. El resultado coincide con top_k_all.
+    """
+
+    def __init__(self, user_preferences, ontology_index, k=5, backend='auto', progress=None):
+        self.ontology_index = ontology_index
+        self.k = k
+        self.backend = backend
+        self._rebuild(PreferenceStore.from_preferences(user_preferences), progress)
+
+    def _rebuild(self, store, progress=None):
+        self.store = store
+        # Similitudes redondeadas en float64 para desempatar igual que top_k_all
+        self.neighbors, self.scores = TopKIndex(store, self.ontology_index, backend=self.backend).top_k_all(
+            self.k, progress=progress, dtype=np.float64)
+
+    @property
+    def similarities(self):
+        return self.scores.astype(np.float32)
+
+    def _ranked_row(self, engine, backend, sizes, i):
+        """Similitudes redondeadas de la fila i con la diagonal excluida"""
+        scores = np.round(engine._score_block(backend, sizes, i, i + 1)[0], RANK_DECIMALS)
+        scores[i] = -np.inf
+        return scores
+
+    def _refresh_rows(self, rows, i, scores, engine, backend, sizes):
+        """Recalcular las listas afectadas y meter a i en las que supera al k-ésimo"""
+        self.neighbors[i], self.scores[i] = _select_top_k(scores[None, :], self.scores.shape[1])
+        for v in rows:
+            self.neighbors[v], self.scores[v] = _select_top_k(self._ranked_row(engine, backend, sizes, v)[None, :],
+                                                              self.scores.shape[1])
+
+        # Resto de usuarios: i entra si supera al k-ésimo (los empates por índice)
+        kth_scores = self.scores[:, -1]
+        beats = (scores > kth_scores) | ((scores == kth_scores) & (i < self.neighbors[:, -1]))
+        beats[rows] = False
+        beats[i] = False
+        beaten = np.flatnonzero(beats)
+        if len(beaten):
+            candidates = np.concatenate([self.neighbors[beaten], np.full((len(beaten), 1), i)], axis=1)
+            candidate_scores = np.concatenate([self.scores[beaten], scores[beaten, None]], axis=1)
+            order = np.lexsort((candidates, -candidate_scores))[:, :-1]
+            self.neighbors[beaten] = np.take_along_axis(candidates, order, axis=1)
+            self.scores[beaten] = np.take_along_axis(candidate_scores, order, axis=1)
+
+    def update(self, store, i):
+        """Aplicar la inserción (fila nueva al final) o la modificación del usuario de la fila i"""
+        if len(store) - 1 < self.k or len(store) < 3:
+            # Con tan pocos usuarios las listas cambian de anchura: reconstruir
+            self._rebuild(store)
+            return
+        self.store = store
+        if i == len(self.neighbors):
+            self.neighbors = np.vstack([self.neighbors, np.zeros((1, self.neighbors.shape[1]), dtype=np.int32)])
+            self.scores = np.vstack([self.scores, np.full((1, self.scores.shape[1]), -np.inf)])
+
+        engine = SimilarityEngine(self.ontology_index, backend=self.backend)
+        _, backend, sizes = engine._prepare(store)
+        scores = self._ranked_row(engine, backend, sizes, i)
+        # Las listas que ya contenían a i pueden cambiar por completo
+        affected = np.flatnonzero((self.neighbors == i).any(axis=1))
+        self._refresh_rows(affected[affected != i], i, scores, engine, backend, sizes)
+
+    def remove(self, store, i):
+        """Aplicar el borrado del usuario que ocupaba la fila i"""
+        if len(store) - 1 < self.k or len(store) < 3:
+            self._rebuild(store)
+            return
+        self.store = store
+        affected = np.flatnonzero((self.neighbors == i).any(axis=1))
+        keep = np.arange(len(self.neighbors)) != i
+        self.neighbors = self.neighbors[keep]
+        self.scores = self.scores[keep]
+        # Las filas posteriores a i bajan una posición
+        self.neighbors[self.neighbors > i] -= 1
+        affected = affected[affected != i]
+        affected[affected > i] -= 1
+
+        engine = SimilarityEngine(self.ontology_index, backend=self.backend)
+        _, backend, sizes = engine._prepare(store)
+        for v in affected:
+            self.neighbors[v], self.scores[v] = _select_top_k(self._ranked_row(engine, backend, sizes, v)[None, :],
+                                                              self.scores.shape[1])
@@ -0,0 +1,216 @@
+import hashlib
+import json
+import re
+from unidecode import unidecode
+
+import instrumentation
+
+# Cambiar al modificar preprocess_text, _normalize_genre o is_stop_word: invalida las instantáneas
+NORMALIZATION_VERSION = 1
+
+# nltk y spacy tardan más de un segundo en importarse: se cargan en el primer
+# uso para que los procesos de corta duración arranquen rápido
+
+
+def load_stop_words(language='spanish'):
+    """Stop words de NLTK comprobando el recurso en disco, sin descargas por red"""
+    import nltk
+    try:
+        nltk.data.find('corpora/stopwords')
+    except LookupError:
+        print("Stop words de NLTK no instaladas (python -m nltk.downloader stopwords), usando lista vacía")
+        return set()
+    from nltk.corpus import stopwords
+    return set(stopwords.words(language))
+
+class NLPProcessor:
+    """Procesador de lenguaje natural para español"""
+    
+    def __init__(self, cache_size=65536):
+        from nltk.stem import SnowballStemmer
+        
+        self.stop_words = load_stop_words('spanish')
+        self.stemmer = SnowballStemmer('spanish')
+        
+        # El modelo de spaCy solo lo usa lemmatize y se carga en su primera llamada
+        self._nlp = None
+        self._spacy_loaded = False
+        
+        # Diccionario de sinónimos y parónimos
+        self.synonyms = self._load_synonyms()
+        self.paronyms = self._load_paronyms()
+        
+        # Compilar los diccionarios en búsquedas inversas y memorizar por celda
+        self._compile_lookups()
+        self.cache_size = cache_size
+        self._reset_cache()
+
+    def _reset_cache(self):
+        # Diccionario simple (no lru_cache sobre el método) para que el procesador se pueda serializar
+        self._cache = {}
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def __getstate__(self):
+        """Estado para pickle sin la caché de celdas ni el modelo de spaCy"""
+        state = self.__dict__.copy()
+        state.update(_cache={}, cache_hits=0, cache_misses=0, _nlp=None, _spacy_loaded=False)
+        return state
+    
+    def _load_synonyms(self):
+        """Cargar diccionario de sinónimos"""
+        synonyms = {
+            'ciencia_ficcion': ['scifi', 'ciencia ficcion', 'ficcion_cientifica'],
+            'terror': ['miedo', 'horror', 'suspenso'],
+            'comedia': ['risa', 'humor', 'divertido'],
+            'drama': ['serio', 'emocional', 'intenso'],
+            'accion': ['aventura', 'emocion', 'movimiento'],
+            'romance': ['amor', 'pasion', 'sentimental'],
+            'fantasia': ['magia', 'imaginacion', 'sobrenatural'],
+            'documental': ['realidad', 'informacion', 'educativo'],
+            'animacion': ['dibujos', 'cartoon', 'animado'],
+            'thriller': ['suspense', 'tension', 'emocionante'],
+            'musical': ['musica', 'cantos', 'baile'],
+            'aventura': ['exploracion', 'viaje', 'descubrimiento'],
+            'biografia': ['vida', 'historia_personal', 'real'],
+            'historia': ['historico', 'epoca', 'pasado'],
+            'crimen': ['delito', 'policial', 'investigacion'],
+            'western': ['vaquero', 'frontera', 'oeste']
+        }
+        return synonyms
+    
+    def _load_paronyms(self):
+        """Cargar diccionario de parónimos"""
+        paronyms = {
+            'accion': ['acion', 'accion', 'axion'],
+            'comedia': ['comedia', 'comedia', 'komedia'],
+            'drama': ['drama', 'drama', 'dramma'],
+            'terror': ['terror', 'teror', 'terror'],
+            'romance': ['romance', 'romanse', 'romance'],
+            'fantasia': ['fantasia', 'fantasía', 'fantasia'],
+            'ciencia_ficcion': ['ciencia_ficcion', 'ciencia ficcion', 'sci-fi'],
+            'documental': ['documental', 'documental', 'documental'],
+            'animacion': ['animacion', 'animación', 'animation'],
+            'thriller': ['thriller', 'triller', 'suspenso'],
+            'aventura': ['aventura', 'aventura', 'adventura'],
+            'biografia': ['biografia', 'biografía', 'biography'],
+            'historia': ['historia', 'história', 'history'],
+            'musical': ['musical', 'musical', 'music'],
+            'crimen': ['crimen', 'crimen', 'crime'],
+            'western': ['western', 'western', 'wester']
+        }
+        return paronyms
+    
+    def preprocess_text(self, text):
+        """Preprocesar texto: normalizar, eliminar stop words, etc."""
+        if not isinstance(text, str):
+            return text
+            
+        # Convertir a minúsculas y normalizar
+        text = text.lower().strip()
+        text = unidecode(text)  # Eliminar acentos
+        text = re.sub(r'[^a-z0-9_\s]', '', text)  # Eliminar caracteres especiales
+        text = re.sub(r'\s+', ' ', text)  # Eliminar espacios múltiples
+        
+        return text
+    
+    def _compile_lookups(self):
+        """Precalcular las búsquedas variante -> género canónico y raíz -> género canónico"""
+        # Los sinónimos tienen prioridad sobre los parónimos y, dentro de cada
+        # diccionario, gana el primer género principal (como en el recorrido lineal)
+        self.variant_lookup = {}
+        for main_genre, synonyms in self.synonyms.items():
+            for variant in synonyms + [main_genre]:
+                self.variant_lookup.setdefault(variant, main_genre)
+        for main_genre, variations in self.paronyms.items():
+            for variant in variations:
+                self.variant_lookup.setdefault(variant, main_genre)
+        
+        self.stem_lookup = {}
+        for main_genre, synonyms in self.synonyms.items():
+            for variant in [main_genre] + synonyms:
+                self.stem_lookup.setdefault(self.stemmer.stem(variant), main_genre)
+    
+    def _normalize_genre(self, genre):
+        """Normalizar género cinematográfico"""
+        genre = self.preprocess_text(genre)
+        instrumentation.count('nlp.normalized')
+        
+        # Reemplazar sinónimos y corregir parónimos
+        main_genre = self.variant_lookup.get(genre)
+        if main_genre is not None:
+            return main_genre
+        
+        # Stemming
+        instrumentation.count('nlp.stems')
+        return self.stem_lookup.get(self.stemmer.stem(genre), genre)
+    
+    def normalize_genre(self, genre):
+        """Normalizar un género memorizando el resultado por celda"""
+        try:
+            # Reinsertar la celda la marca como la usada más recientemente (LRU)
+            result = self._cache[genre] = self._cache.pop(genre)
+        except KeyError:
+            self.cache_misses += 1
+            instrumentation.count('nlp.cache_misses')
+            result = self._normalize_genre(genre)
+            if len(self._cache) >= self.cache_size:
+                # Se descarta la celda usada hace más tiempo
+                del self._cache[next(iter(self._cache))]
+            self._cache[genre] = result
+            return result
+        self.cache_hits += 1
+        instrumentation.count('nlp.cache_hits')
+        return result
+
+    def clear_cache(self):
+        """Vaciar la caché de normalización y sus contadores"""
+        self._reset_cache()
+
+    def cache_stats(self):
+        """Estadísticas de la caché de normalización"""
+        total = self.cache_hits + self.cache_misses
+        return {
+            'hits': self.cache_hits,
+            'misses': self.cache_misses,
+            'size': len(self._cache),
+            'max_size': self.cache_size,
+            'hit_rate': self.cache_hits / total if total else 0.0,
+        }
+    
+    def rules_fingerprint(self):
+        """Huella SHA-256 de las reglas de normalización: sinónimos, parónimos y stop words"""
+        rules = {
+            'version': NORMALIZATION_VERSION,
+            'synonyms': self.synonyms,
+            'paronyms': self.paronyms,
+            'stop_words': sorted(self.stop_words),
+        }
+        return hashlib.sha256(json.dumps(rules, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+    
+    def is_stop_word(self, word):
+        """Verificar si una palabra es stop word"""
+        return word in self.stop_words or len(word) < 3
+    
+    @property
+    def nlp(self):
+        """Modelo de spaCy para español (None si no está disponible)"""
+        if not self._spacy_loaded:
+            self._spacy_loaded = True
+            try:
+                import spacy
+                self._nlp = spacy.load("es_core_news_sm")
+            except Exception:
+                print("spaCy español no disponible, usando procesamiento básico")
+        return self._nlp
+    
+    @property
+    def spacy_available(self):
+        return self.nlp is not None
+    
+    def lemmatize(self, text):
+        """Lematizar texto usando spaCy si está disponible"""
+        if self.spacy_available:
+            doc = self.nlp(text)
+            return ' '.join([token.lemma_ for token in doc])
+        return text
@@ -0,0 +1,141 @@
+import hashlib
+import json
+
+import numpy as np
+
+import instrumentation
+
+# Pesos de las relaciones semánticas entre géneros
+EXACT_WEIGHT = 1.0
+DIRECT_WEIGHT = 0.8
+SIBLING_WEIGHT = 0.6
+STEM_WEIGHT = 0.4
+
+RELATION_WEIGHTS = (('exact', EXACT_WEIGHT), ('direct', DIRECT_WEIGHT), ('sibling', SIBLING_WEIGHT),
+                    ('stem', STEM_WEIGHT), ('none', 0.0))
+
+
+def ontology_hash(genre_ontology):
+    """Huella SHA-256 de una ontología, independiente del orden de padres e hijos"""
+    canonical = {parent: sorted(children) for parent, children in sorted(genre_ontology.items())}
+    return hashlib.sha256(json.dumps(canonical, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+class OntologyIndex:
+    """Índice precompilado de relaciones de la ontología para consultas en tiempo constante
+
+    La tabla densa de pesos solo cubre los géneros internados (vocabulario de
+    los usuarios y géneros consultados); las relaciones se leen de la
+    ontología compilada, así que una ontología de miles de nodos no la agranda.
+    """
+
+    def __init__(self, genre_ontology, stem, extra_genres=()):
+        from ontology_compiler import compile_ontology
+
+        self.genre_ontology = genre_ontology
+        self.compiled = compile_ontology(genre_ontology)
+        self.stem = stem
+
+        # Géneros internados como enteros, con su nodo en la ontología compilada (-1 si no está)
+        self.genres = []
+        self.genre_ids = {}
+        self.nodes = []
+        self.stem_ids = []
+        self._stem_codes = {}
+        self._node_genres = np.full(len(self.compiled.genres), -1, dtype=np.int64)
+        self.weights = np.zeros((0, 0))
+
+        self.lookups = 0
+        self.hits = 0
+        self.add_genres(extra_genres)
+
+    def _intern(self, genre):
+        """Asignar un identificador entero a un género nuevo"""
+        genre_id = self.genre_ids.get(genre)
+        if genre_id is None:
+            genre_id = len(self.genres)
+            self.genre_ids[genre] = genre_id
+            self.genres.append(genre)
+            node = self.compiled.genre_ids.get(genre, -1)
+            self.nodes.append(node)
+            if node >= 0:
+                self._node_genres[node] = genre_id
+            self.stem_ids.append(self._stem_codes.setdefault(self.stem(genre), len(self._stem_codes)))
+        return genre_id
+
+    def _extend_weights(self, n_old):
+        """Añadir a la tabla de pesos las filas y columnas de los géneros internados desde n_old
+
+        Cada fila se rellena de menor a mayor prioridad (0.4 / 0.6 / 0.8 / 1.0)
+        para que cada par conserve el peso de la primera relación que
+        encontraría el cálculo por pares.
+        """
+        n_genres = len(self.genres)
+        weights = np.zeros((n_genres, n_genres))
+        weights[:n_old, :n_old] = self.weights
+        stem_ids = np.array(self.stem_ids)
+        instrumentation.count('ontology.stems', n_genres - n_old)
+        for i in range(n_old, n_genres):
+            row = weights[i]
+            row[stem_ids == stem_ids[i]] = STEM_WEIGHT
+            node = self.nodes[i]
+            if node >= 0:
+                # Relaciones indirectas (mismo padre) y directas padre-hijo
+                siblings = self._node_genres[self.compiled.sibling_ids(node)]
+                row[siblings[siblings >= 0]] = SIBLING_WEIGHT
+                related = self._node_genres[self.compiled.related_ids(node)]
+                row[related[related >= 0]] = DIRECT_WEIGHT
+            row[i] = EXACT_WEIGHT
+        # Todas las relaciones son simétricas
+        weights[:n_old, n_old:] = weights[n_old:, :n_old].T
+        return weights
+
+    def add_genres(self, genres):
+        """Internar géneros nuevos y ampliar la tabla de pesos si hace falta"""
+        n_genres = len(self.genres)
+        for genre in genres:
+            self._intern(genre)
+        if len(self.genres) != n_genres:
+            self.weights = self._extend_weights(n_genres)
+
+    def ids(self, genres):
+        """Identificadores de una colección de géneros (interna los desconocidos)"""
+        missing = [genre for genre in genres if genre not in self.genre_ids]
+        if missing:
+            self.add_genres(missing)
+        return [self.genre_ids[genre] for genre in genres]
+
+    def weight(self, genre1, genre2):
+        """Peso semántico de un par de géneros"""
+        return self.pair_weights([genre1], [genre2]).item()
+
+    def pair_weights(self, genres1, genres2):
+        """Submatriz de pesos entre dos colecciones de géneros"""
+        n_genres = len(self.genres)
+        ids1 = self.ids(genres1)
+        ids2 = self.ids(genres2)
+
+        n_pairs = len(ids1) * len(ids2)
+        self.lookups += n_pairs
+        if len(self.genres) == n_genres:
+            self.hits += n_pairs
+        weights = self.weights[np.ix_(ids1, ids2)]
+        if instrumentation.is_enabled():
+            for relation, weight in RELATION_WEIGHTS:
+                instrumentation.count(f'ontology.lookups.{relation}', int(np.count_nonzero(weights == weight)))
+        return weights
+
+    def weight_matrix(self, genres):
+        """Matriz de pesos género x género para un vocabulario dado"""
+        ids = self.ids(genres)
+        return self.weights[np.ix_(ids, ids)]
+
+    def stats(self):
+        """Estadísticas de consultas al índice"""
+        return {
+            'genres': len(self.genres),
+            'ontology_genres': len(self.compiled.genres),
+            'lookups': self.lookups,
+            'hits': self.hits,
+            'hit_rate': self.hits / self.lookups if self.lookups else 0.0,
+        }
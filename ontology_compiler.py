@@ -0,0 +1,279 @@
+import hashlib
+import json
+import os
+from collections.abc import Mapping
+
+import numpy as np
+
+import instrumentation
+from snapshot import write_arrays, read_header, map_arrays, names_blob, decode_names
+
+# Cambiar al modificar la disposición del fichero o la forma de compilar
+COMPILED_VERSION = 1
+COMPILED_MAGIC = b'JACONTO\0'
+
+
+def _csr(rows, cols, n_rows):
+    """Listas de adyacencia CSR (indptr, índices ordenados) a partir de pares (fila, columna)"""
+    order = np.lexsort((cols, rows))
+    indptr = np.zeros(n_rows + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=n_rows), out=indptr[1:])
+    return indptr, np.ascontiguousarray(cols[order], dtype=np.int32)
+
+
+def parse_ontology(data):
+    """Géneros internados y aristas (padre, hijo) de una ontología JSON de cualquier profundidad
+
+    Admite el formato plano {padre: [hijos]}, diccionarios anidados
+    {padre: {hijo: {nieto: ...}}}, listas que mezclan nombres y subárboles y
+    nodos {"name": ..., "children": [...]}. Un género puede colgar de varios
+    padres. El recorrido es iterativo para no depender del límite de recursión.
+    """
+    if not isinstance(data, (dict, list)):
+        raise ValueError("La ontología debe ser un objeto o una lista JSON")
+    genres = []
+    genre_ids = {}
+    edges = []
+
+    def intern(name):
+        if not isinstance(name, str) or not name.strip():
+            raise ValueError(f"Nombre de género no válido en la ontología: {name!r}")
+        genre_id = genre_ids.get(name)
+        if genre_id is None:
+            genre_id = genre_ids[name] = len(genres)
+            genres.append(name)
+        return genre_id
+
+    # Cada entrada de la pila es (padre o None en la raíz, valor con sus hijos)
+    stack = [(None, data)]
+    while stack:
+        parent, value = stack.pop()
+        if value is None:
+            continue
+        if isinstance(value, dict) and isinstance(value.get('name'), str):
+            value = [value]
+        if isinstance(value, dict):
+            items = list(value.items())
+        elif isinstance(value, (list, tuple, set, frozenset)):
+            items = []
+            for item in value:
+                if isinstance(item, dict) and isinstance(item.get('name'), str):
+                    items.append((item['name'], item.get('children')))
+                elif isinstance(item, dict):
+                    items.extend(item.items())
+                else:
+                    items.append((item, None))
+        else:
+            items = [(value, None)]
+        pushed = []
+        for name, children in items:
+            child = intern(name)
+            if parent is not None:
+                edges.append((parent, child))
+            pushed.append((child, children))
+        # Al revés para recorrer los géneros en el orden del documento
+        stack.extend(reversed(pushed))
+    return genres, edges
+
+
+class CompiledOntology(Mapping):
+    """Ontología compilada: géneros internados, adyacencia CSR y cierre transitivo de ancestros
+
+    Se comporta como el diccionario plano {padre: hijos directos}, así que
+    puede sustituir a la ontología en el resto del motor.
+    """
+
+    def __init__(self, genres, children_indptr, children, parents_indptr, parents,
+                 ancestors_indptr, ancestors, depth):
+        self.genres = genres
+        self.genre_ids = {genre: i for i, genre in enumerate(genres)}
+        self.children_indptr = children_indptr
+        self.children = children
+        self.parents_indptr = parents_indptr
+        self.parents = parents
+        self.ancestors_indptr = ancestors_indptr
+        self.ancestors = ancestors
+        self.depth = depth
+        # Fichero mapeado del que se leyó (None si se compiló en memoria)
+        self.path = None
+        self._mapping = None
+
+    @classmethod
+    def from_edges(cls, genres, edges):
+        """Compilar a partir de géneros internados y aristas (padre, hijo); los ciclos lanzan ValueError"""
+        n_genres = len(genres)
+        edges = np.unique(np.asarray(edges, dtype=np.int64).reshape(-1, 2), axis=0)
+        children_indptr, children = _csr(edges[:, 0], edges[:, 1], n_genres)
+        parents_indptr, parents = _csr(edges[:, 1], edges[:, 0], n_genres)
+
+        # Orden topológico (Kahn): cada género aparece después de todos sus padres
+        children_lists = [children[children_indptr[i]:children_indptr[i + 1]].tolist() for i in range(n_genres)]
+        parent_lists = [parents[parents_indptr[i]:parents_indptr[i + 1]].tolist() for i in range(n_genres)]
+        pending = [len(node_parents) for node_parents in parent_lists]
+        order = [i for i in range(n_genres) if not pending[i]]
+        for node in order:
+            for child in children_lists[node]:
+                pending[child] -= 1
+                if not pending[child]:
+                    order.append(child)
+        if len(order) < n_genres:
+            cycle = sorted(genres[i] for i in range(n_genres) if pending[i])
+            raise ValueError(f"La ontología tiene ciclos entre: {', '.join(cycle[:10])}")
+
+        # Ancestros de cada género y profundidad (camino más largo desde una raíz)
+        ancestor_sets = [None] * n_genres
+        depth = np.zeros(n_genres, dtype=np.int32)
+        for node in order:
+            found = set(parent_lists[node])
+            for parent in parent_lists[node]:
+                found |= ancestor_sets[parent]
+                depth[node] = max(depth[node], depth[parent] + 1)
+            ancestor_sets[node] = found
+        ancestors_indptr = np.zeros(n_genres + 1, dtype=np.int64)
+        np.cumsum([len(found) for found in ancestor_sets], out=ancestors_indptr[1:])
+        ancestors = np.fromiter((a for found in ancestor_sets for a in sorted(found)), dtype=np.int32,
+                                count=int(ancestors_indptr[-1]))
+        return cls(genres, children_indptr, children, parents_indptr, parents, ancestors_indptr, ancestors, depth)
+
+    # Vista de diccionario plano {padre: hijos directos}
+    def _flat(self):
+        if self._mapping is None:
+            self._mapping = {
+                self.genres[i]: frozenset(self.genres[j] for j in self.child_ids(i))
+                for i in np.flatnonzero(np.diff(self.children_indptr)).tolist()
+            }
+        return self._mapping
+
+    def __getitem__(self, genre):
+        return self._flat()[genre]
+
+    def __iter__(self):
+        return iter(self._flat())
+
+    def __len__(self):
+        return len(self._flat())
+
+    def child_ids(self, node):
+        return self.children[self.children_indptr[node]:self.children_indptr[node + 1]]
+
+    def parent_ids(self, node):
+        return self.parents[self.parents_indptr[node]:self.parents_indptr[node + 1]]
+
+    def ancestor_ids(self, node):
+        return self.ancestors[self.ancestors_indptr[node]:self.ancestors_indptr[node + 1]]
+
+    def sibling_ids(self, node):
+        """Géneros que comparten algún padre directo con node (incluido node)"""
+        parent_ids = self.parent_ids(node)
+        if not len(parent_ids):
+            return parent_ids
+        return np.concatenate([self.child_ids(parent) for parent in parent_ids])
+
+    def related_ids(self, node):
+        """Padres e hijos directos de node"""
+        return np.concatenate((self.parent_ids(node), self.child_ids(node)))
+
+    def ancestors_of(self, genre):
+        """Todos los ancestros de un género (conjunto vacío si no está en la ontología)"""
+        node = self.genre_ids.get(genre)
+        return set() if node is None else {self.genres[i] for i in self.ancestor_ids(node)}
+
+    def is_ancestor(self, ancestor, genre):
+        """Si ancestor está por encima de genre en algún camino de la jerarquía"""
+        node, ancestor_id = self.genre_ids.get(genre), self.genre_ids.get(ancestor)
+        if node is None or ancestor_id is None:
+            return False
+        row = self.ancestor_ids(node)
+        position = np.searchsorted(row, ancestor_id)
+        return bool(position < len(row) and row[position] == ancestor_id)
+
+    def with_ancestors(self, genres):
+        """Conjunto de géneros ampliado con todos sus ancestros"""
+        expanded = set(genres)
+        for genre in genres:
+            node = self.genre_ids.get(genre)
+            if node is not None:
+                expanded.update(self.genres[i] for i in self.ancestor_ids(node))
+        return expanded
+
+    def stats(self):
+        """Tamaño de la ontología compilada"""
+        return {
+            'genres': len(self.genres),
+            'edges': len(self.children),
+            'roots': int(np.count_nonzero(np.diff(self.parents_indptr) == 0)),
+            'max_depth': int(self.depth.max()) if len(self.depth) else 0,
+            'ancestor_pairs': len(self.ancestors),
+        }
+
+
+def compile_ontology(genre_ontology):
+    """Compilar una ontología ya leída (JSON o diccionario {padre: hijos}); si ya está compilada se devuelve tal cual"""
+    if isinstance(genre_ontology, CompiledOntology):
+        return genre_ontology
+    with instrumentation.timer('ontology.compile'):
+        genres, edges = parse_ontology(genre_ontology)
+        return CompiledOntology.from_edges(genres, edges)
+
+
+def save_compiled_ontology(path, ontology, source_hash):
+    """Guardar una ontología compilada en un fichero binario mapeable"""
+    arrays = {
+        'genres': names_blob(ontology.genres, 'géneros'),
+        'children_indptr': ontology.children_indptr,
+        'children': ontology.children,
+        'parents_indptr': ontology.parents_indptr,
+        'parents': ontology.parents,
+        'ancestors_indptr': ontology.ancestors_indptr,
+        'ancestors': ontology.ancestors,
+        'depth': ontology.depth,
+    }
+    header = {'version': COMPILED_VERSION, 'n_genres': len(ontology.genres), 'source_sha256': source_hash}
+    write_arrays(path, COMPILED_MAGIC, COMPILED_VERSION, header, arrays)
+
+
+def read_compiled_ontology(path, source_hash=None, verify=True):
+    """Abrir una ontología compilada; con source_hash se comprueba que viene del mismo JSON"""
+    header, data_start = read_header(path, COMPILED_MAGIC, COMPILED_VERSION, "ontología compilada")
+    if source_hash is not None and header['source_sha256'] != source_hash:
+        raise ValueError("La ontología compilada corresponde a otro fichero JSON")
+    arrays = map_arrays(path, header, data_start, verify)
+    ontology = CompiledOntology(decode_names(arrays['genres'], header['n_genres']), arrays['children_indptr'],
+                                arrays['children'], arrays['parents_indptr'], arrays['parents'],
+                                arrays['ancestors_indptr'], arrays['ancestors'], arrays['depth'])
+    ontology.path = path
+    return ontology
+
+
+def compiled_path(cache_dir, source_hash):
+    return os.path.join(cache_dir, f"ontologia_{source_hash[:16]}.onto")
+
+
+def load_ontology(file_path, cache_dir=None):
+    """Cargar una ontología JSON compilada, reutilizando la forma binaria guardada en cache_dir
+
+    La clave es la suma SHA-256 del JSON, así que editar el fichero obliga a
+    recompilarlo. Sin cache_dir se compila siempre.
+    """
+    with open(file_path, 'rb') as f:
+        raw = f.read()
+    source_hash = hashlib.sha256(raw).hexdigest()
+    path = compiled_path(cache_dir, source_hash) if cache_dir else None
+    if path is not None and os.path.exists(path):
+        try:
+            with instrumentation.timer('ontology.load_compiled'):
+                ontology = read_compiled_ontology(path, source_hash)
+            # Marca de último uso para la expulsión LRU de la caché
+            os.utime(path)
+            return ontology
+        except Exception as e:
+            print(f"Ontología compilada descartada, se recompila: {e}")
+
+    ontology = compile_ontology(json.loads(raw.decode('utf-8-sig')))
+    if path is not None:
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            save_compiled_ontology(path, ontology, source_hash)
+        except Exception as e:
+            print(f"No se pudo guardar la ontología compilada: {e}")
+    return ontology
@@ -0,0 +1,141 @@
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from cache import fingerprint
+from similarity import SimilarityEngine, BASIC_WEIGHT, SEMANTIC_WEIGHT
+from store import PreferenceStore
+
+OUT_OF_CORE_DTYPES = ('float16', 'float32')
+
+# Cada cuántas teselas se vuelcan a disco la matriz y el registro de progreso
+FLUSH_EVERY = 64
+
+
+def _metadata_path(path):
+    return path + '.json'
+
+
+def _tiles_path(path):
+    return path + '.tiles.npy'
+
+
+def _read_metadata(path):
+    try:
+        with open(_metadata_path(path), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception:
+        return None
+
+
+def _write_metadata(path, metadata):
+    with open(_metadata_path(path), 'w', encoding='utf-8') as f:
+        json.dump(metadata, f)
+
+
+class MemmapSimilarity:
+    """Matriz de similitud n x n en un memmap de disco; las filas se leen bajo demanda"""
+
+    def __init__(self, path):
+        metadata = _read_metadata(path)
+        if metadata is None or not metadata.get('complete'):
+            raise ValueError(f"Matriz en disco incompleta o sin metadatos: {path}")
+        self.path = path
+        self.n_users = metadata['n_users']
+        self.shape = (self.n_users, self.n_users)
+        self.matrix = np.memmap(path, dtype=metadata['dtype'], mode='r', shape=self.shape)
+
+    def __len__(self):
+        return self.n_users
+
+    def __getitem__(self, i):
+        return self.row(i)
+
+    def row(self, i):
+        """Leer una fila del disco como float64"""
+        return np.asarray(self.matrix[i], dtype=np.float64)
+
+    def top_k(self, i, k):
+        """Índices y similitudes de los k vecinos de la fila i (empates por índice)"""
+        row = self.row(i)
+        row[i] = -np.inf
+        order = np.argsort(-row, kind='stable')[:min(k, self.n_users - 1)]
+        return order, row[order]
+
+
+def compute_memmap_similarity(user_preferences, ontology_index, path, dtype='float32', tile_size=2048,
+                              workers=None, backend='auto', progress=None):
+    """Calcular la matriz de similitud por teselas en un memmap, reanudable tras una interrupción
+
+    Solo se calculan las teselas del triángulo superior; cada una se escribe
+    también traspuesta. Un registro de teselas terminadas permite continuar
+    un cálculo interrumpido con las mismas entradas.
+    """
+    if dtype not in OUT_OF_CORE_DTYPES:
+        raise ValueError(f"Tipo de dato no soportado para la matriz en disco: {dtype}")
+    store = PreferenceStore.from_preferences(user_preferences)
+    n_users = len(store)
+    n_tiles = max(1, -(-n_users // tile_size))
+    metadata = {
+        'n_users': n_users,
+        'dtype': dtype,
+        'tile_size': tile_size,
+        'fingerprint': fingerprint(store, ontology_index.genre_ontology, (BASIC_WEIGHT, SEMANTIC_WEIGHT)),
+    }
+
+    previous = _read_metadata(path)
+    if previous is not None and previous.get('complete') and \
+            all(previous.get(key) == value for key, value in metadata.items()):
+        return MemmapSimilarity(path)
+
+    resume = (previous is not None and os.path.exists(path) and os.path.exists(_tiles_path(path))
+              and all(previous.get(key) == value for key, value in metadata.items()))
+    shape = (n_users, n_users)
+    if resume:
+        matrix = np.memmap(path, dtype=dtype, mode='r+', shape=shape)
+        done = np.load(_tiles_path(path), mmap_mode='r+')
+    else:
+        # El directorio puede haberse borrado al vaciar la caché
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        _write_metadata(path, dict(metadata, complete=False))
+        matrix = np.memmap(path, dtype=dtype, mode='w+', shape=shape)
+        done = np.lib.format.open_memmap(_tiles_path(path), mode='w+', dtype=np.uint8, shape=(n_tiles, n_tiles))
+
+    engine = SimilarityEngine(ontology_index, backend=backend)
+    _, scorer, sizes = engine._prepare(store)
+
+    def run_tile(tile):
+        row_tile, col_tile = tile
+        start, stop = row_tile * tile_size, min((row_tile + 1) * tile_size, n_users)
+        col_start, col_stop = col_tile * tile_size, min((col_tile + 1) * tile_size, n_users)
+        scores = engine._score_block(scorer, sizes, start, stop, col_start, col_stop)
+        if row_tile == col_tile:
+            np.fill_diagonal(scores, 1.0)
+        matrix[start:stop, col_start:col_stop] = scores
+        if row_tile != col_tile:
+            matrix[col_start:col_stop, start:stop] = scores.T
+        return tile
+
+    pending = [(i, j) for i in range(n_tiles) for j in range(i, n_tiles) if not done[i, j]]
+    # Los productos de matrices liberan el GIL, así que los hilos trabajan en paralelo
+    executor = ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 1)
+    try:
+        for count, (i, j) in enumerate(executor.map(run_tile, pending), 1):
+            done[i, j] = 1
+            if count % FLUSH_EVERY == 0:
+                matrix.flush()
+                done.flush()
+            if progress is not None:
+                progress(count, len(pending))
+    finally:
+        # Al abortar desde progress se descartan las teselas pendientes y se guarda lo hecho
+        executor.shutdown(cancel_futures=True)
+        matrix.flush()
+        done.flush()
+
+    del matrix, done
+    os.remove(_tiles_path(path))
+    _write_metadata(path, dict(metadata, complete=True))
+    return MemmapSimilarity(path)
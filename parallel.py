@@ -0,0 +1,133 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+import instrumentation
+from similarity import SimilarityEngine, BACKENDS, condensed_offset, count_relations
+from store import PreferenceStore
+
+# Por debajo de este número de usuarios arrancar procesos cuesta más de lo que ahorra
+PARALLEL_MIN_USERS = 2000
+
+# Estado de cada proceso trabajador: bloques compartidos, backend y vector de salida
+_worker = {}
+
+
+def _create(shape, dtype):
+    """Bloque de memoria compartida nuevo (lleno de ceros) visto como array"""
+    dtype = np.dtype(dtype)
+    block = shared_memory.SharedMemory(create=True, size=max(int(np.prod(shape)) * dtype.itemsize, 1))
+    return block, np.ndarray(shape, dtype=dtype, buffer=block.buf)
+
+
+def _share(array):
+    """Copiar un array a un bloque de memoria compartida"""
+    block, view = _create(array.shape, array.dtype)
+    view[...] = array
+    return block
+
+
+def _attach(name, shape, dtype):
+    """Abrir un bloque compartido como array sin copiarlo"""
+    block = shared_memory.SharedMemory(name=name)
+    return block, np.ndarray(shape, dtype=dtype, buffer=block.buf)
+
+
+def _init_worker(specs, n_users, n_genres, backend_name):
+    """Reconstruir el almacén y el backend a partir de la memoria compartida"""
+    blocks = {}
+    arrays = {}
+    for key, (name, shape, dtype) in specs.items():
+        blocks[key], arrays[key] = _attach(name, shape, dtype)
+    # Los nombres de usuarios y géneros no hacen falta para puntuar
+    store = PreferenceStore(range(n_users), range(n_genres), arrays['indptr'], arrays['indices'])
+    engine = SimilarityEngine(None, backend=backend_name)
+    backend = BACKENDS[backend_name](store, arrays['weights'])
+    _worker.update(blocks=blocks, engine=engine, backend=backend, n_users=n_users,
+                   sizes=store.sizes().astype(np.float64), condensed=arrays['condensed'])
+
+
+def _run_tile(tile):
+    """Puntuar una tesela del triángulo superior y escribir sus distancias en el vector compartido"""
+    start, stop, col_start, col_stop = tile
+    engine, backend, sizes = _worker['engine'], _worker['backend'], _worker['sizes']
+    n_users, condensed = _worker['n_users'], _worker['condensed']
+    scores = engine._score_block(backend, sizes, start, stop, col_start, col_stop)
+    for i in range(start, min(stop, col_stop - 1)):
+        first = max(col_start, i + 1)
+        offset = condensed_offset(n_users, i) + first - i - 1
+        condensed[offset:offset + col_stop - first] = 1.0 - scores[i - start, first - col_start:]
+    return tile
+
+
+def triangle_tiles(n_users, tile_size):
+    """Teselas (filas, columnas) del triángulo superior, de mayor a menor trabajo
+
+    La geometría solo depende de n_users y tile_size, no del número de
+    procesos, así que cada par se calcula siempre con las mismas operaciones.
+    """
+    bounds = [(start, min(start + tile_size, n_users)) for start in range(0, n_users, tile_size)]
+    tiles = [
+        (start, stop, col_start, col_stop)
+        for i, (start, stop) in enumerate(bounds)
+        for col_start, col_stop in bounds[i:]
+    ]
+    # Las teselas de la diagonal solo tienen la mitad de pares: se reparten al final
+    return sorted(tiles, key=lambda tile: tile[0] == tile[2])
+
+
+def parallel_condensed_distances(user_preferences, ontology_index, workers=None, tile_size=1024,
+                                 backend='auto', dtype=np.float32, progress=None):
+    """Vector condensado de distancias calculado por teselas en un pool de procesos
+
+    Los trabajadores reciben el almacén CSR y la matriz de pesos por memoria
+    compartida y escriben directamente en un vector de salida compartido.
+    Con un solo proceso o pocos usuarios se usa el cálculo secuencial.
+    """
+    store = PreferenceStore.from_preferences(user_preferences)
+    n_users = len(store)
+    workers = workers or os.cpu_count() or 1
+    engine = SimilarityEngine(ontology_index, backend=backend)
+    if workers <= 1 or n_users < PARALLEL_MIN_USERS:
+        return engine.condensed_distances(store, dtype=dtype, progress=progress)
+
+    shared = {
+        'indptr': store.indptr,
+        'indices': store.indices,
+        'weights': np.ascontiguousarray(engine.weight_matrix(store.genres)),
+    }
+    blocks = {}
+    output = None
+    try:
+        for key, array in shared.items():
+            blocks[key] = _share(array)
+        specs = {key: (blocks[key].name, array.shape, array.dtype.str) for key, array in shared.items()}
+        # El vector de salida solo existe en memoria compartida: cada tesela escribe su parte
+        blocks['condensed'], output = _create((n_users * (n_users - 1) // 2,), dtype)
+        specs['condensed'] = (blocks['condensed'].name, output.shape, output.dtype.str)
+        tiles = triangle_tiles(n_users, tile_size)
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                       initargs=(specs, n_users, len(store.genres), engine.backend_name(store)))
+        matrix = store.to_csr() if instrumentation.is_enabled() else None
+        try:
+            for done, (start, stop, col_start, col_stop) in enumerate(executor.map(_run_tile, tiles), 1):
+                # Los contadores de los procesos trabajadores no llegan aquí: se cuentan en el padre
+                instrumentation.count('similarity.pair_scores', (stop - start) * (col_stop - col_start))
+                if matrix is not None:
+                    count_relations(matrix, shared['weights'], start, stop, col_start, col_stop)
+                if progress is not None:
+                    progress(done, len(tiles))
+        finally:
+            # Si progress aborta el cálculo, las teselas pendientes no llegan a ejecutarse
+            executor.shutdown(cancel_futures=True)
+        # Una sola copia a memoria propia antes de liberar el bloque
+        condensed = output.copy()
+    finally:
+        # close() falla mientras quede un array sobre el búfer del bloque
+        del output
+        for block in blocks.values():
+            block.close()
+            block.unlink()
+    return condensed
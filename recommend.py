@@ -0,0 +1,80 @@
+import numpy as np
+from scipy import sparse
+
+# Géneros recomendados por usuario por defecto
+DEFAULT_TOP_GENRES = 5
+
+# Elementos de la matriz densa usuarios x géneros que se puntúan a la vez
+SCORE_BLOCK_ELEMENTS = 1 << 22
+
+
+def recommend_genres(user_preferences, neighbors, similarities, m=DEFAULT_TOP_GENRES, users=None, progress=None):
+    """Top-m géneros de cada usuario puntuados por la similitud de sus vecinos
+
+    La puntuación de un género es la suma de las similitudes de los vecinos
+    que lo tienen dividida por la suma de todas las similitudes, es decir,
+    el producto (vecinos x similitud) · (usuario x género) normalizado. Los
+    géneros que el usuario ya tiene se descartan. neighbors y similarities
+    son arrays n x k (como los de TopKIndex.top_k_all); users indica a qué
+    fila del almacén corresponde cada fila (por defecto, todas en orden).
+
+    Devuelve dos arrays n x m: ids de género (-1 si no hay más candidatos con
+    puntuación positiva) y puntuaciones, ordenadas de mayor a menor y, en
+    caso de empate, por id de género.
+    """
+    from store import PreferenceStore
+
+    store = PreferenceStore.from_preferences(user_preferences)
+    neighbors = np.asarray(neighbors)
+    similarities = np.asarray(similarities, dtype=np.float32)
+    users = np.arange(len(neighbors)) if users is None else np.asarray(users)
+    n_rows, k = neighbors.shape
+    n_genres = len(store.genres)
+    genre_ids = np.full((n_rows, m), -1, dtype=np.int32)
+    scores = np.zeros((n_rows, m), dtype=np.float32)
+    top = min(m, n_genres)
+    if n_rows == 0 or k == 0 or top == 0:
+        return genre_ids, scores
+
+    genres = store.to_csr(dtype=np.float32)
+    block_size = max(1, SCORE_BLOCK_ELEMENTS // n_genres)
+    for start in range(0, n_rows, block_size):
+        stop = min(start + block_size, n_rows)
+        rows = stop - start
+        weights = similarities[start:stop]
+        neighbor_weights = sparse.csr_matrix((weights.ravel(), neighbors[start:stop].ravel(),
+                                              np.arange(0, rows * k + 1, k)), shape=(rows, len(store)))
+        block = (neighbor_weights @ genres).toarray()
+        block /= np.maximum(weights.sum(axis=1, dtype=np.float64), 1e-12)[:, None].astype(np.float32)
+
+        # Descartar los géneros que el usuario ya tiene
+        own_rows, own_genres = genres[users[start:stop]].nonzero()
+        block[own_rows, own_genres] = 0
+
+        order = np.argsort(-block, axis=1, kind='stable')[:, :top]
+        best = np.take_along_axis(block, order, axis=1)
+        genre_ids[start:stop, :top] = np.where(best > 0, order, -1)
+        scores[start:stop, :top] = np.where(best > 0, best, 0)
+        if progress is not None:
+            progress(stop, n_rows)
+    return genre_ids, scores
+
+
+def write_genre_recommendations(path, user_preferences, genre_ids, scores, decimals=4):
+    """Escribir un CSV usuario,género1,puntuación1,... con las recomendaciones de todos los usuarios"""
+    import csv
+
+    users = user_preferences.users
+    genres = np.array(list(user_preferences.genres) + [''], dtype=object)
+    # El id -1 (sin recomendación) apunta a la cadena vacía del final
+    names = genres[genre_ids]
+    values = np.round(scores.astype(np.float64), decimals)
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        for i, user in enumerate(users):
+            row = [user]
+            for name, value in zip(names[i], values[i]):
+                if not name:
+                    break
+                row.extend((name, value))
+            writer.writerow(row)
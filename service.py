@@ -0,0 +1,302 @@
+"""Servicio HTTP local de recomendaciones sobre un índice precalculado en memoria
+
+Carga una sola vez las preferencias (CSV o instantánea .snap), los clusters
+y las listas de vecinos, y agrupa las consultas concurrentes en lotes que se
+resuelven con operaciones vectorizadas.
+
+Rutas (GET, respuestas JSON):
+    /similar?user=U[&k=5]   usuarios más similares
+    /genres?user=U[&m=5]    géneros recomendados, puntuados por los vecinos
+    /metrics                latencias p50/p99, QPS y tamaño medio de lote
+    /health
+
+Uso: python service.py usuarios.csv [--port 8080] [--k 10] [--snapshot preferencias.snap]
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+from collections import deque
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+
+from cache import ResultCache
+from engine import PreferenceEngine, CLUSTERING_MODES, NEIGHBOR_MODES
+from recommend import recommend_genres
+
+# Espera máxima para completar un lote y tamaño máximo de lote
+BATCH_WINDOW = 0.002
+MAX_BATCH = 256
+
+# Latencias recientes con las que se calculan los percentiles y ventana del QPS
+LATENCY_SAMPLES = 10000
+QPS_WINDOW = 10.0
+
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed'}
+
+
+class QueryError(Exception):
+    """Consulta inválida; se responde con el código HTTP indicado"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class RecommendationService:
+    """Consultas de vecinos y géneros agrupadas en lotes sobre arrays precalculados"""
+
+    def __init__(self, engine, k=10, batch_window=BATCH_WINDOW, max_batch=MAX_BATCH):
+        self.engine = engine
+        self.store = engine.user_preferences
+        lists = engine.top_k_lists(k)
+        self.k = lists.neighbors.shape[1]
+        self.neighbors = lists.neighbors
+        self.similarities = lists.similarities
+        self.clusters = engine.clusters
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+
+        self.queue = None
+        self.started = time.monotonic()
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)
+        self.finished = deque()
+        self.requests = 0
+        self.batches = 0
+        self.batched_queries = 0
+
+    async def start(self):
+        self.queue = asyncio.Queue()
+        self._batcher = asyncio.create_task(self._run_batches())
+
+    def _user_row(self, params):
+        user = params.get('user', [None])[0]
+        if user is None:
+            raise QueryError(400, "Falta el parámetro user")
+        if user not in self.store:
+            raise QueryError(404, f"Usuario desconocido: {user}")
+        return self.store.index_of(user)
+
+    @staticmethod
+    def _int_param(params, name, default, maximum):
+        try:
+            value = int(params.get(name, [default])[0])
+        except ValueError:
+            raise QueryError(400, f"{name} debe ser un entero")
+        if not 1 <= value <= maximum:
+            raise QueryError(400, f"{name} debe estar entre 1 y {maximum}")
+        return value
+
+    async def query(self, kind, params):
+        """Encolar una consulta y esperar a que su lote se resuelva"""
+        if kind == 'similar':
+            # Con menos de dos usuarios no hay vecinos precalculados: la lista sale vacía
+            limit = self._int_param(params, 'k', min(5, self.k), self.k) if self.k else 0
+        else:
+            n_genres = len(self.store.genres)
+            limit = self._int_param(params, 'm', min(5, n_genres), n_genres) if n_genres else 0
+        row = self._user_row(params)
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((kind, row, limit, future))
+        return await future
+
+    async def _run_batches(self):
+        """Reunir consultas durante batch_window (o hasta max_batch) y resolverlas juntas"""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.batch_window
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            self.batches += 1
+            self.batched_queries += len(batch)
+            try:
+                self._resolve([item for item in batch if item[0] == 'similar'], self._similar)
+                self._resolve([item for item in batch if item[0] == 'genres'], self._genres)
+            except Exception as e:
+                for *_, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    @staticmethod
+    def _resolve(items, handler):
+        if items:
+            rows = np.array([row for _, row, _, _ in items])
+            for (_, _, limit, future), result in zip(items, handler(rows, [limit for _, _, limit, _ in items])):
+                if not future.cancelled():
+                    future.set_result(result)
+
+    def _similar(self, rows, limits):
+        """Vecinos de un lote de usuarios con una sola indexación de los arrays n x k"""
+        neighbors = self.neighbors[rows]
+        similarities = self.similarities[rows].astype(np.float64)
+        users = self.store.users
+        results = []
+        for i, row in enumerate(rows):
+            results.append({
+                'user': users[row],
+                'cluster': int(self.clusters[row]) if self.clusters is not None else None,
+                'neighbors': [{'user': users[j], 'similarity': round(float(s), 6)}
+                              for j, s in zip(neighbors[i, :limits[i]], similarities[i, :limits[i]])],
+            })
+        return results
+
+    def _genres(self, rows, limits):
+        """Géneros recomendados de un lote de usuarios con un producto disperso por lote"""
+        genre_ids, scores = recommend_genres(self.store, self.neighbors[rows], self.similarities[rows],
+                                             m=max(limits), users=rows)
+        genres = self.store.genres
+        users = self.store.users
+        return [
+            {'user': users[row],
+             'genres': [{'genre': genres[g], 'score': round(float(s), 6)}
+                        for g, s in zip(genre_ids[i, :limits[i]], scores[i, :limits[i]]) if g >= 0]}
+            for i, row in enumerate(rows)
+        ]
+
+    def record(self, latency):
+        now = time.monotonic()
+        self.requests += 1
+        self.latencies.append(latency)
+        self.finished.append(now)
+        while self.finished and self.finished[0] < now - QPS_WINDOW:
+            self.finished.popleft()
+
+    def metrics(self):
+        """Latencias (ms) de las últimas consultas, QPS reciente y tamaño medio de lote"""
+        latencies = np.array(self.latencies) * 1e3
+        window = min(QPS_WINDOW, max(time.monotonic() - self.started, 1e-9))
+        return {
+            'requests': self.requests,
+            'users': len(self.store),
+            'k': self.k,
+            'qps': round(len(self.finished) / window, 1),
+            'p50_ms': round(float(np.percentile(latencies, 50)), 3) if len(latencies) else None,
+            'p99_ms': round(float(np.percentile(latencies, 99)), 3) if len(latencies) else None,
+            'batches': self.batches,
+            'mean_batch': round(self.batched_queries / self.batches, 2) if self.batches else None,
+        }
+
+    async def handle(self, path):
+        """Responder a una ruta; devuelve (código HTTP, cuerpo)"""
+        url = urlsplit(path)
+        params = parse_qs(url.query)
+        if url.path in ('/similar', '/genres'):
+            start = time.perf_counter()
+            body = await self.query(url.path[1:], params)
+            self.record(time.perf_counter() - start)
+            return 200, body
+        if url.path == '/metrics':
+            return 200, self.metrics()
+        if url.path == '/health':
+            return 200, {'status': 'ok'}
+        raise QueryError(404, f"Ruta desconocida: {url.path}")
+
+    async def serve_connection(self, reader, writer):
+        """HTTP/1.1 mínimo con conexiones persistentes"""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                try:
+                    method, path, version = request_line.decode('latin-1').split()
+                except ValueError:
+                    break
+                if method != 'GET':
+                    status, body = 405, {'error': "Solo se admite GET"}
+                else:
+                    try:
+                        status, body = await self.handle(path)
+                    except QueryError as e:
+                        status, body = e.status, {'error': str(e)}
+                    except Exception as e:
+                        status, body = 500, {'error': str(e)}
+                payload = json.dumps(body, ensure_ascii=False).encode('utf-8')
+                keep_alive = headers.get('connection', '').lower() != 'close' and version == 'HTTP/1.1'
+                writer.write(
+                    f"HTTP/1.1 {status} {REASONS.get(status, 'Internal Server Error')}\r\n"
+                    f"Content-Type: application/json; charset=utf-8\r\n"
+                    f"Content-Length: {len(payload)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode('latin-1') + payload
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+def build_engine(args):
+    """Cargar preferencias y calcular (o leer de la caché) los clusters una sola vez"""
+    cache = None if args.no_cache else ResultCache(args.cache_dir)
+    engine = PreferenceEngine(workers=args.workers, cache=cache, neighbor_mode=args.neighbors)
+    if args.ontology:
+        engine.genre_ontology = engine.load_ontology_from_file(args.ontology)
+    if args.input.endswith('.snap'):
+        engine.load_snapshot(args.input, verify=args.verify_snapshot)
+    else:
+        engine.load_csv(args.input, snapshot_path=args.snapshot)
+    engine.process(clustering=args.clustering)
+    return engine
+
+
+async def serve(args):
+    start = time.perf_counter()
+    service = RecommendationService(build_engine(args), k=args.k, batch_window=args.batch_window / 1e3,
+                                    max_batch=args.max_batch)
+    await service.start()
+    server = await asyncio.start_server(service.serve_connection, args.host, args.port)
+    print(f"Índice de {len(service.store)} usuarios cargado en {time.perf_counter() - start:.2f} s; "
+          f"escuchando en http://{args.host}:{args.port}", file=sys.stderr)
+    async with server:
+        await server.serve_forever()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Servicio HTTP de recomendaciones")
+    parser.add_argument('input', help="CSV de preferencias o instantánea .snap")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--k', type=int, default=10, help="Vecinos precalculados por usuario")
+    parser.add_argument('--neighbors', choices=NEIGHBOR_MODES, default='exact',
+                        help="Vecinos exactos o aproximados con MinHash + LSH")
+    parser.add_argument('--ontology', help="Ontología en JSON (por defecto, la ontología incorporada)")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--clustering', choices=CLUSTERING_MODES, default='auto')
+    parser.add_argument('--snapshot', default=None, help="Instantánea binaria de las preferencias del CSV")
+    parser.add_argument('--verify-snapshot', action='store_true',
+                        help="Comprobar la suma SHA-256 de la instantánea .snap de entrada")
+    parser.add_argument('--cache-dir', default=None)
+    parser.add_argument('--no-cache', action='store_true')
+    parser.add_argument('--batch-window', type=float, default=BATCH_WINDOW * 1e3,
+                        help="Milisegundos que se espera para completar un lote")
+    parser.add_argument('--max-batch', type=int, default=MAX_BATCH)
+    args = parser.parse_args(argv)
+    if args.k < 1:
+        parser.error("--k debe ser al menos 1")
+    return args
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(serve(parse_args()))
+    except KeyboardInterrupt:
+        pass
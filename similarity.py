@@ -0,0 +1,339 @@
+import numpy as np
+
+import instrumentation
+from ontology import RELATION_WEIGHTS
+from store import PreferenceStore
+
+# Pesos de la combinación final (60% básica, 40% semántica)
+BASIC_WEIGHT = 0.6
+SEMANTIC_WEIGHT = 0.4
+
+
+# Con vocabularios pequeños cada usuario cabe en una o dos palabras de 64 bits
+BITSET_AUTO_MAX_GENRES = 128
+
+
+class SparseBackend:
+    """Intersecciones y puntuación semántica con productos de matrices dispersas"""
+
+    name = 'sparse'
+
+    def __init__(self, store, weights):
+        self.matrix = store.to_csr()
+        self.weights = weights
+        self.matrix_t = self.matrix.T.tocsr()
+        # (A·W)ᵀ se calcula una sola vez y se reutiliza para cada bloque de filas
+        self.weighted_t = np.ascontiguousarray((self.matrix @ weights).T)
+
+    def score_block(self, start, stop, col_start=0, col_stop=None):
+        """|A ∩ B| y A·W·Aᵀ de las filas [start, stop) contra las columnas [col_start, col_stop)"""
+        block = self.matrix[start:stop]
+        intersection = (block @ self.matrix_t[:, col_start:col_stop]).toarray()
+        semantic_score = np.asarray(block @ self.weighted_t[:, col_start:col_stop])
+        return intersection, semantic_score
+
+
+class BitsetBackend:
+    """Intersecciones y puntuación semántica con máscaras uint64 y popcount"""
+
+    name = 'bitset'
+
+    def __init__(self, store, weights, column_block=8192):
+        self.matrix = store.to_csr()
+        self.weights = weights
+        self.bits = store.pack_bitsets()
+        self.column_block = column_block
+        self.semantic_t = self._semantic_counts(weights)
+
+    def _semantic_counts(self, weights):
+        """Puntuación semántica de cada género contra cada usuario: (W·Aᵀ)[g, v]
+
+        Para cada clase de relación (1.0 / 0.8 / 0.6 / 0.4) se empaqueta la fila
+        de géneros relacionados como máscara y se cuenta con popcount cuántos
+        de ellos tiene cada usuario.
+        """
+        n_users, n_words = self.bits.shape
+        semantic_t = np.zeros((len(weights), n_users))
+        for weight in np.unique(weights[weights > 0]):
+            related = _pack_rows(weights == weight, n_words)
+            for start in range(0, n_users, self.column_block):
+                stop = min(start + self.column_block, n_users)
+                counts = _popcount_and(related, self.bits[start:stop])
+                semantic_t[:, start:stop] += weight * counts
+        return semantic_t
+
+    def score_block(self, start, stop, col_start=0, col_stop=None):
+        """|A ∩ B| y A·W·Aᵀ de las filas [start, stop) contra las columnas [col_start, col_stop)"""
+        intersection = _popcount_and(self.bits[start:stop], self.bits[col_start:col_stop]).astype(np.float64)
+        # Con vocabularios pequeños el bloque denso aprovecha BLAS
+        semantic_score = self.matrix[start:stop].toarray() @ self.semantic_t[:, col_start:col_stop]
+        return intersection, semantic_score
+
+
+def _pack_rows(mask, n_words):
+    """Empaquetar cada fila de una matriz booleana en n_words palabras uint64"""
+    rows, cols = np.nonzero(mask)
+    packed = np.zeros((mask.shape[0], n_words), dtype=np.uint64)
+    np.bitwise_or.at(packed, (rows, cols // 64),
+                     np.left_shift(np.uint64(1), (cols % 64).astype(np.uint64)))
+    return packed
+
+
+def _popcount_and(left, right):
+    """Número de bits comunes entre cada fila de left y cada fila de right"""
+    counts = np.zeros((len(left), len(right)), dtype=np.uint16)
+    common = np.empty((len(left), len(right)), dtype=np.uint64)
+    for word in range(left.shape[1]):
+        np.bitwise_and(left[:, None, word], right[None, :, word], out=common)
+        counts += np.bitwise_count(common)
+    return counts
+
+
+BACKENDS = {
+    SparseBackend.name: SparseBackend,
+    BitsetBackend.name: BitsetBackend,
+}
+
+
+class SimilarityEngine:
+    """Motor vectorizado de similitud de Jaccard mejorada para todos los pares de usuarios"""
+
+    def __init__(self, ontology_index, block_size=2048, backend='auto'):
+        if backend != 'auto' and backend not in BACKENDS:
+            raise ValueError(f"Backend de similitud desconocido: {backend}")
+        self.ontology_index = ontology_index
+        self.block_size = block_size
+        self.backend = backend
+
+    def encode(self, user_preferences):
+        """Codificar las preferencias como matriz binaria dispersa usuario x género"""
+        store = PreferenceStore.from_preferences(user_preferences)
+        return store.users, store.genres, store.to_csr()
+
+    def weight_matrix(self, genres):
+        """Matriz de pesos semánticos género x género tomada del índice de la ontología"""
+        return self.ontology_index.weight_matrix(genres)
+
+    def backend_name(self, store):
+        """Backend a usar: en modo auto, bitset para vocabularios pequeños"""
+        if self.backend != 'auto':
+            return self.backend
+        return BitsetBackend.name if len(store.genres) <= BITSET_AUTO_MAX_GENRES else SparseBackend.name
+
+    def _prepare(self, user_preferences):
+        """Preparar el backend y los tamaños compartidos por todos los bloques de filas"""
+        store = PreferenceStore.from_preferences(user_preferences)
+        weights = self.weight_matrix(store.genres)
+        backend = BACKENDS[self.backend_name(store)](store, weights)
+        return len(store), backend, store.sizes().astype(np.float64)
+
+    def _score_block(self, backend, sizes, start, stop, col_start=0, col_stop=None):
+        """Similitud de las filas [start, stop) contra las columnas [col_start, col_stop)"""
+        intersection, semantic_score = backend.score_block(start, stop, col_start, col_stop)
+        instrumentation.count('similarity.pair_scores', intersection.size)
+        if instrumentation.is_enabled():
+            count_relations(backend.matrix, backend.weights, start, stop, col_start, col_stop)
+        block_sizes = sizes[start:stop, None]
+        col_sizes = sizes[None, col_start:col_stop]
+
+        # Similitud básica: |A ∩ B| / |A ∪ B| (si la unión es vacía la intersección ya es 0)
+        union = block_sizes + col_sizes - intersection
+        np.maximum(union, 1, out=union)
+        basic = np.divide(intersection, union, out=intersection)
+
+        # Similitud semántica: (A·W·Aᵀ) / (|A|·|B|)
+        comparisons = np.multiply(block_sizes, col_sizes, out=union)
+        np.maximum(comparisons, 1, out=comparisons)
+        semantic = np.divide(semantic_score, comparisons, out=semantic_score)
+
+        basic *= BASIC_WEIGHT
+        semantic *= SEMANTIC_WEIGHT
+        basic += semantic
+        return basic
+
+    def row_similarities(self, user_preferences, i):
+        """Similitudes de la fila i contra todos los usuarios (1.0 en la diagonal)"""
+        _, backend, sizes = self._prepare(user_preferences)
+        row = self._score_block(backend, sizes, i, i + 1)[0]
+        row[i] = 1.0
+        return row
+
+    def similarity_matrix(self, user_preferences):
+        """Calcular la matriz completa de similitud con productos de matrices"""
+        n_users, backend, sizes = self._prepare(user_preferences)
+        result = np.zeros((n_users, n_users))
+
+        for start in range(0, n_users, self.block_size):
+            stop = min(start + self.block_size, n_users)
+            result[start:stop] = self._score_block(backend, sizes, start, stop)
+
+        np.fill_diagonal(result, 1.0)
+        return result
+
+    def condensed_distances(self, user_preferences, dtype=np.float32, progress=None):
+        """Calcular solo el triángulo superior como vector condensado de distancias"""
+        n_users, backend, sizes = self._prepare(user_preferences)
+        condensed = np.empty(n_users * (n_users - 1) // 2, dtype=dtype)
+
+        for start in range(0, n_users, self.block_size):
+            stop = min(start + self.block_size, n_users)
+            # Solo las columnas j > start; cada fila i usa después las columnas j > i
+            scores = self._score_block(backend, sizes, start, stop, col_start=start)
+            for i in range(start, stop):
+                offset = condensed_offset(n_users, i)
+                condensed[offset:offset + n_users - i - 1] = 1.0 - scores[i - start, i - start + 1:]
+            if progress is not None:
+                progress(stop, n_users)
+
+        return condensed
+
+
+def count_relations(matrix, weights, start, stop, col_start=0, col_stop=None):
+    """Contar por clase de relación los pares de géneros comparados en un bloque de usuarios
+
+    Con g_f y g_c los recuentos de cada género en las filas y en las columnas
+    del bloque, los pares de la clase con peso w son g_fᵀ·[W == w]·g_c: un
+    producto por clase y bloque en lugar de recorrer los pares de usuarios.
+    """
+    rows = np.asarray(matrix[start:stop].sum(axis=0), dtype=np.float64).ravel()
+    cols = np.asarray(matrix[col_start:col_stop].sum(axis=0), dtype=np.float64).ravel()
+    for relation, weight in RELATION_WEIGHTS:
+        instrumentation.count(f'ontology.lookups.{relation}', int(rows @ (weights == weight) @ cols))
+
+
+def condensed_offset(n_users, i):
+    """Posición en el vector condensado donde empieza la fila i (columnas j > i)"""
+    return n_users * i - i * (i + 1) // 2
+
+
+class CondensedSimilarity:
+    """Vista perezosa de la matriz de similitud sobre un vector condensado de distancias
+
+    Los cambios incrementales no reescriben el vector condensado (cada inserción
+    o borrado desplazaría O(n²) valores): cada fila actual apunta a una ranura,
+    que es un usuario del vector base o una fila de desbordamiento con sus
+    similitudes contra todas las ranuras. Los borrados solo retiran la ranura.
+    Al leer .condensed (o cuando el desbordamiento ocupa tanto como la base)
+    se compacta todo en un vector condensado nuevo.
+    """
+
+    def __init__(self, condensed):
+        self.base = condensed
+        # Resolver n a partir de la longitud n(n-1)/2
+        self.n_base = int(round((1 + np.sqrt(1 + 8 * len(condensed))) / 2)) if len(condensed) else 1
+        self.slots = np.arange(self.n_base)
+        self.extra = np.empty((0, self.n_base), dtype=condensed.dtype)
+        self.n_extra = 0
+
+    @property
+    def n_users(self):
+        return len(self.slots)
+
+    @property
+    def shape(self):
+        return (self.n_users, self.n_users)
+
+    @property
+    def condensed(self):
+        """Vector condensado de distancias de los usuarios actuales"""
+        self.compact()
+        return self.base
+
+    def __len__(self):
+        return self.n_users
+
+    def __getitem__(self, i):
+        return self.row(i)
+
+    def _check(self, i):
+        n_users = self.n_users
+        if i < 0:
+            i += n_users
+        if not 0 <= i < n_users:
+            raise IndexError(f"Fila fuera de rango: {i}")
+        return i
+
+    def _base_positions(self, b):
+        """Posiciones en el vector base de los pares (b, j) para cada usuario base j (la de j == b no es válida)"""
+        n_base = self.n_base
+        # Columnas j < b: una posición en cada fila anterior del triángulo
+        previous = np.arange(b)
+        before = n_base * previous - previous * (previous + 1) // 2 + (b - previous - 1)
+        offset = condensed_offset(n_base, b)
+        return np.concatenate([before, [0], np.arange(offset, offset + n_base - b - 1)])
+
+    def row(self, i):
+        """Materializar una fila de similitudes (con 1.0 en la diagonal)"""
+        slot = self.slots[self._check(i)]
+        if slot >= self.n_base:
+            return self.extra[slot - self.n_base, self.slots].astype(np.float64)
+
+        in_base = self.slots < self.n_base
+        base_row = 1.0 - self.base[self._base_positions(slot)].astype(np.float64)
+        base_row[slot] = 1.0
+        similarities = np.empty(self.n_users, dtype=np.float64)
+        similarities[in_base] = base_row[self.slots[in_base]]
+        similarities[~in_base] = self.extra[self.slots[~in_base] - self.n_base, slot]
+        return similarities
+
+    def update_row(self, i, similarities):
+        """Sustituir la fila y la columna i (similarities incluye la diagonal)"""
+        i = self._check(i)
+        slot = self.slots[i]
+        in_base = self.slots < self.n_base
+        # La columna i de cada fila de desbordamiento
+        self.extra[self.slots[~in_base] - self.n_base, slot] = similarities[~in_base]
+        if slot >= self.n_base:
+            self.extra[slot - self.n_base, self.slots] = similarities
+            return
+        if not self.base.flags.writeable:
+            # Copia privada si el vector viene de un memmap de solo lectura
+            self.base = np.array(self.base)
+        others = in_base & (np.arange(self.n_users) != i)
+        self.base[self._base_positions(slot)[self.slots[others]]] = 1.0 - similarities[others]
+
+    def append_row(self, similarities):
+        """Añadir un usuario al final (similarities tiene n + 1 valores)"""
+        if self.n_extra == len(self.extra):
+            self._grow()
+        extra_id = self.n_extra
+        slot = self.n_base + extra_id
+        in_base = self.slots < self.n_base
+        self.extra[extra_id, self.slots] = similarities[:-1]
+        self.extra[extra_id, slot] = 1.0
+        self.extra[self.slots[~in_base] - self.n_base, slot] = similarities[:-1][~in_base]
+        self.slots = np.append(self.slots, slot)
+        self.n_extra += 1
+        if self.n_extra * (self.n_base + self.n_extra) > len(self.base):
+            self.compact()
+        return self
+
+    def delete_row(self, i):
+        """Retirar el usuario de la fila i"""
+        self.slots = np.delete(self.slots, self._check(i))
+        return self
+
+    def _grow(self):
+        """Duplicar la capacidad del bloque de filas de desbordamiento"""
+        capacity = max(2 * len(self.extra), 16)
+        extra = np.empty((capacity, self.n_base + capacity), dtype=self.extra.dtype)
+        extra[:self.n_extra, :self.n_base + self.n_extra] = self.extra[:self.n_extra, :self.n_base + self.n_extra]
+        self.extra = extra
+
+    def compact(self):
+        """Reescribir el vector condensado con los usuarios actuales y vaciar el desbordamiento"""
+        if self.n_extra == 0 and len(self.slots) == self.n_base:
+            return
+        n_users = self.n_users
+        condensed = np.empty(n_users * (n_users - 1) // 2, dtype=self.base.dtype)
+        for i in range(n_users - 1):
+            offset = condensed_offset(n_users, i)
+            condensed[offset:offset + n_users - i - 1] = 1.0 - self.row(i)[i + 1:]
+        self.__init__(condensed)
+
+    def to_dense(self):
+        """Materializar la matriz cuadrada completa"""
+        from scipy.spatial.distance import squareform
+        dense = 1.0 - squareform(np.asarray(self.condensed, dtype=np.float64))
+        np.fill_diagonal(dense, 1.0)
+        return dense
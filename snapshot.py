@@ -0,0 +1,172 @@
+import hashlib
+import json
+import os
+import struct
+
+import numpy as np
+
+from ingest import IngestResult
+from ontology import ontology_hash
+from store import PreferenceStore
+
+# Cambiar al modificar la disposición del fichero
+SNAPSHOT_VERSION = 2
+SNAPSHOT_MAGIC = b'JACSNAP\0'
+
+# Firma, versión y longitud de la cabecera JSON
+_PREAMBLE = struct.Struct('<8sIQ')
+# Alineación de cada array para poder mapearlo sin copias
+_ALIGNMENT = 64
+
+
+def _padding(offset):
+    return -offset % _ALIGNMENT
+
+
+def names_blob(names, kind):
+    """Nombres en UTF-8 separados por NUL"""
+    if any('\0' in name for name in names):
+        raise ValueError(f"Hay {kind} con caracteres NUL; no se pueden guardar en un fichero binario")
+    return np.frombuffer('\0'.join(names).encode('utf-8'), dtype=np.uint8)
+
+
+def decode_names(blob, count):
+    names = bytes(blob).decode('utf-8').split('\0') if count else []
+    if len(names) != count:
+        raise ValueError("Fichero binario corrupto: número de nombres incorrecto")
+    return names
+
+
+def write_arrays(path, magic, version, header, arrays):
+    """Escribir una cabecera JSON y arrays alineados a 64 bytes de forma atómica
+
+    A la cabecera se le añaden la posición de cada array y la suma SHA-256
+    de los datos.
+    """
+    layout = {}
+    offset = 0
+    checksum = hashlib.sha256()
+    for name, array in arrays.items():
+        offset += _padding(offset)
+        layout[name] = {'offset': offset, 'dtype': array.dtype.str, 'shape': list(array.shape)}
+        checksum.update(array.tobytes())
+        offset += array.nbytes
+
+    header = json.dumps(dict(header, sha256=checksum.hexdigest(), arrays=layout),
+                        ensure_ascii=False).encode('utf-8')
+    data_start = _PREAMBLE.size + len(header)
+    data_start += _padding(data_start)
+
+    # Escritura atómica: un lector nunca ve un fichero a medias
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    with open(tmp_path, 'wb') as f:
+        f.write(_PREAMBLE.pack(magic, version, len(header)))
+        f.write(header)
+        for name, array in arrays.items():
+            f.seek(data_start + layout[name]['offset'])
+            f.write(array.tobytes())
+    os.replace(tmp_path, path)
+
+
+def read_header(path, magic, version, kind):
+    """Cabecera de un fichero escrito con write_arrays y posición donde empiezan los datos"""
+    with open(path, 'rb') as f:
+        preamble = f.read(_PREAMBLE.size)
+        if len(preamble) != _PREAMBLE.size:
+            raise ValueError(f"No es {kind}: {path}")
+        file_magic, file_version, header_size = _PREAMBLE.unpack(preamble)
+        if file_magic != magic:
+            raise ValueError(f"No es {kind}: {path}")
+        if file_version != version:
+            raise ValueError(f"Versión de {kind} no soportada: {file_version} (se esperaba {version})")
+        header = json.loads(f.read(header_size).decode('utf-8'))
+    data_start = _PREAMBLE.size + header_size
+    return header, data_start + _padding(data_start)
+
+
+def map_arrays(path, header, data_start, verify=True):
+    """Mapear los arrays de un fichero en memoria, sin copiarlos; verify recalcula la suma SHA-256"""
+    data = np.memmap(path, dtype=np.uint8, mode='r')
+    arrays = {}
+    for name, spec in header['arrays'].items():
+        dtype = np.dtype(spec['dtype'])
+        count = int(np.prod(spec['shape']))
+        start = data_start + spec['offset']
+        if start + count * dtype.itemsize > len(data):
+            raise ValueError(f"Fichero truncado: {path}")
+        arrays[name] = np.frombuffer(data, dtype=dtype, count=count, offset=start).reshape(spec['shape'])
+    if verify:
+        checksum = hashlib.sha256()
+        for array in arrays.values():
+            checksum.update(array.data)
+        if checksum.hexdigest() != header['sha256']:
+            raise ValueError(f"Suma de comprobación incorrecta, el fichero está dañado: {path}")
+    return arrays
+
+
+def file_source(file_path):
+    """Identidad de un fichero de origen: ruta absoluta, tamaño y fecha de modificación"""
+    stat = os.stat(file_path)
+    return {'path': os.path.abspath(file_path), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def save_snapshot(path, result, genre_ontology, source=None, normalization=None):
+    """Guardar las preferencias normalizadas de una ingesta en un fichero binario mapeable
+
+    El fichero contiene una cabecera JSON (versión, huella de la ontología,
+    huella de las reglas de normalización, fichero de origen, suma SHA-256
+    de los datos) y los arrays CSR, los recuentos de géneros y los nombres,
+    alineados a 64 bytes.
+    """
+    store = result.store
+    genre_counts = np.array([result.genre_counts.get(genre, 0) for genre in store.genres], dtype=np.int64)
+    arrays = {
+        'indptr': np.ascontiguousarray(store.indptr, dtype=np.int64),
+        'indices': np.ascontiguousarray(store.indices, dtype=np.int32),
+        'genre_counts': genre_counts,
+        'users': names_blob(store.users, 'usuarios'),
+        'genres': names_blob(store.genres, 'géneros'),
+    }
+    header = {
+        'version': SNAPSHOT_VERSION,
+        'n_users': len(store.users),
+        'n_genres': len(store.genres),
+        'rows': result.rows,
+        'cells': result.cells,
+        'unique_cells': result.unique_cells,
+        'ontology': ontology_hash(genre_ontology),
+        'normalization': normalization,
+        'source': source,
+    }
+    write_arrays(path, SNAPSHOT_MAGIC, SNAPSHOT_VERSION, header, arrays)
+
+
+def read_snapshot_header(path):
+    """Cabecera de una instantánea y posición donde empiezan los datos"""
+    return read_header(path, SNAPSHOT_MAGIC, SNAPSHOT_VERSION, "instantánea de preferencias")
+
+
+def load_snapshot(path, genre_ontology=None, source=None, normalization=None, verify=False):
+    """Cargar una instantánea mapeando sus arrays en memoria, sin copiarlos
+
+    Con genre_ontology se comprueba que se construyó con la misma ontología,
+    con normalization (NLPProcessor.rules_fingerprint) que se normalizó con
+    las mismas reglas y stop words y con source, que el fichero de origen no
+    ha cambiado. Cualquier discrepancia lanza ValueError. El tamaño de los
+    arrays se comprueba siempre; verify recalcula además la suma SHA-256, que
+    obliga a leer el fichero entero y por eso es opcional.
+    """
+    header, data_start = read_snapshot_header(path)
+    if genre_ontology is not None and header['ontology'] != ontology_hash(genre_ontology):
+        raise ValueError("La instantánea se construyó con otra versión de la ontología")
+    if normalization is not None and header['normalization'] != normalization:
+        raise ValueError("La instantánea se construyó con otras reglas de normalización o stop words")
+    if source is not None and header['source'] != source:
+        raise ValueError("El fichero de origen ha cambiado desde que se guardó la instantánea")
+
+    arrays = map_arrays(path, header, data_start, verify)
+    genres = decode_names(arrays['genres'], header['n_genres'])
+    store = PreferenceStore(decode_names(arrays['users'], header['n_users']), genres,
+                            arrays['indptr'], arrays['indices'])
+    genre_counts = dict(zip(genres, arrays['genre_counts'].tolist()))
+    return IngestResult(store, genre_counts, header['rows'], header['cells'], header['unique_cells'])
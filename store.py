@@ -0,0 +1,145 @@
+from collections.abc import Mapping
+
+import numpy as np
+
+# Con hasta 64 géneros cada usuario cabe en una sola palabra de 64 bits
+BITSET_MAX_GENRES = 64
+
+
+class PreferenceStore(Mapping):
+    """Almacén compacto de preferencias: vocabulario internado y usuarios en formato CSR"""
+
+    def __init__(self, users, genres, indptr, indices):
+        self.users = list(users)
+        self.genres = list(genres)
+        self.genre_ids = {genre: i for i, genre in enumerate(self.genres)}
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=np.int32)
+        # Índice de nombres y bitsets se construyen en su primer uso (cargar una instantánea no los necesita)
+        self._user_index = None
+        self._bitsets = None
+
+    @property
+    def user_index(self):
+        """Usuario -> fila"""
+        if self._user_index is None:
+            self._user_index = {user: i for i, user in enumerate(self.users)}
+        return self._user_index
+
+    @property
+    def bitsets(self):
+        """Géneros de cada usuario en una palabra uint64 (None con más de BITSET_MAX_GENRES géneros)"""
+        if self._bitsets is None and len(self.genres) <= BITSET_MAX_GENRES:
+            self._bitsets = self.pack_bitsets()[:, 0]
+        return self._bitsets
+
+    @classmethod
+    def from_preferences(cls, user_preferences):
+        """Construir el almacén a partir de un diccionario usuario -> conjunto de géneros"""
+        if isinstance(user_preferences, cls):
+            return user_preferences
+
+        genres = sorted(set().union(*user_preferences.values())) if user_preferences else []
+        genre_ids = {genre: i for i, genre in enumerate(genres)}
+        indptr = [0]
+        indices = []
+        for preferences in user_preferences.values():
+            indices.extend(sorted(genre_ids[genre] for genre in preferences))
+            indptr.append(len(indices))
+        return cls(user_preferences.keys(), genres, indptr, indices)
+
+    def with_user(self, user, genres):
+        """Nuevo almacén con el usuario añadido al final o con sus géneros sustituidos
+
+        Devuelve (almacén, fila del usuario). Los géneros nuevos se añaden al
+        final del vocabulario para no renumerar los existentes.
+        """
+        vocabulary = list(self.genres)
+        genre_ids = dict(self.genre_ids)
+        for genre in sorted(genres):
+            if genre not in genre_ids:
+                genre_ids[genre] = len(vocabulary)
+                vocabulary.append(genre)
+        row = np.array(sorted(genre_ids[genre] for genre in genres), dtype=np.int32)
+
+        i = self.user_index.get(user)
+        if i is None:
+            indptr = np.append(self.indptr, self.indptr[-1] + len(row))
+            store = PreferenceStore(self.users + [user], vocabulary, indptr, np.concatenate([self.indices, row]))
+            return store, len(self.users)
+
+        start, stop = self.indptr[i], self.indptr[i + 1]
+        indices = np.concatenate([self.indices[:start], row, self.indices[stop:]])
+        indptr = self.indptr.copy()
+        indptr[i + 1:] += len(row) - (stop - start)
+        return PreferenceStore(self.users, vocabulary, indptr, indices), i
+
+    def without_user(self, user):
+        """Nuevo almacén sin el usuario; devuelve (almacén, fila que ocupaba)"""
+        i = self.index_of(user)
+        start, stop = self.indptr[i], self.indptr[i + 1]
+        indices = np.concatenate([self.indices[:start], self.indices[stop:]])
+        indptr = np.concatenate([self.indptr[:i + 1], self.indptr[i + 2:] - (stop - start)])
+        return PreferenceStore(self.users[:i] + self.users[i + 1:], self.genres, indptr, indices), i
+
+    def pack_bitsets(self):
+        """Empaquetar los géneros de cada usuario en palabras uint64 (n_usuarios x n_palabras)"""
+        n_words = max(1, -(-len(self.genres) // 64))
+        bitsets = np.zeros((len(self.users), n_words), dtype=np.uint64)
+        rows = np.repeat(np.arange(len(self.users)), np.diff(self.indptr))
+        np.bitwise_or.at(bitsets, (rows, self.indices // 64),
+                         np.left_shift(np.uint64(1), (self.indices % 64).astype(np.uint64)))
+        return bitsets
+
+    def __getitem__(self, user):
+        return self.genre_set(self.user_index[user])
+
+    def __iter__(self):
+        return iter(self.users)
+
+    def __len__(self):
+        return len(self.users)
+
+    def __contains__(self, user):
+        return user in self.user_index
+
+    def index_of(self, user):
+        """Fila de un usuario en tiempo constante"""
+        return self.user_index[user]
+
+    def row(self, i):
+        """Ids de género del usuario en la fila i"""
+        return self.indices[self.indptr[i]:self.indptr[i + 1]]
+
+    def genre_set(self, i):
+        """Géneros del usuario en la fila i como conjunto inmutable"""
+        return frozenset(self.genres[genre_id] for genre_id in self.row(i))
+
+    def sizes(self):
+        """Número de géneros de cada usuario"""
+        return np.diff(self.indptr)
+
+    def to_csr(self, dtype=np.float64):
+        """Matriz binaria dispersa usuario x género"""
+        from scipy import sparse
+        data = np.ones(len(self.indices), dtype=dtype)
+        return sparse.csr_matrix((data, self.indices, self.indptr), shape=(len(self.users), len(self.genres)))
+
+    def jaccard_similarity(self, i, j):
+        """Similitud de Jaccard entre las filas i y j sin construir conjuntos de Python"""
+        if self.bitsets is not None:
+            intersection = int(np.bitwise_count(self.bitsets[i] & self.bitsets[j]))
+            union = int(np.bitwise_count(self.bitsets[i] | self.bitsets[j]))
+        else:
+            row_i = self.row(i)
+            row_j = self.row(j)
+            intersection = len(np.intersect1d(row_i, row_j, assume_unique=True))
+            union = len(row_i) + len(row_j) - intersection
+        return intersection / union if union > 0 else 0
+
+    def nbytes(self):
+        """Memoria ocupada por los arrays del almacén"""
+        total = self.indptr.nbytes + self.indices.nbytes
+        if self._bitsets is not None:
+            total += self._bitsets.nbytes
+        return total
@@ -0,0 +1,113 @@
+import queue
+import threading
+import time
+
+import instrumentation
+
+
+class TaskCancelled(Exception):
+    """El usuario canceló la tarea en curso"""
+
+
+class Task:
+    """Tarea en un hilo de trabajo; solo se comunica con la interfaz a través de la cola"""
+
+    def __init__(self, name, messages):
+        self.name = name
+        self.messages = messages
+        self.cancel_event = threading.Event()
+        self._last_report = 0.0
+
+    @property
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+    def check_cancelled(self):
+        """Lanzar TaskCancelled si se pidió cancelar; se usa como punto de aborto"""
+        if self.cancel_event.is_set():
+            raise TaskCancelled()
+
+    def report(self, text, force=False, min_interval=0.1):
+        """Enviar un mensaje de progreso a la interfaz (como mucho uno cada min_interval segundos)"""
+        self.check_cancelled()
+        now = time.monotonic()
+        if force or now - self._last_report >= min_interval:
+            self._last_report = now
+            self.messages.put(('progress', self, text))
+
+
+class TaskRunner:
+    """Ejecutar tareas largas en un hilo sin bloquear el bucle de eventos de Tk
+
+    El hilo de trabajo deja mensajes en una cola que la interfaz vacía con
+    root.after; los callbacks on_progress, on_done y on_error se ejecutan
+    siempre en el hilo de Tk. Solo hay una tarea activa a la vez.
+    """
+
+    def __init__(self, root, on_progress, on_state=None, poll_ms=100):
+        self.root = root
+        self.on_progress = on_progress
+        self.on_state = on_state
+        self.poll_ms = poll_ms
+        self.messages = queue.Queue()
+        self.task = None
+        self._callbacks = {}
+
+    @property
+    def busy(self):
+        return self.task is not None
+
+    def run(self, name, work, on_done=None, on_error=None, on_cancel=None):
+        """Lanzar work(task) en un hilo; devuelve False si ya hay una tarea en curso"""
+        if self.busy:
+            return False
+        task = Task(name, self.messages)
+        self.task = task
+        self._callbacks = {'done': on_done, 'error': on_error, 'cancelled': on_cancel}
+        thread = threading.Thread(target=self._work, args=(task, work), name=f"tarea-{name}", daemon=True)
+        if self.on_state is not None:
+            self.on_state(task)
+        thread.start()
+        self.root.after(self.poll_ms, self._poll)
+        return True
+
+    def cancel(self):
+        """Pedir la cancelación; la tarea se detiene en su siguiente punto de aborto"""
+        if self.task is not None:
+            self.task.cancel_event.set()
+
+    def _work(self, task, work):
+        try:
+            # Una cancelación que llega cuando el trabajo ya terminó no descarta el resultado
+            with instrumentation.timer(f"task.{task.name}"):
+                result = instrumentation.profiled(work, task)
+            self.messages.put(('done', task, result))
+        except TaskCancelled:
+            self.messages.put(('cancelled', task, None))
+        except Exception as e:
+            self.messages.put(('error', task, e))
+
+    def _poll(self):
+        """Vaciar la cola en el hilo de Tk y reprogramarse mientras haya una tarea activa"""
+        while True:
+            try:
+                kind, task, payload = self.messages.get_nowait()
+            except queue.Empty:
+                break
+            if task is not self.task:
+                continue
+            if kind == 'progress':
+                self.on_progress(task, payload)
+                continue
+            self.task = None
+            if self.on_state is not None:
+                self.on_state(None)
+            callback = self._callbacks.get(kind)
+            if callback is None:
+                continue
+            if kind == 'cancelled':
+                callback()
+            else:
+                callback(payload)
+        if self.task is not None:
+            self.root.after(self.poll_ms, self._poll)
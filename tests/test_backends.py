@@ -0,0 +1,78 @@
+"""Paridad de los backends 'sparse' y 'bitset' con el cálculo original por pares"""
+import os
+
+import numpy as np
+import pytest
+
+from conftest import ROOT
+from reference import default_ontology_and_stem, random_preferences, loop_similarity_matrix
+from ingest import CSVIngestor
+from ontology import OntologyIndex
+from similarity import SimilarityEngine
+from synthetic import generate_csv
+
+BACKEND_NAMES = ('sparse', 'bitset')
+SAMPLE_FILES = ('muestra_usuarios.csv', 'muestra_usuarios_nlp.csv')
+
+# Matriz completa en float64: solo cambia el orden de las sumas
+FLOAT64_TOLERANCE = 1e-12
+# Vector condensado de distancias en float32: error de redondeo de float32
+FLOAT32_TOLERANCE = 1e-6
+
+
+@pytest.fixture(scope='module')
+def ontology_and_stem():
+    return default_ontology_and_stem()
+
+
+def _preferences(path):
+    """Preferencias normalizadas de un CSV, leídas con la ingesta del proyecto"""
+    store = CSVIngestor(workers=1).ingest(path).store
+    return {user: store.genre_set(i) for i, user in enumerate(store.users)}
+
+
+@pytest.fixture(scope='module')
+def datasets(ontology_and_stem, tmp_path_factory):
+    ontology, stem = ontology_and_stem
+    synthetic_path = tmp_path_factory.mktemp('datos') / 'sintetico.csv'
+    generate_csv(str(synthetic_path), 80, seed=7)
+
+    preferences = {name: _preferences(os.path.join(ROOT, name)) for name in SAMPLE_FILES}
+    preferences['aleatorio'] = random_preferences(ontology, 80, seed=3)
+    preferences['sintetico'] = _preferences(str(synthetic_path))
+    return {name: (prefs, loop_similarity_matrix(prefs, ontology, stem)) for name, prefs in preferences.items()}
+
+
+@pytest.mark.parametrize('backend', BACKEND_NAMES)
+@pytest.mark.parametrize('dataset', SAMPLE_FILES + ('aleatorio', 'sintetico'))
+def test_similarity_matrix_matches_reference(ontology_and_stem, datasets, backend, dataset):
+    ontology, stem = ontology_and_stem
+    preferences, expected = datasets[dataset]
+    engine = SimilarityEngine(OntologyIndex(ontology, stem), block_size=64, backend=backend)
+    np.testing.assert_allclose(engine.similarity_matrix(preferences), expected, rtol=0, atol=FLOAT64_TOLERANCE)
+
+
+@pytest.mark.parametrize('backend', BACKEND_NAMES)
+@pytest.mark.parametrize('dataset', SAMPLE_FILES + ('aleatorio', 'sintetico'))
+def test_condensed_float32_matches_reference(ontology_and_stem, datasets, backend, dataset):
+    ontology, stem = ontology_and_stem
+    preferences, expected = datasets[dataset]
+    engine = SimilarityEngine(OntologyIndex(ontology, stem), block_size=64, backend=backend)
+    condensed = engine.condensed_distances(preferences, dtype=np.float32)
+    rows, cols = np.triu_indices(len(preferences), k=1)
+    np.testing.assert_allclose(1.0 - condensed.astype(np.float64), expected[rows, cols],
+                               rtol=0, atol=FLOAT32_TOLERANCE)
+
+
+@pytest.mark.parametrize('backend', BACKEND_NAMES)
+def test_parallel_matches_serial(ontology_and_stem, datasets, backend, monkeypatch):
+    import parallel
+
+    ontology, stem = ontology_and_stem
+    preferences, _ = datasets['sintetico']
+    index = OntologyIndex(ontology, stem)
+    # Forzar el pool con pocos usuarios y teselas pequeñas (varias por fila, con diagonal incluida)
+    monkeypatch.setattr(parallel, 'PARALLEL_MIN_USERS', 0)
+    condensed = parallel.parallel_condensed_distances(preferences, index, workers=2, tile_size=16, backend=backend)
+    expected = SimilarityEngine(index, block_size=64, backend=backend).condensed_distances(preferences)
+    np.testing.assert_allclose(condensed, expected, rtol=0, atol=FLOAT32_TOLERANCE)
@@ -0,0 +1,95 @@
+"""Límite de tamaño de ResultCache con resultados y ficheros auxiliares en el mismo directorio"""
+import os
+
+import numpy as np
+
+from cache import ResultCache
+
+
+def _write(path, n_bytes):
+    with open(path, 'wb') as f:
+        f.write(b'\0' * n_bytes)
+
+
+def _age(cache, key, seconds):
+    path = cache._path(key)
+    os.utime(path, (os.path.getmtime(path) - seconds,) * 2)
+
+
+def test_artifacts_are_counted(tmp_path):
+    cache = ResultCache(str(tmp_path), max_bytes=1 << 20)
+    cache.put('resultado', {'clusters': np.arange(10)})
+    _write(cache.artifact_path('preferencias_a.snap'), 1000)
+    matrix_dir = cache.artifact_path('matriz_similitud')
+    os.makedirs(matrix_dir)
+    _write(os.path.join(matrix_dir, 'similarity_matrix.dat'), 2000)
+    _write(os.path.join(matrix_dir, 'similarity_matrix.dat.json'), 10)
+
+    assert set(cache.keys()) == {'resultado', 'preferencias_a.snap', 'matriz_similitud'}
+    assert cache.size() >= 3010
+    assert cache.get('preferencias_a.snap') is None
+
+
+def test_artifacts_are_evicted_by_age(tmp_path):
+    cache = ResultCache(str(tmp_path), max_bytes=2500)
+    _write(cache.artifact_path('ontologia_x.onto'), 1000)
+    _write(cache.artifact_path('preferencias_a.snap'), 1000)
+    _age(cache, 'ontologia_x.onto', 100)
+    _age(cache, 'preferencias_a.snap', 50)
+    # Usar la instantánea la convierte en la entrada más reciente
+    cache.artifact_path('preferencias_a.snap')
+    _write(cache.artifact_path('perfil.prof'), 1000)
+    cache.evict()
+
+    assert sorted(cache.keys()) == ['perfil.prof', 'preferencias_a.snap']
+    assert cache.size() <= 2500
+
+
+def test_invalidate_removes_everything(tmp_path):
+    cache = ResultCache(str(tmp_path))
+    cache.put('resultado', {'clusters': np.arange(10)})
+    _write(cache.artifact_path('preferencias_a.snap'), 10)
+    cache.invalidate()
+    assert cache.keys() == []
+
+
+def _engine(cache, matrix_path):
+    from reference import default_ontology_and_stem, random_preferences
+    from engine import PreferenceEngine
+
+    ontology, _ = default_ontology_and_stem()
+    engine = PreferenceEngine(cache=cache, matrix_path=matrix_path)
+    engine.genre_ontology = ontology
+    engine.set_preferences(random_preferences(ontology, 300, seed=5))
+    return engine
+
+
+def test_matrix_larger_than_cache_is_reused(tmp_path):
+    # Resultados (~1 KiB) dentro del límite; matriz de 300 x 300 float32 (~350 KiB) fuera de la caché
+    cache = ResultCache(str(tmp_path / 'cache'), max_bytes=64 * 1024)
+    matrix_path = str(tmp_path / 'matriz' / 'similarity_matrix.dat')
+    first = _engine(cache, matrix_path)
+    first.process('knn')
+    assert os.path.getsize(matrix_path) > cache.max_bytes
+    mtime = os.path.getmtime(matrix_path)
+
+    second = _engine(ResultCache(cache.directory, max_bytes=cache.max_bytes), matrix_path)
+    second.process('knn')
+    assert second.cache_hit
+    assert os.path.getmtime(matrix_path) == mtime
+    assert np.array_equal(second.similarity_matrix.row(3), first.similarity_matrix.row(3))
+
+
+def test_mapped_files_are_not_evicted(tmp_path):
+    cache = ResultCache(str(tmp_path / 'cache'), max_bytes=64 * 1024)
+    matrix_path = os.path.join(cache.artifact_path('matriz'), 'similarity_matrix.dat')
+    engine = _engine(cache, matrix_path)
+    engine.process('knn')
+    cache.evict()
+    assert os.path.exists(matrix_path)
+    assert engine.similarity_matrix.row(0)[0] == 1.0
+
+    # Al soltar la matriz vuelve a ser expulsable
+    engine._hold('matrix', None)
+    cache.evict()
+    assert not os.path.exists(matrix_path)
@@ -0,0 +1,55 @@
+"""Divergencia del clustering por cubetas MinHash frente al Ward exacto ('linkage')"""
+import numpy as np
+import pytest
+
+from reference import default_ontology_and_stem
+from clustering import exact_linkage_clusters, minhash_bucket_clusters
+from ingest import CSVIngestor
+from ontology import OntologyIndex
+from synthetic import generate_csv
+
+N_USERS = 2000
+# Con 2000 usuarios sintéticos se miden ~1.1 veces los clusters y ~2 veces los
+# usuarios solos del modo 'linkage' (sin unir las cubetas pequeñas: 1.37 y 4.1)
+MAX_CLUSTER_RATIO = 1.25
+MAX_SINGLETON_RATIO = 2.5
+
+
+def _singletons(clusters):
+    return int(np.count_nonzero(np.bincount(clusters) == 1))
+
+
+@pytest.fixture(scope='module')
+def clustered(tmp_path_factory):
+    ontology, stem = default_ontology_and_stem()
+    path = tmp_path_factory.mktemp('datos') / 'sintetico.csv'
+    generate_csv(str(path), N_USERS, seed=7)
+    store = CSVIngestor(workers=1).ingest(str(path)).store
+    index = OntologyIndex(ontology, stem, extra_genres=store.genres)
+    exact, _ = exact_linkage_clusters(store, index)
+    return {
+        'linkage': exact,
+        'minhash': minhash_bucket_clusters(store, index, ontology),
+        'sin_unir': minhash_bucket_clusters(store, index, ontology, min_bucket_size=1),
+    }
+
+
+def test_cluster_count_close_to_linkage(clustered):
+    ratio = clustered['minhash'].max() / clustered['linkage'].max()
+    assert ratio <= MAX_CLUSTER_RATIO, f"{ratio:.2f} veces los clusters de 'linkage'"
+
+
+def test_singletons_close_to_linkage(clustered):
+    ratio = _singletons(clustered['minhash']) / _singletons(clustered['linkage'])
+    assert ratio <= MAX_SINGLETON_RATIO, f"{ratio:.2f} veces los usuarios solos de 'linkage'"
+
+
+def test_merging_small_buckets_reduces_singletons(clustered):
+    assert _singletons(clustered['minhash']) < _singletons(clustered['sin_unir'])
+    assert clustered['minhash'].max() < clustered['sin_unir'].max()
+
+
+def test_labels_like_fcluster(clustered):
+    labels = clustered['minhash']
+    assert len(labels) == N_USERS
+    assert labels.min() == 1 and set(np.unique(labels)) == set(range(1, labels.max() + 1))
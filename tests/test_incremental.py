@@ -0,0 +1,79 @@
+"""upsert_user / remove_user frente al recálculo completo y umbral de deriva del clustering"""
+import random
+
+import numpy as np
+
+from reference import default_ontology_and_stem, random_preferences
+from engine import PreferenceEngine
+from similarity import SimilarityEngine
+
+N_USERS = 120
+
+
+def _engine(drift_threshold=0.05):
+    ontology, _ = default_ontology_and_stem()
+    engine = PreferenceEngine(drift_threshold=drift_threshold)
+    engine.genre_ontology = ontology
+    engine.set_preferences(random_preferences(ontology, N_USERS, seed=11))
+    engine.process('linkage')
+    return engine
+
+
+def _full_recompute(engine):
+    return SimilarityEngine(engine.ontology_index).condensed_distances(engine.user_preferences)
+
+
+def test_changes_match_full_recompute():
+    engine = _engine()
+    vocabulary = list(engine.user_preferences.genres)
+    new_users = iter(random_preferences(engine.genre_ontology, 200, seed=7).items())
+    rng = random.Random(3)
+    # Suficientes altas para que el desbordamiento se compacte al menos una vez
+    compacted = False
+    for step in range(150):
+        n_extra = engine.similarity_matrix.n_extra
+        users = engine.user_preferences.users
+        operation = rng.choice(['nuevo', 'nuevo', 'edición', 'borrado'])
+        if operation == 'nuevo':
+            user, genres = next(new_users)
+            engine.upsert_user(f"nuevo_{user}", genres)
+        elif operation == 'edición':
+            engine.upsert_user(rng.choice(users), rng.sample(vocabulary, rng.randint(0, 6)))
+        else:
+            engine.remove_user(rng.choice(users))
+        compacted |= engine.similarity_matrix.n_extra < n_extra
+
+        if step % 15 == 0:
+            # Filas leídas sin compactar
+            dense = 1.0 - _square(_full_recompute(engine))
+            for i in rng.sample(range(len(engine.user_preferences)), 10):
+                assert np.allclose(engine.similarity_matrix.row(i), dense[i], atol=1e-6)
+
+    assert compacted
+    assert len(engine.similarity_matrix) == len(engine.user_preferences)
+    assert np.allclose(engine.similarity_matrix.condensed, _full_recompute(engine), atol=1e-6)
+    assert engine.similarity_matrix.n_extra == 0
+
+
+def _square(condensed):
+    from scipy.spatial.distance import squareform
+    return squareform(condensed.astype(np.float64))
+
+
+def test_drift_threshold_triggers_recluster():
+    engine = _engine(drift_threshold=0.1)
+    users = engine.user_preferences.users
+    # 0.1 · 120 = 12 cambios permitidos antes de re-agrupar
+    for user in users[:12]:
+        engine.upsert_user(user, ['drama', 'comedia'])
+    assert engine.pending_changes == 12
+    assert not engine.clusters_stale()
+    assert not engine.refresh_clusters()
+
+    engine.remove_user(users[12])
+    assert engine.clusters_stale()
+    assert engine.refresh_clusters()
+    assert engine.pending_changes == 0
+    assert engine.linkage_matrix is not None
+    assert len(engine.clusters) == len(engine.user_preferences) == N_USERS - 1
+    assert np.allclose(engine.similarity_matrix.condensed, _full_recompute(engine), atol=1e-6)
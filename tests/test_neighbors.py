@@ -0,0 +1,105 @@
+"""TopKIndex (poda por cota superior) e IncrementalNeighbors frente al top-k por fuerza bruta"""
+import random
+
+import numpy as np
+import pytest
+
+from reference import default_ontology_and_stem, random_preferences
+from neighbors import TopKIndex, IncrementalNeighbors, RANK_DECIMALS
+from ontology import OntologyIndex
+from similarity import SimilarityEngine
+from store import PreferenceStore
+
+N_USERS = 150
+K = 5
+
+
+@pytest.fixture(scope='module')
+def ontology_and_stem():
+    return default_ontology_and_stem()
+
+
+def _store(ontology):
+    preferences = random_preferences(ontology, N_USERS, seed=13)
+    # Usuarios con el mismo conjunto (empates) y sin géneros (todas las similitudes a 0)
+    twins = preferences['usuario1']
+    preferences.update({'gemelo_a': set(twins), 'gemelo_b': set(twins), 'gemelo_c': set(twins)})
+    preferences.update({'vacio_a': set(), 'vacio_b': set()})
+    return PreferenceStore.from_preferences(preferences)
+
+
+def _brute_force(store, index, k):
+    """Top-k de la matriz completa: similitud descendente y, en empate, índice ascendente"""
+    scores = np.round(SimilarityEngine(index).similarity_matrix(store), RANK_DECIMALS)
+    np.fill_diagonal(scores, -np.inf)
+    k = min(k, len(store) - 1)
+    order = np.lexsort((np.broadcast_to(np.arange(len(store)), scores.shape), -scores), axis=1)[:, :k]
+    return order, np.take_along_axis(scores, order, axis=1)
+
+
+def test_top_k_matches_brute_force(ontology_and_stem):
+    ontology, stem = ontology_and_stem
+    store = _store(ontology)
+    index = OntologyIndex(ontology, stem, extra_genres=store.genres)
+    expected, expected_scores = _brute_force(store, index, K)
+
+    # Bloques pequeños para que la poda por cota corte entre bloques
+    topk = TopKIndex(store, index, chunk_size=8)
+    scored = []
+    score = topk.score
+    topk.score = lambda i, candidates: scored.append(len(candidates)) or score(i, candidates)
+    for i, user in enumerate(store.users):
+        neighbors = topk.top_k_similar(user, K)
+        assert [store.index_of(v) for v, _ in neighbors] == expected[i].tolist(), user
+        assert np.allclose([s for _, s in neighbors], expected_scores[i], atol=1e-12)
+    # La cota superior evita puntuar a parte de los candidatos
+    assert sum(scored) < len(store) * (len(store) - 1)
+
+    neighbors, similarities = TopKIndex(store, index, block_size=32).top_k_all(K)
+    assert np.array_equal(neighbors, expected)
+    assert np.allclose(similarities, expected_scores, atol=1e-6)
+
+
+def test_ties_and_empty_users(ontology_and_stem):
+    ontology, stem = ontology_and_stem
+    store = _store(ontology)
+    index = OntologyIndex(ontology, stem, extra_genres=store.genres)
+    topk = TopKIndex(store, index)
+
+    twins = [store.index_of(u) for u in ('usuario1', 'gemelo_a', 'gemelo_b', 'gemelo_c')]
+    neighbors, scores = topk._top_k_row(store.index_of('gemelo_b'), 3)
+    assert neighbors == sorted(j for j in twins if j != store.index_of('gemelo_b'))
+    assert len(set(scores)) == 1
+
+    # Sin géneros no hay candidatos: se completa con los primeros usuarios por índice
+    neighbors, scores = topk._top_k_row(store.index_of('vacio_a'), K)
+    assert neighbors == list(range(K)) and scores == [0.0] * K
+
+
+def test_incremental_neighbors_match_brute_force(ontology_and_stem):
+    ontology, stem = ontology_and_stem
+    store = _store(ontology)
+    index = OntologyIndex(ontology, stem, extra_genres=store.genres)
+    lists = IncrementalNeighbors(store, index, K)
+    vocabulary = list(store.genres)
+    rng = random.Random(5)
+
+    for step in range(40):
+        operation = rng.choice(['nuevo', 'edición', 'borrado'])
+        if operation == 'nuevo':
+            genres = set(rng.sample(vocabulary, rng.randint(0, 5)))
+            store, i = store.with_user(f"nuevo_{step}", genres)
+        elif operation == 'edición':
+            # Algunas ediciones copian a otro usuario para provocar empates
+            genres = store.genre_set(rng.randrange(len(store))) if step % 3 else set()
+            store, i = store.with_user(rng.choice(store.users), genres)
+        else:
+            store, i = store.without_user(rng.choice(store.users))
+        if operation == 'borrado':
+            lists.remove(store, i)
+        else:
+            lists.update(store, i)
+
+        expected, expected_scores = _brute_force(store, index, K)
+        assert np.array_equal(lists.neighbors, expected), f"paso {step} ({operation})"
+        assert np.allclose(lists.scores, expected_scores, atol=1e-12)
@@ -0,0 +1,70 @@
+"""Caché de ontologías compiladas (.onto) de load_ontology"""
+import json
+import os
+
+import pytest
+
+import ontology_compiler
+from ontology_compiler import load_ontology
+
+ONTOLOGY = {'drama': ['biografia', 'psicologico'], 'accion': {'aventura': ['viaje'], 'artes_marciales': []}}
+
+
+def _write(path, data):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+
+
+def _onto_files(cache_dir):
+    return sorted(name for name in os.listdir(cache_dir) if name.endswith('.onto'))
+
+
+def test_compiled_ontology_is_reused(tmp_path, monkeypatch):
+    source = str(tmp_path / 'ontologia.json')
+    cache_dir = str(tmp_path / 'cache')
+    _write(source, ONTOLOGY)
+
+    first = load_ontology(source, cache_dir)
+    assert first.path is None
+    assert len(_onto_files(cache_dir)) == 1
+
+    # En el acierto no se vuelve a compilar: se mapea el fichero .onto
+    def fail(data):
+        raise AssertionError("load_ontology recompiló una ontología ya compilada")
+
+    monkeypatch.setattr(ontology_compiler, 'compile_ontology', fail)
+    second = load_ontology(source, cache_dir)
+    assert second.path == os.path.join(cache_dir, _onto_files(cache_dir)[0])
+    assert {genre: set(children) for genre, children in second.items()} == \
+           {genre: set(children) for genre, children in first.items()}
+    assert set(second['accion']) == {'aventura', 'artes_marciales'}
+
+
+def test_edited_json_is_recompiled(tmp_path):
+    source = str(tmp_path / 'ontologia.json')
+    cache_dir = str(tmp_path / 'cache')
+    _write(source, ONTOLOGY)
+    load_ontology(source, cache_dir)
+    old_files = _onto_files(cache_dir)
+
+    _write(source, dict(ONTOLOGY, terror=['gore']))
+    ontology = load_ontology(source, cache_dir)
+    # La clave es la suma del JSON: el .onto anterior no se reutiliza
+    assert ontology.path is None
+    assert set(ontology['terror']) == {'gore'}
+    new_files = _onto_files(cache_dir)
+    assert len(new_files) == 2 and old_files[0] in new_files
+
+    # Y la nueva forma compilada es la que se lee después
+    reloaded = load_ontology(source, cache_dir)
+    assert reloaded.path != os.path.join(cache_dir, old_files[0])
+    assert set(reloaded['terror']) == {'gore'}
+
+
+def test_cyclic_ontology_is_rejected(tmp_path):
+    source = str(tmp_path / 'ciclo.json')
+    cache_dir = str(tmp_path / 'cache')
+    _write(source, {'a': ['b'], 'b': ['c'], 'c': ['a'], 'd': ['e']})
+    with pytest.raises(ValueError, match='ciclos'):
+        load_ontology(source, cache_dir)
+    assert not os.path.exists(cache_dir) or not _onto_files(cache_dir)
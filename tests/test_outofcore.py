@@ -0,0 +1,47 @@
+"""Reanudación de la matriz de similitud en disco tras interrumpir el cálculo por teselas"""
+import os
+
+import numpy as np
+import pytest
+
+from reference import default_ontology_and_stem, random_preferences
+from ontology import OntologyIndex
+from outofcore import compute_memmap_similarity, _read_metadata, _tiles_path
+from similarity import SimilarityEngine
+
+N_USERS = 100
+TILE_SIZE = 16
+# 7 x 7 teselas, de las que solo se calculan las 28 del triángulo superior
+N_TILES = 28
+INTERRUPT_AFTER = 10
+
+
+class Interrupted(Exception):
+    pass
+
+
+def test_resume_after_interruption(tmp_path):
+    ontology, stem = default_ontology_and_stem()
+    preferences = random_preferences(ontology, N_USERS, seed=21)
+    index = OntologyIndex(ontology, stem)
+    path = str(tmp_path / 'similarity_matrix.dat')
+
+    def interrupt(done, total):
+        if done == INTERRUPT_AFTER:
+            raise Interrupted()
+
+    with pytest.raises(Interrupted):
+        compute_memmap_similarity(preferences, index, path, tile_size=TILE_SIZE, workers=1, progress=interrupt)
+    assert not _read_metadata(path)['complete']
+    assert np.load(_tiles_path(path)).sum() == INTERRUPT_AFTER
+
+    pending = []
+    matrix = compute_memmap_similarity(preferences, index, path, tile_size=TILE_SIZE, workers=1,
+                                       progress=lambda done, total: pending.append(total))
+    # Solo se calculan las teselas que faltaban
+    assert set(pending) == {N_TILES - INTERRUPT_AFTER}
+    assert _read_metadata(path)['complete']
+    assert not os.path.exists(_tiles_path(path))
+
+    expected = SimilarityEngine(index).similarity_matrix(preferences)
+    np.testing.assert_allclose(np.asarray(matrix.matrix, dtype=np.float64), expected, rtol=0, atol=1e-6)
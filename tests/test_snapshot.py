@@ -0,0 +1,56 @@
+"""Instantáneas binarias: huellas de la cabecera y verificación opcional de la suma SHA-256"""
+import os
+
+import numpy as np
+import pytest
+
+from conftest import ROOT
+from engine import create_genre_ontology
+from ingest import CSVIngestor
+from nlp import NLPProcessor
+from snapshot import file_source, load_snapshot, save_snapshot
+
+CSV_PATH = os.path.join(ROOT, 'muestra_usuarios_nlp.csv')
+
+
+@pytest.fixture(scope='module')
+def processor():
+    return NLPProcessor()
+
+
+@pytest.fixture
+def snapshot(tmp_path, processor):
+    path = str(tmp_path / 'preferencias.snap')
+    result = CSVIngestor(nlp_processor=processor, workers=1).ingest(CSV_PATH)
+    save_snapshot(path, result, create_genre_ontology(), file_source(CSV_PATH), processor.rules_fingerprint())
+    return path, result
+
+
+def test_round_trip(snapshot, processor):
+    path, result = snapshot
+    loaded = load_snapshot(path, create_genre_ontology(), file_source(CSV_PATH), processor.rules_fingerprint(),
+                           verify=True)
+    assert loaded.store.users == result.store.users
+    assert np.array_equal(loaded.store.indices, result.store.indices)
+
+
+def test_rejects_other_normalization_rules(snapshot, processor):
+    path, _ = snapshot
+    other = NLPProcessor()
+    other.stop_words = processor.stop_words | {'terror'}
+    assert other.rules_fingerprint() != processor.rules_fingerprint()
+    with pytest.raises(ValueError, match="normalización"):
+        load_snapshot(path, normalization=other.rules_fingerprint())
+
+
+def test_checksum_only_when_requested(snapshot):
+    path, _ = snapshot
+    # Un byte cambiado en el último array (nombres de géneros, sin cambiar su longitud)
+    with open(path, 'r+b') as f:
+        f.seek(-1, os.SEEK_END)
+        last = f.read(1)
+        f.seek(-1, os.SEEK_END)
+        f.write(b'x' if last != b'x' else b'y')
+    load_snapshot(path)
+    with pytest.raises(ValueError, match="comprobación"):
+        load_snapshot(path, verify=True)